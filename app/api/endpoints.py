@@ -1,6 +1,33 @@
 from fastapi import APIRouter
+
+from ..services.event_bus import bus as event_bus
+from ..services.group_service import writers as group_writers
+from ..services.ingest_spool import spool as ingest_spool
+from ..services.response_cache import cache as response_cache
+from ..services.state_cache import cache as state_cache
+
 router = APIRouter()
 
 @router.get("/health", tags=["status"])
 def health_check():
     return {"status": "ok", "message": "RLx service is running"}
+
+@router.get("/health/cache", tags=["status"])
+def cache_stats():
+    """Contadores de la caché de estado de grupos y de la de respuestas serializadas."""
+    return {**state_cache.stats(), "responses": response_cache.stats()}
+
+@router.get("/health/writers", tags=["status"])
+def writer_stats():
+    """Escritores por grupo activos, profundidad de sus colas y escrituras agrupadas."""
+    return group_writers.stats()
+
+@router.get("/health/ingest", tags=["status"])
+def ingest_queue_stats():
+    """Estado de la cola de ingesta asíncrona: pendientes, retraso y rechazos."""
+    return ingest_spool.stats()
+
+@router.get("/health/events", tags=["status"])
+def event_channel_stats():
+    """Conexiones abiertas al canal de eventos de los grupos y eventos publicados."""
+    return event_bus.stats()
@@ -1,40 +1,59 @@
-from fastapi import APIRouter, Body, HTTPException, status, Depends, Query
+from fastapi import APIRouter, Body, HTTPException, status, Depends, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+import json
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
+from itertools import chain
 
 from ..models import schemas
+from ..services import group_events
 from ..services import group_service
+from ..services import ingest_spool
+from ..services import response_cache
 from ..core.utils import validate_group_id
+from ..core.config import INGEST_ASYNC, MAX_BATCH_INGEST_ITEMS
 
 router = APIRouter(
     prefix="/groups",
     tags=["groups"],
 )
 
+# Las lecturas que admiten If-None-Match se revalidan siempre: el navegador guarda la
+# respuesta y la reutiliza al recibir 304.
+_REVALIDATE_HEADERS = {"Cache-Control": "no-cache"}
+
+def _serialize(content) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+def _conditional_response(body: bytes, etag: str, if_none_match: str | None) -> Response:
+    """Respuesta JSON con su ETag, o 304 sin cuerpo si el cliente ya la tiene."""
+    if response_cache.etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, **_REVALIDATE_HEADERS})
+    return Response(body, media_type="application/json", headers={"ETag": etag, **_REVALIDATE_HEADERS})
+
 @router.get("/", response_model=schemas.GroupListResponse)
-def list_groups():
+def list_groups(if_none_match: str | None = Header(None)):
     """
     Lista todos los grupos (proyectos) disponibles, ordenados por modificación reciente.
+    Se sirve desde el catálogo de grupos, sin leer la memoria de cada uno.
     """
     groups_dir = group_service.MEMORY_DIR
     if not groups_dir.exists():
-        return {"groups": []}
-
-    group_files = sorted(
-        groups_dir.glob("*.yaml"),
-        key=lambda p: p.stat().st_mtime,
-        reverse=True
-    )
+        body = _serialize({"groups": []})
+        return _conditional_response(body, response_cache.content_etag(body), if_none_match)
 
+    recent_alerts_since = (datetime.utcnow() - timedelta(hours=24)).isoformat()
     groups_info = [
         schemas.GroupInfo(
-            group_id=p.stem,
-            last_modified=datetime.fromtimestamp(p.stat().st_mtime),
-            has_recent_alerts=group_service.has_recent_alerts(p.stem)
-        ) for p in group_files
+            **entry,
+            has_recent_alerts=bool(entry["last_alert_ts"]) and entry["last_alert_ts"] >= recent_alerts_since,
+        ) for entry in group_service.list_catalog()
     ]
-    return {"groups": groups_info}
+    # 'has_recent_alerts' depende del instante: el ETag se deriva del contenido.
+    body = _serialize({"groups": groups_info})
+    return _conditional_response(body, response_cache.content_etag(body), if_none_match)
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.GroupInfo)
 def create_new_group(group_data: schemas.CreateGroupRequest):
@@ -101,42 +120,210 @@ def delete_group(group_id: str):
 
 @router.post("/{group_id}/ingest", status_code=status.HTTP_202_ACCEPTED)
 def ingest_message(group_id: str, message: schemas.MessageIngest):
-    """Ingiere y procesa un nuevo mensaje para un grupo."""
+    """
+    Ingiere un nuevo mensaje para un grupo. En modo asíncrono (por defecto) solo se
+    anota en la cola duradera y se procesa en segundo plano; si la cola está llena
+    se responde 429 con Retry-After.
+    """
     try:
-        group_service.persist_message(group_id, message)
+        if INGEST_ASYNC:
+            ingest_spool.spool.enqueue(group_id, message)
+        else:
+            group_service.persist_message(group_id, message)
         return {"status": "accepted"}
+    except ingest_spool.QueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except ValueError as e: # Captura la validación de get_group_memory_path
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         # En un sistema real, aquí se registraría el error.
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.post("/{group_id}/ingest:batch", status_code=status.HTTP_202_ACCEPTED, response_model=schemas.BatchIngestResponse)
+def ingest_messages_batch(group_id: str, messages: list[schemas.MessageIngest]):
+    """
+    Ingiere una lista ordenada de mensajes (p. ej. la importación de un chat) con un
+    único bloqueo y una única escritura. Devuelve el resultado de cada mensaje.
+    """
+    if len(messages) > MAX_BATCH_INGEST_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"El lote supera el máximo de {MAX_BATCH_INGEST_ITEMS} mensajes."
+        )
+    try:
+        results = group_service.persist_messages(group_id, messages)
+        return {"status": "accepted", "results": results}
+    except ValueError as e: # Captura la validación de get_group_memory_path
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
 @router.get("/{group_id}/state")
-def get_group_state(group_id: str):
-    """Devuelve el estado completo (memoria YAML) de un grupo."""
-    state = group_service.get_group_state(group_id)
-    if state is None:
+def get_group_state(
+    group_id: str,
+    include_log: bool = Query(True, description="Si es false, devuelve solo meta y estadísticas, sin el log."),
+    if_none_match: str | None = Header(None),
+):
+    """
+    Devuelve el estado completo (memoria YAML) de un grupo. Admite peticiones
+    condicionales: si el ETag no ha cambiado se responde 304 sin leer la memoria.
+    """
+    try:
+        validate_group_id(group_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    etag = group_service.state_etag(group_id)
+    if etag is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grupo no encontrado.")
+    if not include_log:
+        etag = etag[:-1] + '-header"'  # Otra representación del mismo estado: otro ETag.
+    if response_cache.etag_matches(if_none_match, etag):
+        return _conditional_response(b"", etag, if_none_match)
+
+    key = (group_id, "state", include_log)
+    body = response_cache.cache.get(key, etag)
+    if body is None:
+        state = group_service.get_group_state(group_id) if include_log else group_service.get_group_header(group_id)
+        if state is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grupo no encontrado.")
+        body = _serialize(state)
+        response_cache.cache.put(key, etag, body)
+    return _conditional_response(body, etag, if_none_match)
+
+@router.get("/{group_id}/log")
+def get_group_log(
+    group_id: str,
+    after: str | None = Query(None, description="Cursor (msg_id o timestamp ISO): registros posteriores."),
+    before: str | None = Query(None, description="Cursor (msg_id o timestamp ISO): registros anteriores."),
+    limit: int | None = Query(None, ge=1, le=1000, description="Máximo de registros (por defecto 100; sin límite en NDJSON)."),
+    type: list[str] | None = Query(None, description="Filtrar por tipo de registro (message, alert, suggestion, daily_summary)."),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="'ndjson' devuelve el log en streaming, un registro por línea."),
+):
+    """
+    Devuelve el log del grupo paginado por cursores. Sin 'after' se devuelven los
+    registros más recientes; 'next_before' y 'next_after' permiten seguir paginando.
+    """
+    try:
+        validate_group_id(group_id)
+        types = set(type) if type else None
+        if format == "ndjson":
+            records = group_service.select_log(group_id, after=after, before=before, types=types)
+            # El primer registro se lee antes de responder: un cursor desconocido o caducado
+            # debe dar 404, no un 200 cortado a mitad del stream.
+            first = next(records, None)
+
+            def lines():
+                if first is None:
+                    return
+                for count, record in enumerate(chain([first], records)):
+                    if limit is not None and count >= limit:
+                        break
+                    yield json.dumps(record, ensure_ascii=False) + "\n"
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+        return group_service.query_log(group_id, after=after, before=before, limit=limit or 100, types=types)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grupo no encontrado.")
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@router.get("/{group_id}/events")
+async def stream_group_events(
+    group_id: str,
+    after: str | None = Query(None, description="Cursor (msg_id de un evento o timestamp ISO) desde el que reanudar."),
+    last_event_id: str | None = Header(None, description="Cursor enviado automáticamente por EventSource al reconectar."),
+):
+    """
+    Canal Server-Sent Events del grupo: alertas, sugerencias y resúmenes diarios en
+    cuanto se persisten, y las métricas en tiempo real cuando cambian.
+    """
+    try:
+        validate_group_id(group_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not group_service.get_group_memory_path(group_id).exists():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grupo no encontrado.")
+    return StreamingResponse(
+        group_events.stream_events(group_id, last_event_id or after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/{group_id}/export", response_class=PlainTextResponse)
+def export_group(group_id: str):
+    """Exporta la memoria completa del grupo en YAML, sea cual sea su modo de almacenamiento."""
+    try:
+        validate_group_id(group_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    exported = group_service.export_group_yaml(group_id)
+    if exported is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grupo no encontrado.")
-    return state
+    return PlainTextResponse(exported, media_type="application/x-yaml")
+
+@router.get("/metrics", response_model=schemas.GroupsMetricsResponse)
+def get_groups_metrics(group_id: list[str] | None = Query(None, description="Grupos a incluir (repetible). Por defecto, todos.")):
+    """Devuelve las métricas en tiempo real de varios grupos en una sola respuesta, con un instante común."""
+    try:
+        for gid in group_id or []:
+            validate_group_id(gid)
+        return group_service.get_groups_metrics(group_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error al calcular las métricas de los grupos.")
 
 @router.get("/{group_id}/metrics", response_model=schemas.GroupMetricsResponse)
-def get_group_metrics(group_id: str):
-    """Devuelve las métricas clave del grupo en tiempo real."""
+def get_group_metrics(group_id: str, if_none_match: str | None = Header(None)):
+    """
+    Devuelve las métricas clave del grupo en tiempo real. Las ventanas se deslizan
+    con el tiempo, así que el ETag se deriva del contenido (que sale del agregador en
+    memoria, sin leer disco); con un 304 no se reenvía el cuerpo.
+    """
     try:
         validate_group_id(group_id)
-        return group_service.get_group_metrics(group_id)
+        body = _serialize(group_service.get_group_metrics(group_id))
+        return _conditional_response(body, response_cache.content_etag(body), if_none_match)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception:
         # Log the error in a real app
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error al calcular las métricas del grupo.")
 
-@router.get("/{group_id}/affective_history", response_model=schemas.AffectiveHistoryResponse)
+@router.get("/{group_id}/affective_history", response_model=schemas.AffectiveHistoryResponse,
+            response_model_exclude_none=True)
 def get_group_affective_history(
     group_id: str,
-    since_hours: int = Query(24, ge=1, le=168, description="Ventana de tiempo en horas para el historial.")
+    since_hours: int = Query(24, ge=1, le=24 * 366, description="Ventana de tiempo en horas para el historial."),
+    resolution: str | None = Query(None, pattern="^(raw|minute|hour)$", description="'raw' (un punto por mensaje, hasta 168 h), 'minute' u 'hour'."),
+    max_points: int | None = Query(None, ge=1, le=10000, description="Número máximo de puntos; sin 'resolution' se elige la más fina que cabe."),
 ):
-    """Devuelve un historial de puntos de 'arousal' para el grupo."""
+    """Devuelve un historial de puntos de 'arousal' para el grupo, por mensaje o agregado por minuto/hora."""
     try:
         validate_group_id(group_id)
-        return group_service.get_affective_history(group_id, since_hours)
+        return group_service.get_affective_history(group_id, since_hours, resolution, max_points)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/{group_id}/summaries", response_model=schemas.PeriodSummariesResponse)
+def get_group_period_summaries(
+    group_id: str,
+    period: str = Query("week", pattern="^(week|month)$", description="'week' (de lunes a domingo) o 'month' (mes natural), en UTC."),
+    count: int = Query(1, ge=1, le=24, description="Número de períodos, hasta el actual (incluido)."),
+):
+    """
+    Devuelve los resúmenes semanales o mensuales del grupo, combinados a partir de los
+    agregados diarios persistidos (sin releer los mensajes).
+    """
+    try:
+        validate_group_id(group_id)
+        return {"period": period, "summaries": group_service.get_period_summaries(group_id, period, count)}
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grupo no encontrado.")
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
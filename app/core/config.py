@@ -1,4 +1,68 @@
+import os
+
 # Tamaño máximo de subida en bytes (ej. 20 MB)
 # Esto ayuda a prevenir ataques de denegación de servicio y a controlar
 # el uso de disco, en línea con los principios de RLx.
 MAX_UPLOAD_SIZE_BYTES = 20 * 1024 * 1024
+
+# Modo de almacenamiento para los grupos nuevos:
+#  - "yaml": un único fichero YAML por grupo (meta, log y user_stats), reescrito en cada mensaje.
+#  - "segmented": cabecera YAML pequeña (meta) + segmentos de log de solo-anexado + tabla
+#    compacta de estadísticas por usuario.
+# Los grupos existentes conservan su modo; se detecta por grupo a partir de su cabecera.
+GROUP_STORAGE_MODE = os.environ.get("RLX_GROUP_STORAGE", "yaml")
+
+# Formato del fichero principal de los grupos nuevos: "yaml" (legible) o "json" (rápido;
+# el YAML se genera bajo demanda con la exportación). Ver scripts/migrate_groups.py.
+GROUP_CODEC = os.environ.get("RLX_GROUP_CODEC", "yaml")
+
+# Tamaño a partir del cual se abre un nuevo segmento de log (modo "segmented").
+SEGMENT_MAX_BYTES = int(os.environ.get("RLX_SEGMENT_MAX_BYTES", 4 * 1024 * 1024))
+
+# Caché en memoria del estado parseado de los grupos (lecturas de métricas, historial, etc.).
+STATE_CACHE_MAX_ENTRIES = int(os.environ.get("RLX_STATE_CACHE_MAX_ENTRIES", 64))
+STATE_CACHE_MAX_BYTES = int(os.environ.get("RLX_STATE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Caché de respuestas ya serializadas (con su ETag) de las lecturas de grupos.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RLX_RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Resumen diario: motores de reglas compilados (idioma, usuarios, versión de las reglas)
+# que se conservan, y palabras distintas cuya raíz se memoriza por idioma.
+SUMMARY_RULE_ENGINES_MAX = int(os.environ.get("RLX_SUMMARY_RULE_ENGINES_MAX", 128))
+SUMMARY_STEM_CACHE_MAX = int(os.environ.get("RLX_SUMMARY_STEM_CACHE_MAX", 200_000))
+
+# Número máximo de mensajes aceptados en una ingesta por lotes.
+MAX_BATCH_INGEST_ITEMS = int(os.environ.get("RLX_MAX_BATCH_INGEST_ITEMS", 5000))
+
+# Días de historial que se mantienen en el nivel "caliente" del log de cada grupo.
+# Lo anterior se mueve al archivo comprimido al compactar (scripts/compact_groups.py).
+HOT_RETENTION_DAYS = int(os.environ.get("RLX_HOT_RETENTION_DAYS", 30))
+
+# Escritor por grupo (un hilo por grupo activo): máximo de mensajes encolados que se
+# agrupan en una sola escritura y segundos de inactividad tras los que el hilo termina.
+WRITER_MAX_COALESCE = int(os.environ.get("RLX_WRITER_MAX_COALESCE", 1000))
+WRITER_IDLE_SECONDS = float(os.environ.get("RLX_WRITER_IDLE_SECONDS", 30))
+
+# Ingesta asíncrona: POST /groups/{id}/ingest anota el mensaje en una cola duradera
+# (local_bundle/spool) y responde; los escritores de grupo lo persisten en segundo plano.
+INGEST_ASYNC = os.environ.get("RLX_INGEST_ASYNC", "1") not in ("0", "false", "no")
+INGEST_QUEUE_MAX = int(os.environ.get("RLX_INGEST_QUEUE_MAX", 10000))
+INGEST_QUEUE_MAX_PER_GROUP = int(os.environ.get("RLX_INGEST_QUEUE_MAX_PER_GROUP", 2000))
+INGEST_RETRY_AFTER_SECONDS = int(os.environ.get("RLX_INGEST_RETRY_AFTER_SECONDS", 1))
+SPOOL_SEGMENT_MAX_BYTES = int(os.environ.get("RLX_SPOOL_SEGMENT_MAX_BYTES", 1024 * 1024))
+# fsync por mensaje: sobrevive también a cortes de luz, a costa de latencia (el flush
+# por defecto ya sobrevive a la caída del proceso).
+SPOOL_FSYNC = os.environ.get("RLX_SPOOL_FSYNC", "0") in ("1", "true", "yes")
+
+# Segundos entre comprobaciones del mtime de profiles/*.yaml para recargar el registro de perfiles.
+PROFILE_RELOAD_CHECK_SECONDS = float(os.environ.get("RLX_PROFILE_RELOAD_CHECK_SECONDS", 1.0))
+
+# Hilos con los que GET /groups/metrics construye en paralelo los agregadores de los grupos sin vista en memoria.
+METRICS_BUILD_WORKERS = int(os.environ.get("RLX_METRICS_BUILD_WORKERS", 4))
+
+# Canal de eventos (SSE) por grupo: eventos pendientes por conexión antes de descartarlos y re-sincronizar
+# desde el cursor, segundos entre latidos (y comprobaciones de cambios hechos por otros procesos) y máximo
+# de registros reenviados al reanudar.
+EVENTS_QUEUE_MAX = int(os.environ.get("RLX_EVENTS_QUEUE_MAX", 256))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("RLX_EVENTS_HEARTBEAT_SECONDS", 15))
+EVENTS_REPLAY_MAX = int(os.environ.get("RLX_EVENTS_REPLAY_MAX", 500))
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 
@@ -6,6 +8,8 @@ from fastapi.staticfiles import StaticFiles
 
 from .api.endpoints import router as system_router
 from .api.groups import router as groups_router
+from .core.config import INGEST_ASYNC
+from .services.ingest_spool import spool as ingest_spool
 
 try:
     from .api.chat_endpoints import router as chat_router
@@ -17,7 +21,16 @@ try:
 except Exception:
     i18n_router = None
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Reentrega los mensajes que quedaran en la cola de ingesta de la ejecución anterior.
+    if INGEST_ASYNC:
+        ingest_spool.start()
+    yield
+    ingest_spool.stop()
+
 app = FastAPI(
+    lifespan=lifespan,
     docs_url="/api/docs", redoc_url=None, openapi_url="/api/openapi.json",
     title="RLx API",
     version="2.1.0",
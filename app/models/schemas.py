@@ -11,16 +11,36 @@ class MessageIngest(BaseModel):
     text: str = Field(..., description="Contenido del mensaje.")
     ts: datetime = Field(default_factory=datetime.utcnow, description="Timestamp del mensaje (UTC).")
 
+class BatchIngestItemResult(BaseModel):
+    msg_id: str = Field(description="ID asignado al mensaje ingerido.")
+    alert_raised: bool = Field(description="Indica si el mensaje disparó una alerta.")
+    suggestion_raised: bool = Field(False, description="Indica si tras el mensaje se generó una sugerencia proactiva.")
+
+class BatchIngestResponse(BaseModel):
+    status: str
+    results: list[BatchIngestItemResult]
+
 class AffectiveProxy(BaseModel):
     raw_arousal: float
-    raw_valence: float
-    raw_uncertainty: float
+    # El analizador aún no provee todas las señales; las ausentes se tratan como 0.0.
+    raw_valence: float = 0.0
+    raw_uncertainty: float = 0.0
     arousal_z: float = Field(description="Puntuación Z normalizada de Arousal.")
     valence_z: float = Field(description="Puntuación Z normalizada de Valence.")
     uncertainty_z: float = Field(description="Puntuación Z normalizada de Uncertainty.")
     e_user: float = Field(description="Carga emocional del usuario (0 a 1).")
 
+class SpooledMessage(MessageIngest):
+    """Mensaje entregado desde la cola de ingesta: conserva su msg_id y su nº de secuencia si se reentrega."""
+    msg_id: str
+    spool_seq: int
+
 class MessageRecord(MessageIngest):
+    """
+    Mensaje tal como se guarda en el log. Los que llegan por la cola de ingesta llevan
+    además 'spool_seq' (su nº de secuencia en la cola, ver ingest_spool), que el
+    reproceso (backfill) conserva.
+    """
     msg_id: str = Field(default_factory=lambda: str(uuid.uuid4()), description="ID único del mensaje.")
     type: str = "message"
     actor: str # This will be the same as author
@@ -40,11 +60,23 @@ class AlertRecord(BaseModel):
     trigger_ref: str = Field(description="ID del mensaje que disparó la alerta.")
     details: AlertDetails
 
+class AffectStats(BaseModel):
+    mean: float
+    median: float
+    max: float
+
 class AffectiveHistoryPoint(BaseModel):
-    ts: datetime = Field(description="Timestamp del punto de datos.")
-    value: float = Field(description="Valor de arousal_z en ese momento.")
+    ts: datetime = Field(description="Timestamp del punto de datos (inicio de la cubeta si es agregado).")
+    value: float = Field(description="Valor de arousal_z en ese momento (la media de la cubeta si es agregado).")
+    # Solo en resoluciones agregadas ("minute", "hour").
+    message_count: int | None = None
+    alert_count: int | None = None
+    arousal: AffectStats | None = None
+    valence: AffectStats | None = None
+    uncertainty: AffectStats | None = None
 
 class AffectiveHistoryResponse(BaseModel):
+    resolution: str = Field("raw", description="Resolución de los puntos: 'raw' (por mensaje), 'minute' u 'hour'.")
     history: list[AffectiveHistoryPoint]
 
 class SuggestionDetails(BaseModel):
@@ -80,6 +112,15 @@ class DailySummaryRecord(BaseModel):
     type: str = "daily_summary"
     details: DailySummaryDetails
 
+class PeriodSummary(BaseModel):
+    start: datetime = Field(description="Inicio del período (UTC).")
+    end: datetime = Field(description="Fin del período (UTC, excluido). En el período en curso, el resumen llega hasta ahora.")
+    details: DailySummaryDetails
+
+class PeriodSummariesResponse(BaseModel):
+    period: str = Field(description="'week' (de lunes a domingo) o 'month' (mes natural).")
+    summaries: list[PeriodSummary] = Field(description="Del período más antiguo al más reciente.")
+
 # --- Modelos para Métricas en Tiempo Real ---
 
 class GroupAffectiveMetrics(BaseModel):
@@ -90,12 +131,22 @@ class GroupAffectiveMetrics(BaseModel):
 class GroupMetricsResponse(BaseModel):
     friction_index: float = Field(description="Ratio de alertas sobre mensajes en las últimas 24h.")
     affective_proxy: GroupAffectiveMetrics = Field(description="Métricas afectivas agregadas para el grupo.")
+
+class GroupMetricsEntry(GroupMetricsResponse):
+    group_id: str
+
+class GroupsMetricsResponse(BaseModel):
+    ts: datetime = Field(description="Instante común (UTC) con el que se calcularon las métricas de todos los grupos.")
+    groups: list[GroupMetricsEntry]
 # --- Modelos para la lista de grupos ---
 
 class GroupInfo(BaseModel):
     group_id: str
     last_modified: datetime
     has_recent_alerts: bool = Field(False, description="Indica si el grupo tiene alertas no vistas o recientes.")
+    message_count: int | None = Field(None, description="Número de mensajes del grupo (archivo frío incluido).")
+    last_alert_ts: datetime | None = Field(None, description="Timestamp de la última alerta.")
+    last_summary_ts: datetime | None = Field(None, description="Timestamp del último resumen diario.")
 
 class GroupListResponse(BaseModel):
     groups: list[GroupInfo]
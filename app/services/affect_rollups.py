@@ -0,0 +1,453 @@
+"""
+Agregados afectivos persistidos por minuto y por hora de cada grupo.
+
+Por cada cubeta con mensajes se guarda la media, la mediana y el máximo de
+arousal_z, valence_z y uncertainty_z, junto con el número de mensajes y de
+alertas. Se guardan junto a la memoria del grupo, en <id>.rollups/:
+
+  - minute.jsonl / hour.jsonl  una cubeta cerrada por línea, en orden de tiempo
+  - summary.jsonl              el agregado del resumen diario de cada hora cerrada con
+                               mensajes (ver summarizer.aggregate_messages)
+  - summary_day.jsonl          esos agregados combinados por día (UTC) completo y cerrado
+  - state.json                 {"closed_through": µs, "format": n}: las horas anteriores
+                               están cerradas
+
+La hora en curso (desde 'closed_through') no se persiste: se calcula al consultar
+a partir de la cola del log, que es pequeña. En la ingesta solo hay trabajo cuando
+llega un registro de una hora posterior (se cierran las horas pendientes) o, muy
+rara vez, uno de una hora ya cerrada: esa hora se recalcula y se añade una línea
+marcada como "late" que sustituye a la anterior. El archivo frío no afecta a los
+agregados, de modo que el historial largo sigue siendo barato tras compactar.
+
+Una alerta cuenta en la cubeta del mensaje que la disparó (si lo sigue en el log)
+para que la cubeta de un mensaje y su alerta coincidan.
+
+Los agregados del resumen llevan la huella del idioma, los usuarios y las reglas
+del grupo con que se calcularon; si ya no coincide, esa hora se recalcula del log
+al resumir. Combinando días y horas cerradas y la hora en curso se obtiene el
+resumen de una ventana sin volver a analizar sus mensajes; un resumen semanal o
+mensual lee una línea por día.
+
+Combinar por horas solo reproduce el orden del log si este está ordenado. Las
+líneas del resumen de una hora con algún mensaje que en el log va detrás de otro
+de una hora posterior (y las de los días que la contienen) se marcan como
+"unordered"; si la ventana incluye alguna, se agrega desde el log.
+"""
+import json
+import os
+import shutil
+import statistics
+from pathlib import Path
+from typing import Callable, Iterable
+
+from . import profile_registry
+from . import storage_codec
+from . import summarizer
+from .group_store import _iter_lines_reversed
+from .rolling import to_epoch_us
+
+MINUTE_US = 60 * 1_000_000
+HOUR_US = 60 * MINUTE_US
+DAY_US = 24 * HOUR_US
+RESOLUTIONS = {"minute": MINUTE_US, "hour": HOUR_US}
+DIMENSIONS = ("arousal", "valence", "uncertainty")
+
+_STATE_FILE = "state.json"
+# Versión del formato de los ficheros; con otra distinta se reconstruyen en la siguiente ingesta.
+FORMAT = 2
+
+
+def rollup_dir(filepath: Path) -> Path:
+    """Directorio de agregados asociado al fichero principal de un grupo."""
+    return filepath.with_suffix(".rollups")
+
+
+def floor_us(ts_us: int, bucket_us: int) -> int:
+    return ts_us - ts_us % bucket_us
+
+
+# --- Cálculo ---
+
+def _entries(records: Iterable[dict]) -> Iterable[tuple[int, bool, tuple | None, dict]]:
+    """
+    (ts_us de la cubeta, es_alerta, (arousal, valence, uncertainty) o None, registro)
+    por registro relevante: mensajes (con o sin affective_proxy) y alertas.
+    """
+    last_msg_id, last_msg_ts = None, None
+    for record in records:
+        record_type = record.get("type")
+        if record_type not in ("message", "alert"):
+            continue
+        try:
+            ts_us = to_epoch_us(record.get("ts", ""))
+        except (ValueError, TypeError):
+            continue
+        if record_type == "alert":
+            yield (last_msg_ts if record.get("trigger_ref") == last_msg_id else ts_us), True, None, record
+            continue
+        last_msg_id, last_msg_ts = record.get("msg_id"), ts_us
+        proxy = record.get("affective_proxy")
+        values = (proxy["arousal_z"], proxy.get("valence_z", 0.0), proxy.get("uncertainty_z", 0.0)) if proxy else None
+        yield ts_us, False, values, record
+
+
+def _bucket(t: int, entries: list[tuple]) -> dict | None:
+    values = [entry[2] for entry in entries if not entry[1] and entry[2] is not None]
+    if not values:
+        return None
+    bucket = {
+        "t": t,
+        "messages": sum(1 for entry in entries if not entry[1]),
+        "alerts": sum(1 for entry in entries if entry[1]),
+    }
+    for i, dimension in enumerate(DIMENSIONS):
+        column = [v[i] for v in values]
+        bucket[dimension] = {"mean": sum(column) / len(column), "median": statistics.median(column), "max": max(column)}
+    return bucket
+
+
+def aggregate(records: Iterable[dict], bucket_us: int, start_us: int | None = None,
+              end_us: int | None = None) -> list[dict]:
+    """Cubetas (ordenadas) de los registros con start_us <= ts < end_us. Solo las que tienen mensajes con análisis."""
+    groups: dict[int, list] = {}
+    for entry in _entries(records):
+        if (start_us is not None and entry[0] < start_us) or (end_us is not None and entry[0] >= end_us):
+            continue
+        groups.setdefault(floor_us(entry[0], bucket_us), []).append(entry)
+    buckets = (_bucket(t, entries) for t, entries in sorted(groups.items()))
+    return [bucket for bucket in buckets if bucket is not None]
+
+
+# --- Persistencia ---
+
+def closed_through(filepath: Path) -> int | None:
+    """Inicio de la hora en curso (las anteriores están cerradas), o None si no hay agregados."""
+    path = rollup_dir(filepath) / _STATE_FILE
+    try:
+        state = storage_codec.CODECS["json"].load(path)
+    except FileNotFoundError:
+        return None
+    return state["closed_through"] if state.get("format") == FORMAT else None
+
+
+def _set_closed_through(filepath: Path, closed_through_us: int):
+    storage_codec.CODECS["json"].dump({"closed_through": closed_through_us, "format": FORMAT},
+                                      rollup_dir(filepath) / _STATE_FILE)
+
+
+def _append(filepath: Path, resolution: str, buckets: list[dict], late: bool = False):
+    if not buckets:
+        return
+    directory = rollup_dir(filepath)
+    directory.mkdir(parents=True, exist_ok=True)
+    lines = "".join(json.dumps({**b, "late": True} if late else b, separators=(",", ":")) + "\n" for b in buckets)
+    with open(directory / f"{resolution}.jsonl", "a", encoding="utf-8") as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _close_hours(filepath: Path, records: Iterable[dict], start_us: int, end_us: int):
+    """Persiste las cubetas de minuto y de hora de los registros en [start_us, end_us)."""
+    all_entries = list(_entries(records))
+    entries = [entry for entry in all_entries if start_us <= entry[0] < end_us]
+    _close_entries(filepath, entries, _unordered_hours(all_entries))
+
+
+def _close_late_hours(filepath: Path, records: Iterable[dict], late_hours: set[int]):
+    """
+    Recalcula en una sola pasada las horas ya cerradas de 'late_hours' a partir de
+    'records' (el log desde la primera de ellas, como mínimo) y añade sus líneas "late".
+    """
+    by_hour: dict[int, list] = {}
+    for entry in _entries(records):
+        hour = floor_us(entry[0], HOUR_US)
+        if hour in late_hours:
+            by_hour.setdefault(hour, []).append(entry)
+    entries = [entry for hour in sorted(by_hour) for entry in by_hour[hour]]
+    # Una hora corregida tiene por definición un mensaje detrás de otro de una hora posterior.
+    _close_entries(filepath, entries, set(by_hour), late=True)
+
+
+def _unordered_hours(entries: Iterable[tuple]) -> set[int]:
+    """Horas con algún mensaje que en el log va detrás de un mensaje de una hora posterior."""
+    unordered, latest = set(), None
+    for entry in entries:
+        if entry[1]:
+            continue
+        hour = floor_us(entry[0], HOUR_US)
+        if latest is not None and hour < latest:
+            unordered.add(hour)
+        else:
+            latest = hour
+    return unordered
+
+
+def _summary_settings(filepath: Path) -> tuple[str, list[str]]:
+    """Idioma y usuarios del perfil del grupo, los mismos que usa el resumen diario."""
+    profile = profile_registry.registry.group(filepath.stem)
+    return profile.get("default_lang", "es"), profile.get("users") or []
+
+
+def _summary_lines(filepath: Path, entries: list[tuple], unordered: set[int]) -> list[dict]:
+    """Agregados del resumen diario, uno por hora con mensajes; se marcan las horas de 'unordered'."""
+    hours: dict[int, list[dict]] = {}
+    for entry in entries:
+        if not entry[1]:
+            hours.setdefault(floor_us(entry[0], HOUR_US), []).append(entry[3])
+    if not hours:
+        return []
+    lang, user_names = _summary_settings(filepath)
+    context = summarizer.summary_context(lang, user_names)
+    lines = []
+    for t, messages in sorted(hours.items()):
+        line = {"t": t, "context": context, **summarizer.aggregate_messages(messages, lang, user_names)}
+        if t in unordered:
+            line["unordered"] = True
+        lines.append(line)
+    return lines
+
+
+def _close_days(filepath: Path, hours: list[dict], late: bool = False):
+    """
+    Persiste los agregados del resumen por día a partir de las líneas horarias de días
+    completos. Si las horas de un día tienen huellas distintas, la del día queda vacía
+    y al resumir se usan las horas.
+    """
+    days: dict[int, list[dict]] = {}
+    for line in hours:
+        days.setdefault(floor_us(line["t"], DAY_US), []).append(line)
+    lines = []
+    for t, day_hours in sorted(days.items()):
+        contexts = {line.get("context") for line in day_hours}
+        context = contexts.pop() if len(contexts) == 1 else None
+        line = {"t": t, "context": context, **summarizer.merge_aggregates(day_hours)}
+        if any(hour.get("unordered") for hour in day_hours):
+            line["unordered"] = True
+        lines.append(line)
+    _append(filepath, "summary_day", lines, late)
+
+
+def _refresh_day(filepath: Path, day_us: int):
+    """Recalcula la línea de un día ya cerrado tras corregir una de sus horas."""
+    _close_days(filepath, read(filepath, "summary", day_us, day_us + DAY_US), late=True)
+
+
+def rebuild(filepath: Path, load_all: Callable[[], Iterable[dict]]):
+    """
+    Reconstruye los agregados desde el log completo, en streaming hora a hora.
+    Las horas que reaparecen más adelante (log desordenado) se recalculan en una
+    segunda pasada y se añaden como líneas "late".
+    """
+    shutil.rmtree(rollup_dir(filepath), ignore_errors=True)
+    rollup_dir(filepath).mkdir(parents=True)
+    current_hour, pending, closed, late_hours = None, [], set(), set()
+    latest_message, unordered = None, set()
+    for entry in _entries(load_all()):
+        hour = floor_us(entry[0], HOUR_US)
+        if not entry[1]:
+            if latest_message is not None and hour < latest_message:
+                unordered.add(hour)
+            latest_message = hour if latest_message is None else max(latest_message, hour)
+        if hour in closed:
+            late_hours.add(hour)
+            continue
+        if current_hour is not None and hour > current_hour:
+            _close_entries(filepath, pending, unordered)
+            closed.update({floor_us(e[0], HOUR_US) for e in pending})
+            pending = []
+        current_hour = hour if current_hour is None else max(current_hour, hour)
+        pending.append(entry)
+
+    # La última hora queda abierta; las horas anteriores que aún estén pendientes se cierran.
+    if current_hour is not None:
+        earlier = [e for e in pending if e[0] < current_hour]
+        _close_entries(filepath, earlier, unordered)
+        closed.update({floor_us(e[0], HOUR_US) for e in earlier})
+    if late_hours:
+        _close_late_hours(filepath, load_all(), late_hours)
+    if current_hour is not None:
+        _close_days(filepath, read(filepath, "summary", 0, floor_us(current_hour, DAY_US)))
+    _set_closed_through(filepath, current_hour if current_hour is not None else 0)
+
+
+def _close_entries(filepath: Path, entries: list, unordered: set[int], late: bool = False):
+    for resolution, bucket_us in RESOLUTIONS.items():
+        groups: dict[int, list] = {}
+        for entry in entries:
+            groups.setdefault(floor_us(entry[0], bucket_us), []).append(entry)
+        buckets = (_bucket(t, group) for t, group in sorted(groups.items()))
+        _append(filepath, resolution, [bucket for bucket in buckets if bucket is not None], late)
+    _append(filepath, "summary", _summary_lines(filepath, entries, unordered), late)
+
+
+def observe(filepath: Path, records: list[dict], load_since: Callable[[int], Iterable[dict]],
+            load_all: Callable[[], Iterable[dict]]):
+    """
+    Actualiza los agregados tras persistir 'records' (bajo el bloqueo del grupo).
+    'load_since(µs)' devuelve los registros persistidos desde un instante y
+    'load_all()' el log completo (solo se usa la primera vez).
+    """
+    closed = closed_through(filepath)
+    if closed is None:
+        rebuild(filepath, load_all)
+        return
+    hours = {floor_us(entry[0], HOUR_US) for entry in _entries(records)}
+    if not hours:
+        return
+    late_hours = {hour for hour in hours if hour < closed}
+    if late_hours:
+        # Registros de horas ya cerradas: se recalculan esas horas completas, leyendo el
+        # log una sola vez desde la primera.
+        _close_late_hours(filepath, load_since(min(late_hours)), late_hours)
+        for day in sorted({floor_us(hour, DAY_US) for hour in late_hours}):
+            if day + DAY_US <= closed:
+                _refresh_day(filepath, day)
+    latest = max(hours)
+    if latest > closed:
+        finalize(filepath, latest, load_since)
+
+
+def finalize(filepath: Path, until_us: int, load_since: Callable[[int], Iterable[dict]]):
+    """Cierra las horas abiertas anteriores a 'until_us' (p. ej. antes de archivarlas)."""
+    closed = closed_through(filepath)
+    until_us = floor_us(until_us, HOUR_US)
+    if closed is None or until_us <= closed:
+        return
+    _close_hours(filepath, load_since(closed), closed, until_us)
+    # Días que se completan con estas horas.
+    if floor_us(until_us, DAY_US) > floor_us(closed, DAY_US):
+        _close_days(filepath, read(filepath, "summary", floor_us(closed, DAY_US), floor_us(until_us, DAY_US)))
+    _set_closed_through(filepath, until_us)
+
+
+def read(filepath: Path, resolution: str, since_us: int, until_us: int | None = None) -> list[dict]:
+    """
+    Cubetas cerradas con t >= since_us (y < until_us), ordenadas. Se lee desde el
+    final del fichero y se para en la primera línea normal anterior a 'since_us';
+    las líneas "late" sustituyen a las anteriores de la misma cubeta.
+    """
+    path = rollup_dir(filepath) / f"{resolution}.jsonl"
+    if not path.exists():
+        return []
+    buckets: dict[int, dict] = {}
+    for line in _iter_lines_reversed(path):
+        try:
+            bucket = json.loads(line)
+        except json.JSONDecodeError:
+            continue  # Línea truncada por una caída.
+        t = bucket["t"]
+        if t < since_us:
+            if bucket.get("late"):
+                continue
+            break
+        if until_us is not None and t >= until_us:
+            continue
+        if t not in buckets:
+            bucket.pop("late", None)
+            buckets[t] = bucket
+    return [buckets[t] for t in sorted(buckets)]
+
+
+def history(filepath: Path, resolution: str, since_us: int, load_since: Callable[[int], Iterable[dict]]) -> list[dict]:
+    """Cubetas de la ventana: las cerradas, de disco, y las de la hora en curso, calculadas de la cola del log."""
+    bucket_us = RESOLUTIONS[resolution]
+    start_us = floor_us(since_us, bucket_us)
+    closed = closed_through(filepath)
+    if closed is None:
+        return aggregate(load_since(floor_us(start_us, HOUR_US) - HOUR_US), bucket_us, start_us)
+    buckets = read(filepath, resolution, start_us, closed)
+    open_start = max(closed, start_us)
+    return buckets + aggregate(load_since(open_start - HOUR_US), bucket_us, open_start)
+
+
+def summary_aggregate(filepath: Path, since_us: int, load_since: Callable[[int], Iterable[dict]],
+                      until_us: int | None = None) -> dict:
+    """
+    Agregado del resumen diario de los mensajes con since_us <= ts < until_us ('until_us'
+    redondeado a la hora; sin él, hasta ahora): días completos y horas cerradas desde
+    disco, y del log la parte de la primera hora posterior a 'since_us', la hora en
+    curso y las horas cerradas con otra huella de perfil o reglas. Si la ventana
+    contiene mensajes desordenados, se agregan todos desde el log en su orden.
+    """
+    first_us = floor_us(since_us, HOUR_US)
+    start_us = first_us if first_us == since_us else first_us + HOUR_US  # primera hora completa
+    end_us = None if until_us is None else floor_us(until_us, HOUR_US)
+    lang, user_names = _summary_settings(filepath)
+    context = summarizer.summary_context(lang, user_names)
+    closed = closed_through(filepath)
+    stored_end = closed if closed is None or end_us is None else min(closed, end_us)
+
+    # Días completos con la huella actual: una línea en lugar de sus horas.
+    days: dict[int, dict] = {}
+    hours_from = start_us
+    if closed is not None:
+        first_day = -(-start_us // DAY_US) * DAY_US
+        for line in read(filepath, "summary_day", first_day, floor_us(stored_end, DAY_US)):
+            if line.get("context") == context:
+                days[line["t"]] = line
+        if start_us == first_day:
+            while hours_from in days:
+                hours_from += DAY_US  # Solo se leen las horas a partir del primer día sin línea.
+    stored = [] if closed is None or hours_from >= stored_end else [
+        line for line in read(filepath, "summary", hours_from, stored_end)
+        if floor_us(line["t"], DAY_US) not in days
+    ]
+    valid = {line["t"]: line for line in stored if line.get("context") == context}
+    stale = [line["t"] for line in stored if line["t"] not in valid]
+    unordered = any(line.get("unordered") for line in [*days.values(), *stored])
+
+    # Primera hora incompleta ya cerrada: sus mensajes desde since_us salen del log. Si
+    # no está marcada, todos van antes que los de horas posteriores y se para en el primero.
+    partial = []
+    if first_us < start_us and closed is not None and first_us < closed and (end_us is None or first_us < end_us):
+        first_hour = read(filepath, "summary", first_us, start_us)
+        unordered = unordered or any(line.get("unordered") for line in first_hour)
+        if first_hour and not unordered:
+            for entry in _entries(load_since(since_us)):
+                if entry[1] or entry[0] < since_us:
+                    continue
+                if entry[0] >= start_us:
+                    break
+                partial.append(entry[3])
+
+    # Lo que no está en disco (o no sirve) se agrega desde el log, por horas.
+    computed = {}
+    open_from = max(closed if closed is not None else first_us, first_us)
+    if not unordered and (stale or end_us is None or open_from < end_us):
+        hours: dict[int, list[dict]] = {}
+        latest = None
+        for entry in _entries(load_since(min(stale + [open_from]))):
+            if entry[1] or entry[0] < since_us:
+                continue
+            hour = floor_us(entry[0], HOUR_US)
+            if end_us is not None and hour >= end_us:
+                continue
+            if latest is not None and hour < latest:
+                unordered = True
+                break
+            latest = hour
+            if hour not in valid and (closed is None or hour >= closed or hour in stale):
+                hours.setdefault(hour, []).append(entry[3])
+        computed = {t: summarizer.aggregate_messages(messages, lang, user_names) for t, messages in hours.items()}
+
+    if unordered:
+        # Combinar por horas no reproduciría el orden del log: se agrega la ventana completa.
+        messages = [
+            entry[3] for entry in _entries(load_since(since_us))
+            if not entry[1] and entry[0] >= since_us and (end_us is None or entry[0] < end_us)
+        ]
+        return summarizer.aggregate_messages(messages, lang, user_names)
+    if partial:
+        computed[first_us] = summarizer.aggregate_messages(partial, lang, user_names)
+    parts = sorted([*days.items(), *valid.items(), *computed.items()], key=lambda part: part[0])
+    return summarizer.merge_aggregates(aggregate for _, aggregate in parts)
+
+
+def move(old_filepath: Path, new_filepath: Path):
+    if rollup_dir(old_filepath).exists():
+        rollup_dir(old_filepath).rename(rollup_dir(new_filepath))
+
+
+def delete(filepath: Path):
+    shutil.rmtree(rollup_dir(filepath), ignore_errors=True)
@@ -1,4 +1,7 @@
 import math
+import re
+import string
+from array import array
 from datetime import datetime
 
 ELONG_MIN = 3
@@ -10,12 +13,62 @@ def _gap_factor(last_ts: datetime | None, ts: datetime) -> float:
     dt = (ts - last_ts).total_seconds()
     return math.exp(-dt / TAU_GAP_S)
 
+# Las letras ASCII se cuentan con bytes.translate (un recorrido en C); solo los
+# caracteres no ASCII, pocos en la práctica, se examinan uno a uno.
+_ASCII_LETTERS = string.ascii_letters.encode()
+_ASCII_UPPER = string.ascii_uppercase.encode()
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+def _signal_counts(text: str) -> tuple[int, int, int, int, int, int]:
+    """
+    Numeradores y denominadores enteros de las señales crudas:
+    (exclamaciones+interrogaciones, longitud, mayúsculas, letras, palabras alargadas, palabras).
+    """
+    n_chars = len(text)
+    marks = text.count("!") + text.count("?")
+    encoded = text.encode("utf-8", "surrogatepass")
+    n_letters = len(encoded) - len(encoded.translate(None, _ASCII_LETTERS))
+    n_upper = len(encoded) - len(encoded.translate(None, _ASCII_UPPER))
+    if len(encoded) != n_chars:
+        for c in _NON_ASCII.findall(text):
+            if c.isalpha():
+                n_letters += 1
+                if c.isupper():
+                    n_upper += 1
+    words = text.split()
+    n_elong = 0
+    for w in words:
+        if len(w) < ELONG_MIN:
+            continue
+        # Un carácter repetido ELONG_MIN veces deja al menos ELONG_MIN-1 duplicados.
+        chars = set(w)
+        if len(w) - len(chars) < ELONG_MIN - 1:
+            continue
+        for ch in chars:
+            if w.count(ch) >= ELONG_MIN:
+                n_elong += 1
+                break
+    return marks, n_chars, n_upper, n_letters, n_elong, len(words)
+
 def calculate_raw_signals(text: str) -> dict:
-    letters = [c for c in text if c.isalpha()]
-    n_letters = max(len(letters), 1)
-    raw_arousal = (text.count("!") + text.count("?")) / max(len(text), 1)
-    raw_caps = sum(1 for c in letters if c.isupper()) / n_letters
-    raw_elong = sum(1 for w in text.split() if len(set(w)) < len(w) and any(w.count(ch) >= ELONG_MIN for ch in set(w))) / max(len(text.split()), 1)
+    marks, n_chars, n_upper, n_letters, n_elong, n_words = _signal_counts(text)
+    return {
+        "raw_arousal": marks / max(n_chars, 1),
+        "raw_caps": n_upper / max(n_letters, 1),
+        "raw_elong": n_elong / max(n_words, 1),
+    }
+
+def calculate_raw_signals_batch(texts: list[str]) -> dict[str, array]:
+    """
+    Señales crudas de una lista de textos (ingesta por lotes, backfills, repeticiones
+    de ajuste). Devuelve arrays paralelos 'd' idénticos, valor a valor, a llamar a
+    calculate_raw_signals con cada texto.
+    """
+    raw_arousal, raw_caps, raw_elong = array("d"), array("d"), array("d")
+    for marks, n_chars, n_upper, n_letters, n_elong, n_words in map(_signal_counts, texts):
+        raw_arousal.append(marks / max(n_chars, 1))
+        raw_caps.append(n_upper / max(n_letters, 1))
+        raw_elong.append(n_elong / max(n_words, 1))
     return {"raw_arousal": raw_arousal, "raw_caps": raw_caps, "raw_elong": raw_elong}
 
 def calculate_emotional_load(a_z: float, v_z: float, u_z: float) -> float:
@@ -0,0 +1,130 @@
+"""
+Archivo frío de la memoria de grupos.
+
+La compactación mueve los registros más antiguos que la retención "caliente" a
+ficheros comprimidos e inmutables, uno por grupo, mes y ejecución:
+
+    local_bundle/archive/<group_id>/<YYYY-MM>/part-<run>.jsonl.gz
+
+El estado caliente conserva en meta.archive un resumen (recuentos por tipo, rango
+temporal y la lista de partes válidas). Solo las partes listadas en el resumen
+forman parte de la memoria: si una compactación se interrumpe antes de actualizar
+el estado caliente, sus partes huérfanas se eliminan en la siguiente ejecución.
+"""
+import gzip
+import json
+import shutil
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+ARCHIVE_DIR = ROOT_DIR / "local_bundle/archive"
+
+
+def archive_dir(group_id: str) -> Path:
+    return ARCHIVE_DIR / group_id
+
+
+def _record_ts(record: dict) -> datetime | None:
+    try:
+        return datetime.fromisoformat(record.get("ts", "")).replace(tzinfo=None)
+    except (ValueError, TypeError):
+        return None
+
+
+def split_by_cutoff(log: list[dict], cutoff: datetime) -> tuple[list[dict], list[dict]]:
+    """Separa el log en (a archivar, caliente). Los registros sin ts válido se quedan en caliente."""
+    cold, hot = [], []
+    for record in log:
+        ts = _record_ts(record)
+        (cold if ts is not None and ts < cutoff else hot).append(record)
+    return cold, hot
+
+
+def write_parts(group_id: str, records: list[dict], run_id: str) -> list[str]:
+    """Escribe los registros en partes comprimidas por mes. Devuelve sus rutas relativas."""
+    by_month: dict[str, list[dict]] = {}
+    for record in records:
+        by_month.setdefault(_record_ts(record).strftime("%Y-%m"), []).append(record)
+
+    parts = []
+    for month in sorted(by_month):
+        relative = f"{month}/part-{run_id}.jsonl.gz"
+        path = archive_dir(group_id) / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for record in by_month[month]:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        parts.append(relative)
+    return parts
+
+
+def merge_summary(summary: dict | None, records: list[dict], parts: list[str]) -> dict:
+    """Actualiza el resumen meta.archive con una nueva tanda de registros archivados."""
+    summary = dict(summary or {})
+    timestamps = [_record_ts(r) for r in records]
+    first_ts = min(timestamps).isoformat()
+    last_ts = max(timestamps).isoformat()
+    counts = Counter(summary.get("counts_by_type", {}))
+    counts.update(r.get("type", "unknown") for r in records)
+
+    summary["record_count"] = summary.get("record_count", 0) + len(records)
+    summary["first_ts"] = min(filter(None, [summary.get("first_ts"), first_ts]))
+    summary["last_ts"] = max(filter(None, [summary.get("last_ts"), last_ts]))
+    summary["counts_by_type"] = dict(counts)
+    summary["parts"] = list(summary.get("parts", [])) + parts
+    return summary
+
+
+def remove_orphans(group_id: str, summary: dict | None):
+    """Elimina las partes que no figuran en el resumen (compactaciones interrumpidas)."""
+    valid = set((summary or {}).get("parts", []))
+    base = archive_dir(group_id)
+    if not base.is_dir():
+        return
+    for path in base.glob("*/part-*.jsonl.gz"):
+        if str(path.relative_to(base)) not in valid:
+            path.unlink()
+
+
+def iter_archived(group_id: str, summary: dict | None, since: datetime | None = None) -> Iterator[dict]:
+    """
+    Recorre los registros archivados en orden de archivo. Con 'since' se saltan
+    las partes de meses completamente anteriores.
+    """
+    if not summary:
+        return
+    if since is not None and summary.get("last_ts") and datetime.fromisoformat(summary["last_ts"]) < since:
+        return
+    min_month = since.strftime("%Y-%m") if since is not None else None
+    base = archive_dir(group_id)
+    for relative in summary.get("parts", []):
+        if min_month is not None and relative.split("/", 1)[0] < min_month:
+            continue
+        with gzip.open(base / relative, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_archived_reversed(group_id: str, summary: dict | None) -> Iterator[dict]:
+    """Recorre los registros archivados desde el más reciente (parte a parte)."""
+    if not summary:
+        return
+    base = archive_dir(group_id)
+    for relative in reversed(summary.get("parts", [])):
+        with gzip.open(base / relative, "rt", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        yield from reversed(records)
+
+
+def move(old_group_id: str, new_group_id: str):
+    old = archive_dir(old_group_id)
+    if old.exists():
+        old.rename(archive_dir(new_group_id))
+
+
+def delete(group_id: str):
+    shutil.rmtree(archive_dir(group_id), ignore_errors=True)
@@ -1,23 +1,19 @@
-import yaml
 import json
 from pathlib import Path
 from datetime import datetime
 
 from app.models.chat import ChatMessageIn, ChatDelivery
+from app.services.profile_registry import registry as profile_registry
 from i18n.detect import detect_lang
 from renderer import interlingua, localize
 
-PROFILES_DIR = Path("profiles")
 CHAT_DIR = Path("local_bundle/chat")
 
 
 def _load_profiles():
-    """Loads user and group profiles from YAML files."""
-    with open(PROFILES_DIR / "users.yaml", "r") as f:
-        users = yaml.safe_load(f)
-    with open(PROFILES_DIR / "groups.yaml", "r") as f:
-        groups = yaml.safe_load(f)
-    return users, groups
+    """Returns the (shared, read-only) user and group profiles from the profile registry."""
+    snapshot = profile_registry.snapshot()
+    return snapshot.users, snapshot.groups
 
 
 def send_message(message: ChatMessageIn):
@@ -0,0 +1,72 @@
+"""
+Registro de vistas derivadas del log de cada grupo (agregadores, índices...).
+
+Una vista se construye recorriendo el log una vez y después se mantiene al día
+con los registros que persiste la ingesta. Cada vista queda asociada a la firma en
+disco del grupo con la que es coherente: si el fichero cambia por otra vía (otro
+proceso, compactación, migración...) la vista se descarta y se reconstruye en la
+siguiente consulta.
+
+Las vistas deben implementar 'extend(records)', que recibe registros en orden de log.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+from ..core.config import STATE_CACHE_MAX_ENTRIES
+
+
+class ViewRegistry:
+    def __init__(self, factory: Callable[[], object], max_entries: int = STATE_CACHE_MAX_ENTRIES):
+        self.factory = factory
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._views: OrderedDict[str, tuple[tuple, object]] = OrderedDict()
+
+    def use(self, group_id: str, signature: tuple, load_log: Callable[[], Iterable[dict]],
+            fn: Callable, is_valid: Callable | None = None):
+        """
+        Ejecuta fn(vista) bajo el candado del registro con la vista coherente con
+        'signature', construyéndola con 'load_log' si no existe o no es válida.
+        """
+        with self.lock:
+            entry = self._views.get(group_id)
+            if entry is not None and entry[0] == signature and (is_valid is None or is_valid(entry[1])):
+                self._views.move_to_end(group_id)
+                return fn(entry[1])
+
+        view = self.factory()
+        view.extend(load_log())
+        with self.lock:
+            self._views[group_id] = (signature, view)
+            self._views.move_to_end(group_id)
+            while len(self._views) > self.max_entries:
+                self._views.popitem(last=False)
+            return fn(view)
+
+    def is_current(self, group_id: str, signature: tuple) -> bool:
+        """Indica si hay una vista del grupo coherente con 'signature' (sin construirla)."""
+        with self.lock:
+            entry = self._views.get(group_id)
+            return entry is not None and entry[0] == signature
+
+    def observe_records(self, group_id: str, previous_signature: tuple | None,
+                        new_signature: tuple | None, records: list[dict]):
+        """
+        Alimenta la vista con los registros recién persistidos. Solo se aplica si la
+        vista estaba al día con el fichero justo antes de esta escritura; si no, se
+        descarta y se reconstruirá en la próxima consulta.
+        """
+        with self.lock:
+            entry = self._views.get(group_id)
+            if entry is None:
+                return
+            if entry[0] != previous_signature or new_signature is None:
+                del self._views[group_id]
+                return
+            entry[1].extend(records)
+            self._views[group_id] = (new_signature, entry[1])
+
+    def invalidate(self, group_id: str):
+        with self.lock:
+            self._views.pop(group_id, None)
@@ -0,0 +1,95 @@
+"""
+Bus de eventos en proceso para el canal de eventos de los grupos (GET /groups/{id}/events).
+
+La ingesta publica, desde el hilo del escritor del grupo, los registros derivados
+(alertas, sugerencias, resúmenes) y las métricas tras cada escritura. Cada conexión
+tiene su propia cola acotada en el bucle de asyncio: si el cliente no consume a
+tiempo, la cola se vacía y se sustituye por una marca de re-sincronización, de
+modo que una conexión lenta nunca retiene memoria ni frena la ingesta (el
+manejador recupera lo perdido del log a partir de su cursor).
+"""
+import asyncio
+import logging
+import threading
+
+# Marca que sustituye a los eventos descartados de una conexión desbordada.
+RESYNC = {"event": "resync"}
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_pending: int):
+        self.loop = loop
+        self.max_pending = max_pending
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.overflowed = False
+        self.dropped = 0
+
+    def _offer(self, event: dict):
+        # Se ejecuta en el bucle de la conexión.
+        if self.overflowed:
+            self.dropped += 1
+            return
+        if self.queue.qsize() >= self.max_pending:
+            self.overflowed = True
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            return
+        self.queue.put_nowait(event)
+
+    def offer(self, event: dict):
+        """Entrega un evento desde cualquier hilo."""
+        try:
+            self.loop.call_soon_threadsafe(self._offer, event)
+        except RuntimeError:
+            pass  # El bucle ya se cerró: la conexión está terminando.
+
+    def resynced(self):
+        self.overflowed = False
+
+
+class EventBus:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self.published = 0
+
+    def subscribe(self, group_id: str, loop: asyncio.AbstractEventLoop, max_pending: int) -> Subscription:
+        subscription = Subscription(loop, max_pending)
+        with self.lock:
+            self._subscriptions.setdefault(group_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, group_id: str, subscription: Subscription):
+        with self.lock:
+            subscriptions = self._subscriptions.get(group_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[group_id]
+        if subscription.dropped:
+            logging.info(f"[{group_id}] Conexión de eventos cerrada con {subscription.dropped} eventos descartados por contrapresión.")
+
+    def has_subscribers(self, group_id: str) -> bool:
+        return group_id in self._subscriptions
+
+    def publish(self, group_id: str, events: list[dict]):
+        with self.lock:
+            subscriptions = list(self._subscriptions.get(group_id, ()))
+        for subscription in subscriptions:
+            for event in events:
+                subscription.offer(event)
+        self.published += len(events)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "groups": len(self._subscriptions),
+                "connections": sum(len(s) for s in self._subscriptions.values()),
+                "published": self.published,
+            }
+
+
+bus = EventBus()
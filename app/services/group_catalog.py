@@ -0,0 +1,124 @@
+"""
+Catálogo de grupos: un índice SQLite pequeño con lo que necesita el listado de
+proyectos, para que GET /groups no tenga que leer la memoria de cada grupo.
+
+Por grupo guarda la última modificación, el número de mensajes (archivo frío
+incluido), el ts de la última alerta y el del último resumen diario. Lo mantienen
+las operaciones del servicio (crear, renombrar, eliminar, ingerir, resumir...),
+desde cualquier proceso: SQLite en modo WAL coordina las escrituras. Si falta una
+entrada (catálogo nuevo o grupo copiado a mano) se calcula y se añade; el
+comando scripts/rebuild_catalog.py lo reconstruye entero en paralelo.
+"""
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+CATALOG_PATH = ROOT_DIR / "local_bundle/catalog.sqlite"
+
+COLUMNS = ("group_id", "last_modified", "message_count", "last_alert_ts", "last_summary_ts")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    group_id TEXT PRIMARY KEY,
+    last_modified TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_alert_ts TEXT,
+    last_summary_ts TEXT
+)
+"""
+
+_initialized: set[Path] = set()
+_init_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    path = CATALOG_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=10, isolation_level=None)
+    with _init_lock:
+        if path not in _initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            _initialized.add(path)
+    return connection
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def get(group_id: str) -> dict | None:
+    with closing(_connect()) as connection:
+        row = connection.execute(f"SELECT {', '.join(COLUMNS)} FROM groups WHERE group_id = ?", (group_id,)).fetchone()
+    return dict(zip(COLUMNS, row)) if row else None
+
+
+def list_entries() -> list[dict]:
+    """Entradas del catálogo, de la modificación más reciente a la más antigua."""
+    with closing(_connect()) as connection:
+        rows = connection.execute(f"SELECT {', '.join(COLUMNS)} FROM groups ORDER BY last_modified DESC").fetchall()
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+def put(entry: dict):
+    """Inserta o sustituye la entrada completa de un grupo."""
+    entry = {"message_count": 0, "last_alert_ts": None, "last_summary_ts": None, "last_modified": _now(), **entry}
+    with closing(_connect()) as connection:
+        connection.execute(
+            f"INSERT OR REPLACE INTO groups ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+            tuple(entry[column] for column in COLUMNS),
+        )
+
+
+def put_many(entries: list[dict]):
+    with closing(_connect()) as connection:
+        connection.execute("BEGIN")
+        connection.executemany(
+            f"INSERT OR REPLACE INTO groups ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+            [tuple(entry.get(column) for column in COLUMNS) for entry in entries],
+        )
+        connection.execute("COMMIT")
+
+
+def record_write(group_id: str, messages: int = 0, last_alert_ts: str | None = None,
+                 last_summary_ts: str | None = None) -> bool:
+    """
+    Actualiza la entrada de un grupo tras una escritura. Devuelve False si el grupo
+    no figura en el catálogo (quien llama debe calcular la entrada completa).
+    """
+    with closing(_connect()) as connection:
+        cursor = connection.execute(
+            """
+            UPDATE groups SET
+                last_modified = ?,
+                message_count = message_count + ?,
+                last_alert_ts = COALESCE(MAX(last_alert_ts, ?), last_alert_ts, ?),
+                last_summary_ts = COALESCE(?, last_summary_ts)
+            WHERE group_id = ?
+            """,
+            (_now(), messages, last_alert_ts, last_alert_ts, last_summary_ts, group_id),
+        )
+        return cursor.rowcount > 0
+
+
+def rename(old_group_id: str, new_group_id: str):
+    with closing(_connect()) as connection:
+        connection.execute("UPDATE groups SET group_id = ?, last_modified = ? WHERE group_id = ?",
+                           (new_group_id, _now(), old_group_id))
+
+
+def delete(group_id: str):
+    with closing(_connect()) as connection:
+        connection.execute("DELETE FROM groups WHERE group_id = ?", (group_id,))
+
+
+def retain(group_ids: set[str]):
+    """Elimina las entradas de grupos que ya no existen."""
+    with closing(_connect()) as connection:
+        known = {row[0] for row in connection.execute("SELECT group_id FROM groups")}
+        stale = known - group_ids
+        if stale:
+            connection.executemany("DELETE FROM groups WHERE group_id = ?", [(group_id,) for group_id in stale])
@@ -0,0 +1,104 @@
+"""
+Canal de eventos de un grupo en formato Server-Sent Events.
+
+Cada conexión recibe:
+  - 'alert', 'suggestion' y 'daily_summary' con el registro del log como datos y
+    su msg_id como 'id' (el navegador lo devuelve en Last-Event-ID al reconectar);
+  - 'metrics' cuando cambian las métricas en tiempo real del grupo (sin 'id').
+
+Los eventos llegan del bus en cuanto la ingesta persiste un lote. Al conectar con
+un cursor, y cada vez que la conexión se desborda, se recupera del log lo posterior
+al cursor. En cada latido se comprueba además la firma en disco del grupo, para
+recoger lo escrito por otros procesos (p. ej. scripts/run_daily_summaries.py) y el
+deslizamiento de las ventanas de las métricas.
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import AsyncIterator
+
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import EVENTS_HEARTBEAT_SECONDS, EVENTS_QUEUE_MAX, EVENTS_REPLAY_MAX
+from . import event_bus
+from . import group_service
+from . import group_store
+
+
+def format_event(event: str, data, event_id: str | None = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+def _signature(group_id: str) -> tuple | None:
+    return group_store.storage_signature(group_service.get_group_memory_path(group_id))
+
+
+async def stream_events(group_id: str, cursor: str | None = None) -> AsyncIterator[str]:
+    """
+    Genera el flujo SSE de un grupo. Sin cursor solo se envían los eventos que se
+    produzcan a partir de la conexión.
+    """
+    subscription = event_bus.bus.subscribe(group_id, asyncio.get_running_loop(), EVENTS_QUEUE_MAX)
+    if cursor is None:
+        cursor = datetime.utcnow().isoformat()
+    sent_ids: set[str] = set()
+    last_metrics = None
+    signature = None
+
+    async def catch_up():
+        """Registros posteriores al cursor y métricas actuales, leídos de disco."""
+        nonlocal cursor, last_metrics, signature
+        signature = await run_in_threadpool(_signature, group_id)
+        chunks = []
+        for record in await run_in_threadpool(group_service.events_after, group_id, cursor, EVENTS_REPLAY_MAX):
+            if record.get("msg_id") in sent_ids:
+                continue
+            chunks.append(format_event(record["type"], record, record.get("msg_id")))
+            sent_ids.add(record.get("msg_id"))
+            cursor = record.get("msg_id") or cursor
+        metrics = await run_in_threadpool(group_service.get_group_metrics, group_id)
+        if metrics != last_metrics:
+            chunks.append(format_event("metrics", metrics))
+            last_metrics = metrics
+        return chunks
+
+    try:
+        for chunk in await catch_up():
+            yield chunk
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Latido: cambios de otros procesos y ventanas de métricas que se deslizan.
+                if await run_in_threadpool(_signature, group_id) != signature:
+                    for chunk in await catch_up():
+                        yield chunk
+                else:
+                    metrics = await run_in_threadpool(group_service.get_group_metrics, group_id)
+                    if metrics != last_metrics:
+                        last_metrics = metrics
+                        yield format_event("metrics", metrics)
+                yield ": keepalive\n\n"
+                continue
+
+            if event is event_bus.RESYNC:
+                subscription.resynced()
+                for chunk in await catch_up():
+                    yield chunk
+            elif event["event"] == "metrics":
+                signature = event["signature"]
+                if event["data"] != last_metrics:
+                    last_metrics = event["data"]
+                    yield format_event("metrics", last_metrics)
+            elif event["id"] not in sent_ids:
+                sent_ids.add(event["id"])
+                cursor = event["id"]
+                yield format_event(event["event"], event["data"], event["id"])
+            if len(sent_ids) > 4 * EVENTS_REPLAY_MAX:
+                sent_ids = {cursor}
+    finally:
+        event_bus.bus.unsubscribe(group_id, subscription)
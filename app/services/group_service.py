@@ -1,17 +1,38 @@
 import os
+import copy
+import sqlite3
+import shutil
 import yaml
 import logging
 from pathlib import Path
 import statistics
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from itertools import chain
+from typing import Iterable, Iterator
 from filelock import FileLock, Timeout
 
 from ..models import schemas
+from . import affect_rollups
 from . import analyzer
+from . import archive
+from . import event_bus
+from . import group_catalog
+from . import group_store
+from . import group_writer
+from . import storage_codec
+from . import summarizer
+from . import user_stats_table
+from . import metrics_aggregator
+from . import pause_detector
+from . import profile_registry
+from . import time_index
+from .rolling import from_epoch_us, to_epoch_us
+from .state_cache import cache as state_cache
 from ..core.utils import validate_group_id
+from ..core.config import GROUP_STORAGE_MODE, HOT_RETENTION_DAYS, METRICS_BUILD_WORKERS
 from ..core.policies import AROUSAL_SPIKE_THRESHOLD
 
-from functools import lru_cache
 # Constantes para la política de sugerencia de pausa
 SUSTAINED_AROUSAL_WINDOW_MIN = 60  # Analizar la última hora
 SUSTAINED_AROUSAL_SUB_WINDOWS = 3  # Dividida en 3 sub-ventanas de 20 min
@@ -19,6 +40,25 @@ SUSTAINED_AROUSAL_THRESHOLD = 1.4  # Umbral para tensión sostenida (ligeramente
 PAUSE_SUGGESTION_COOLDOWN_MIN = 30 # No sugerir una pausa más de una vez cada 30 minutos
 DEFAULT_PAUSE_DURATION_MIN = 5     # Duración por defecto de la pausa sugerida
 
+# Historial afectivo: ventana máxima servida punto a punto (por mensaje)
+AFFECTIVE_HISTORY_RAW_MAX_HOURS = 168
+
+# Resúmenes por período (semana que empieza en lunes o mes natural, en UTC)
+SUMMARY_PERIODS = ("week", "month")
+
+# Tipos de registro que se envían por el canal de eventos del grupo
+EVENT_RECORD_TYPES = ("alert", "suggestion", "daily_summary")
+
+# Reproceso del log (backfill)
+BACKFILL_CHUNK = 1000                # Registros analizados por lote
+BACKFILL_ATTEMPTS = 3                # Reintentos si el grupo cambia mientras se reprocesa
+BACKFILL_DERIVED_TYPES = ("alert", "suggestion")  # Registros que se regeneran
+
+# Detectores incrementales de tensión sostenida, uno por grupo con ingestas recientes.
+pause_detectors = pause_detector.DetectorRegistry(
+    lambda: pause_detector.SustainedArousalDetector(SUSTAINED_AROUSAL_WINDOW_MIN, SUSTAINED_AROUSAL_SUB_WINDOWS)
+)
+
 # Directorio donde se guardará la memoria persistente.
 # Debe estar fuera del código fuente, como se especifica en la arquitectura.
 ROOT_DIR = Path(__file__).resolve().parent.parent.parent
@@ -33,29 +73,42 @@ PROFILES_DIR.mkdir(exist_ok=True)
 TEMPLATES_DIR = ROOT_DIR / "templates"
 TEMPLATES_DIR.mkdir(exist_ok=True)
 
-@lru_cache(maxsize=16)
 def _load_group_profile(group_id: str) -> dict:
-    """Carga el perfil completo de un grupo desde profiles/groups.yaml."""
-    profiles_path = PROFILES_DIR / "groups.yaml"
-    if not profiles_path.exists():
-        return {}
-    try:
-        with open(profiles_path, "r", encoding="utf-8") as f:
-            all_groups = yaml.safe_load(f) or {}
-        return all_groups.get(group_id, {})
-    except (IOError, yaml.YAMLError):
-        return {}
+    """Perfil completo de un grupo según profiles/groups.yaml (registro de perfiles en memoria)."""
+    return profile_registry.registry.group(group_id)
 
-@lru_cache(maxsize=16)
 def _load_group_settings(group_id: str) -> dict:
-    """Carga la sección 'companion_settings' de un grupo."""
-    profile = _load_group_profile(group_id)
-    return profile.get("companion_settings", {})
+    """Sección 'companion_settings' de un grupo."""
+    return profile_registry.registry.group_settings(group_id)
+
+def _invalidate_views(group_id: str):
+    """Descarta las vistas derivadas en memoria de un grupo (agregadores, índices, detectores)."""
+    for registry in (metrics_aggregator.registry, time_index.registry, pause_detectors):
+        registry.invalidate(group_id)
 
 def get_group_memory_path(group_id: str) -> Path:
-    """Construye la ruta al fichero YAML de memoria para un grupo."""
+    """
+    Construye la ruta al fichero principal de memoria de un grupo: el existente
+    (YAML o JSON, según su códec) o, para un grupo nuevo, el del códec por defecto.
+    """
     validate_group_id(group_id)
-    return MEMORY_DIR / f"{group_id}.yaml"
+    default_path = MEMORY_DIR / f"{group_id}{storage_codec.DEFAULT_CODEC.suffix}"
+    if default_path.exists():
+        return default_path
+    for suffix in storage_codec.SUFFIXES:
+        candidate = MEMORY_DIR / f"{group_id}{suffix}"
+        if candidate.exists():
+            return candidate
+    return default_path
+
+def get_group_lock_path(group_id: str) -> Path:
+    """Fichero de bloqueo del grupo (mismo nombre sea cual sea su códec)."""
+    validate_group_id(group_id)
+    return MEMORY_DIR / f"{group_id}.yaml.lock"
+
+def list_group_files() -> list[Path]:
+    """Ficheros principales de todos los grupos, en cualquier códec."""
+    return [p for suffix in storage_codec.SUFFIXES for p in MEMORY_DIR.glob(f"*{suffix}")]
 
 def create_group(group_id: str, template: str | None = None) -> Path:
     """
@@ -73,7 +126,7 @@ def create_group(group_id: str, template: str | None = None) -> Path:
         try:
             if templates_file.exists():
                 with open(templates_file, "r", encoding="utf-8") as f:
-                    all_templates = yaml.safe_load(f) or {}
+                    all_templates = storage_codec.load_yaml(f) or {}
                 initial_state = all_templates.get(template, {}).copy() # Usar una copia
             else:
                 initial_state = {}
@@ -87,12 +140,14 @@ def create_group(group_id: str, template: str | None = None) -> Path:
     initial_state.setdefault("meta", {})["created"] = datetime.utcnow().isoformat()
     initial_state.setdefault("log", [])
     initial_state.setdefault("user_stats", {})
+    if GROUP_STORAGE_MODE == group_store.STORAGE_SEGMENTED:
+        initial_state["meta"]["storage"] = group_store.STORAGE_SEGMENTED
 
     try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            yaml.dump(initial_state, f, default_flow_style=False, allow_unicode=True)
+        _write_state(filepath, initial_state)
     except IOError as e:
         raise IOError(f"No se pudo crear el fichero del proyecto: {e}") from e
+    group_catalog.put(catalog_entry(group_id))
 
     return filepath
 
@@ -101,13 +156,20 @@ def delete_group(group_id: str):
     Elimina de forma segura el fichero de memoria de un grupo y su fichero de bloqueo.
     """
     filepath = get_group_memory_path(group_id)
-    lock_path = filepath.with_suffix(".yaml.lock")
+    lock_path = get_group_lock_path(group_id)
 
     if not filepath.exists():
         raise FileNotFoundError(f"El proyecto '{group_id}' no existe.")
 
+    state_cache.bump_generation(group_id)
+    _invalidate_views(group_id)
     try:
         filepath.unlink()
+        shutil.rmtree(group_store.segments_dir(filepath), ignore_errors=True)
+        user_stats_table.delete(filepath)
+        affect_rollups.delete(filepath)
+        archive.delete(group_id)
+        group_catalog.delete(group_id)
         if lock_path.exists():
             lock_path.unlink()
     except IOError as e:
@@ -119,231 +181,1178 @@ def rename_group(old_group_id: str, new_group_id: str):
     y actualizando su contenido interno.
     """
     old_filepath = get_group_memory_path(old_group_id)
-    new_filepath = get_group_memory_path(new_group_id)
-    old_lock_path = old_filepath.with_suffix(".yaml.lock")
+    old_lock_path = get_group_lock_path(old_group_id)
 
     if not old_filepath.exists():
         raise FileNotFoundError(f"El proyecto original '{old_group_id}' no existe.")
-    if new_filepath.exists():
+    if get_group_memory_path(new_group_id).exists():
         raise FileExistsError(f"Ya existe un proyecto con el nombre '{new_group_id}'.")
+    # El proyecto renombrado conserva su códec.
+    new_filepath = MEMORY_DIR / f"{new_group_id}{old_filepath.suffix}"
+    codec = storage_codec.codec_for(old_filepath)
 
     try:
         with FileLock(old_lock_path, timeout=5):
             # Leer el contenido, actualizar el metadato y escribir en el nuevo fichero
-            with open(old_filepath, "r", encoding="utf-8") as f:
-                state = yaml.safe_load(f) or {}
+            state = codec.load(old_filepath) or {}
 
             state.setdefault("meta", {})["group_id"] = new_group_id
 
-            with open(new_filepath, "w", encoding="utf-8") as f:
-                yaml.dump(state, f, default_flow_style=False, allow_unicode=True)
+            # En modo segmentado el log viaja con su directorio de segmentos.
+            old_segments = group_store.segments_dir(old_filepath)
+            if old_segments.exists():
+                old_segments.rename(group_store.segments_dir(new_filepath))
+            user_stats_table.move(old_filepath, new_filepath)
+            affect_rollups.move(old_filepath, new_filepath)
+            archive.move(old_group_id, new_group_id)
+
+            codec.dump(state, new_filepath)
 
             # Si la escritura fue exitosa, eliminar el fichero antiguo
             old_filepath.unlink()
+            group_catalog.rename(old_group_id, new_group_id)
+            state_cache.bump_generation(old_group_id)
+            state_cache.bump_generation(new_group_id)
+            _invalidate_views(old_group_id)
+            _invalidate_views(new_group_id)
 
     except Timeout:
         raise IOError(f"No se pudo bloquear el proyecto '{old_group_id}' para renombrarlo.")
-    except (IOError, yaml.YAMLError) as e:
+    except (IOError, *storage_codec.DecodeError) as e:
         raise IOError(f"Error de E/S al renombrar el proyecto: {e}") from e
 
-def persist_message(group_id: str, message: schemas.MessageIngest):
+def _new_state(group_id: str) -> dict:
+    """Estado vacío para un grupo que aún no tiene memoria persistida."""
+    state = {"meta": {"group_id": group_id, "created": datetime.utcnow().isoformat()}, "log": [], "user_stats": {}}
+    if GROUP_STORAGE_MODE == group_store.STORAGE_SEGMENTED:
+        state["meta"]["storage"] = group_store.STORAGE_SEGMENTED
+    return state
+
+def _read_state_for_write(group_id: str, filepath: Path) -> dict:
+    """
+    Carga el estado que se va a modificar durante una ingesta.
+    En modo segmentado solo se trae la cola reciente del log que necesitan las
+    políticas (la ventana de tensión sostenida), no el historial completo.
+    """
+    state = {}
+    if filepath.exists():
+        try:
+            state = storage_codec.codec_for(filepath).load(filepath) or {}
+        except storage_codec.DecodeError as e:
+            logging.error(f"Fichero de memoria corrupto para group_id={group_id}: {e}. Se creará uno nuevo.")
+            # Opcional: mover el fichero corrupto a una carpeta de cuarentena
+
+    if not state:
+        state = _new_state(group_id)
+
+    if group_store.is_segmented(state):
+        since_ts = datetime.utcnow() - timedelta(minutes=SUSTAINED_AROUSAL_WINDOW_MIN)
+        state["log"] = group_store.read_tail(group_store.segments_dir(filepath), since_ts)
+        legacy_user_stats = state.pop("user_stats", None)
+        table = user_stats_table.open_table(filepath)
+        if legacy_user_stats is not None and filepath.exists():
+            # Cabecera anterior a la tabla compacta: se traslada una sola vez.
+            table.replace(legacy_user_stats)
+            user_stats_table.remember(table)
+            storage_codec.codec_for(filepath).dump(state_header(state), filepath)
+        state["user_stats"] = user_stats_table.PendingStats(table)
+    return state
+
+def state_header(state: dict) -> dict:
+    """Cabecera de un grupo segmentado: el estado sin el log ni las estadísticas por usuario."""
+    return {key: value for key, value in state.items() if key not in ("log", "user_stats")}
+
+def _write_state(filepath: Path, state: dict, persisted_count: int = 0, write_header: bool = True):
+    """
+    Guarda el estado de un grupo con el códec de su fichero.
+    En modo de fichero único se reescribe el fichero completo. En modo segmentado solo se anexan
+    los registros del log a partir de 'persisted_count', si 'write_header' se reescribe la cabecera
+    y, por último, se vuelcan las estadísticas por usuario a su tabla compacta.
+    """
+    if group_store.is_segmented(state):
+        log = state.get("log", [])
+        group_store.append_records(group_store.segments_dir(filepath), log[persisted_count:])
+        if write_header or not filepath.exists():
+            storage_codec.codec_for(filepath).dump(state_header(state), filepath)
+        # Las estadísticas se vuelcan al final: si algo de lo anterior falla, la tabla no avanza.
+        user_stats = state.get("user_stats")
+        if isinstance(user_stats, user_stats_table.PendingStats):
+            user_stats.commit()
+            user_stats_table.remember(user_stats.table)
+        elif user_stats is not None:
+            table = user_stats_table.open_table(filepath)
+            table.replace(user_stats)
+            user_stats_table.remember(table)
+    else:
+        storage_codec.codec_for(filepath).dump(state, filepath)
+    state_cache.bump_generation(filepath.stem)
+
+def _persisted_log_loader(filepath: Path, state: dict, persisted_count: int):
+    """Cargador del log ya persistido para construir vistas derivadas durante una ingesta."""
+    if group_store.is_segmented(state):
+        return lambda: group_store.iter_records(group_store.segments_dir(filepath))
+    return lambda: state["log"][:persisted_count]
+
+def _records_since(group_id: str, filepath: Path, since_us: int, state: dict | None = None) -> Iterator[dict]:
+    """
+    Registros persistidos con ts >= since_us (archivo frío incluido si llega tan atrás).
+    En modo segmentado solo se lee la cola del log que indica el índice de tiempo.
+    'state' evita releer un grupo de fichero único que ya está en memoria.
+    """
+    since_ts = from_epoch_us(since_us)
+    header = state if state is not None else get_group_header(group_id) or {}
+    summary = header.get("meta", {}).get("archive")
+    if summary and datetime.fromisoformat(summary["last_ts"]) >= since_ts:
+        yield from archive.iter_archived(group_id, summary, since=since_ts)
+    if group_store.is_segmented(header):
+        seg_dir = group_store.segments_dir(filepath)
+        signature = group_store.storage_signature(filepath)
+        # El índice de tiempo dice cuántos registros del final cubren todos los de
+        # ts >= since_us, también los que llegaron desordenados.
+        log = group_store.read_last(seg_dir, _query_time_index(group_id, lambda index: index.tail_length(since_us)) or 0)
+        if group_store.storage_signature(filepath) != signature:
+            # Otra escritura entretanto: el recuento ya no corresponde al final del log.
+            log = group_store.iter_records(seg_dir)
+    else:
+        log = (state if state is not None else get_group_state(group_id) or {}).get("log", [])
+    for record in log:
+        try:
+            if to_epoch_us(record.get("ts", "")) >= since_us:
+                yield record
+        except (ValueError, TypeError):
+            continue
+
+def _all_records(group_id: str, filepath: Path, state: dict) -> Iterator[dict]:
+    """Log completo persistido (archivo frío y nivel caliente) de un estado cargado para escritura."""
+    yield from archive.iter_archived(group_id, state.get("meta", {}).get("archive"))
+    if group_store.is_segmented(state):
+        yield from group_store.iter_records(group_store.segments_dir(filepath))
+    else:
+        yield from state.get("log", [])
+
+def catalog_entry(group_id: str) -> dict | None:
+    """
+    Calcula desde el almacenamiento la entrada del catálogo de un grupo. Los mensajes
+    archivados se cuentan con el resumen de meta.archive; el nivel caliente se recorre.
+    """
+    filepath = get_group_memory_path(group_id)
+    header = get_group_header(group_id)
+    if header is None:
+        return None
+    meta = header.get("meta", {})
+    message_count = (meta.get("archive") or {}).get("counts_by_type", {}).get("message", 0)
+    last_alert_ts = last_summary_ts = None
+    for record in iter_log(group_id, include_archive=False):
+        record_type = record.get("type")
+        if record_type == "message":
+            message_count += 1
+        elif record_type == "alert":
+            last_alert_ts = max(filter(None, (last_alert_ts, record.get("ts"))), default=None)
+        elif record_type == "daily_summary":
+            last_summary_ts = max(filter(None, (last_summary_ts, record.get("ts"))), default=None)
+    modified = max(p.stat().st_mtime for p in [filepath, *group_store.list_segments(group_store.segments_dir(filepath))[-1:]])
+    return {
+        "group_id": group_id,
+        "last_modified": datetime.utcfromtimestamp(modified).isoformat(),
+        "message_count": message_count,
+        "last_alert_ts": last_alert_ts,
+        "last_summary_ts": meta.get("last_daily_summary_ts") or last_summary_ts,
+    }
+
+def list_catalog() -> list[dict]:
+    """
+    Entradas del catálogo de los grupos presentes en disco, de la modificación más
+    reciente a la más antigua. Las que faltan se calculan y se añaden; las de grupos
+    que ya no existen se eliminan.
+    """
+    present = {p.stem for p in list_group_files()}
+    entries = {entry["group_id"]: entry for entry in group_catalog.list_entries()}
+    if entries.keys() - present:
+        group_catalog.retain(present)
+    for group_id in sorted(present - entries.keys()):
+        entry = catalog_entry(group_id)
+        if entry is not None:
+            group_catalog.put(entry)
+            entries[group_id] = entry
+    return sorted((entries[g] for g in present if g in entries), key=lambda e: e["last_modified"], reverse=True)
+
+def _catalog_record_write(group_id: str, records: list[dict], last_summary_ts: str | None = None):
+    """
+    Refleja en el catálogo de grupos los registros recién persistidos. 'last_summary_ts'
+    es el meta.last_daily_summary_ts escrito junto a ellos, que prevalece (como en
+    catalog_entry) sobre el ts de los registros de resumen.
+    """
+    alerts = [r["ts"] for r in records if r.get("type") == "alert" and r.get("ts")]
+    summaries = [r["ts"] for r in records if r.get("type") == "daily_summary" and r.get("ts")]
+    messages = sum(1 for r in records if r.get("type") == "message")
+    try:
+        if not group_catalog.record_write(group_id, messages, max(alerts, default=None),
+                                          last_summary_ts or max(summaries, default=None)):
+            group_catalog.put(catalog_entry(group_id))
+    except sqlite3.Error as e:
+        # El catálogo es un índice derivado: un fallo no debe perder la escritura ya hecha.
+        logging.error(f"[{group_id}] No se pudo actualizar el catálogo de grupos: {e}")
+
+def _publish_events(group_id: str, records: list[dict], signature: tuple | None):
+    """Publica en el canal de eventos los registros derivados de una escritura y las métricas resultantes."""
+    events = [{"event": r["type"], "id": r.get("msg_id"), "data": r} for r in records if r.get("type") in EVENT_RECORD_TYPES]
+    events.append({"event": "metrics", "data": get_group_metrics(group_id), "signature": signature})
+    event_bus.bus.publish(group_id, events)
+
+def events_after(group_id: str, cursor: str, limit: int) -> list[dict]:
+    """
+    Registros del canal de eventos posteriores a 'cursor' (msg_id de un evento o
+    timestamp ISO), leyendo el log desde el final. Si hay más de 'limit' se devuelven
+    los más recientes. Lanza FileNotFoundError si el grupo no existe.
+    """
+    parsed = _parse_log_cursor(cursor)
+    missed = []
+    for record in iter_log(group_id, reverse=True):
+        if record.get("type") not in EVENT_RECORD_TYPES:
+            continue
+        if parsed[0] == "id":
+            if record.get("msg_id") == parsed[1]:
+                break
+        else:
+            try:
+                if datetime.fromisoformat(record.get("ts", "")).replace(tzinfo=None) <= parsed[1]:
+                    break
+            except (ValueError, TypeError):
+                continue
+        missed.append(record)
+        if len(missed) >= limit:
+            break
+    missed.reverse()
+    return missed
+
+def spooled_msg_ids(group_id: str, since_seq: int) -> set[str]:
+    """
+    msg_id de los mensajes del nivel caliente que llegaron por la cola de ingesta con
+    nº de secuencia >= since_seq. Se lee el log desde el final y se para en el primer
+    mensaje de la cola anterior a 'since_seq'. Vacío si el grupo no existe.
+    """
+    found = set()
+    try:
+        for record in iter_log(group_id, reverse=True, include_archive=False):
+            seq = record.get("spool_seq")
+            if seq is None:
+                continue
+            if seq < since_seq:
+                break
+            found.add(record.get("msg_id"))
+    except FileNotFoundError:
+        pass
+    return found
+
+def _observe_persisted(group_id: str, previous_signature: tuple | None, new_signature: tuple | None, records: list[dict]):
+    """Propaga los registros recién persistidos a las vistas derivadas del grupo."""
+    for registry in (metrics_aggregator.registry, time_index.registry):
+        registry.observe_records(group_id, previous_signature, new_signature, records)
+
+def _apply_message(group_id: str, state: dict, message: schemas.MessageIngest, scores_since=None,
+                   raw_signals: dict | None = None, sustained_check=None,
+                   now: datetime | None = None, msg_id: str | None = None) -> schemas.MessageRecord:
+    """
+    Aplica un mensaje al estado en memoria: análisis afectivo, normalización EWMA,
+    alertas y políticas proactivas. Devuelve el registro del mensaje añadido.
+    'raw_signals' permite pasar las señales ya calculadas por lotes. Al reprocesar
+    un log, 'now' sustituye al reloj de pared y 'msg_id' conserva el id original.
+    """
+    # --- 1. Análisis Afectivo (Affective Proxy) ---
+    if raw_signals is None:
+        raw_signals = analyzer.calculate_raw_signals(message.text)
+
+    # --- 2. Normalización y actualización de estadísticas del usuario (EWMA) ---
+    # 'user_stats' es un dict o, en modo segmentado, los cambios pendientes sobre la tabla compacta del grupo.
+    user_id = message.author
+    user_stats = state.setdefault("user_stats", {})
+    stats = user_stats.get(user_id)
+    if stats is None:
+        stats = user_stats_table.new_stats()
+    alpha = 0.1  # Factor de suavizado, como en el libro blanco
+
+    # Actualizar medias y varianzas con EWMA
+    z_scores = {}
+    for key in ["arousal", "valence", "uncertainty"]:
+        # Usar .get() para evitar fallos si el analizador aún no provee todas las señales
+        raw_val = raw_signals.get(f"raw_{key}", 0.0) # <-- Cambio clave
+        # Actualizar media
+        stats[f"ewma_{key}"] = alpha * raw_val + (1 - alpha) * stats[f"ewma_{key}"]
+        # Actualizar varianza (usando la media de los cuadrados)
+        stats[f"ewma_{key}_sq"] = alpha * (raw_val ** 2) + (1 - alpha) * stats[f"ewma_{key}_sq"]
+
+        # Calcular Z-score
+        # Con valores repetidos la varianza puede quedar en -epsilon por redondeo.
+        std_dev = max(stats[f"ewma_{key}_sq"] - stats[f"ewma_{key}"] ** 2, 0.0) ** 0.5
+        z_scores[f"{key}_z"] = (raw_val - stats[f"ewma_{key}"]) / (std_dev + 1e-6) # Evitar división por cero
+
+    stats["count"] += 1
+    user_stats[user_id] = stats
+
+    # --- 3. Calcular Carga Emocional y preparar el registro ---
+    e_user = analyzer.calculate_emotional_load(z_scores["arousal_z"], z_scores["valence_z"], z_scores["uncertainty_z"])
+    affective_proxy_data = schemas.AffectiveProxy(**raw_signals, **z_scores, e_user=e_user)
+    record = schemas.MessageRecord(**message.model_dump(), actor=message.author, affective_proxy=affective_proxy_data)
+    if msg_id is not None:
+        record.msg_id = msg_id
+
+    record_data = record.model_dump(mode='json')
+    if isinstance(message, schemas.SpooledMessage):
+        # Permite reconocer el mensaje como ya persistido si la cola lo reentrega tras una caída.
+        record_data["spool_seq"] = message.spool_seq
+    state.setdefault("log", []).append(record_data)
+
+    # --- 4. Comprobar Políticas Éticas ---
+    if record.affective_proxy and record.affective_proxy.arousal_z > AROUSAL_SPIKE_THRESHOLD:
+        alert_details = schemas.AlertDetails(
+            value=round(record.affective_proxy.arousal_z, 4),
+            threshold=AROUSAL_SPIKE_THRESHOLD,
+            rationale="El nivel de excitación (arousal) del mensaje supera el umbral normalizado para este usuario."
+        )
+        alert_record = schemas.AlertRecord(trigger_ref=record.msg_id, details=alert_details)
+        if now is not None:
+            alert_record.ts = now
+        state["log"].append(alert_record.model_dump(mode='json'))
+
+    # --- 5. Comprobar Políticas Proactivas ---
+    # Esta función modificará el 'state' si es necesario.
+    check_and_suggest_pause(group_id, state, scores_since, sustained_check, now)
+
+    return record
+
+def _persist_batch(group_id: str, messages: list[schemas.MessageIngest]) -> list[dict]:
     """
-    Añade un mensaje al log de un grupo en su fichero YAML.
-    Utiliza un bloqueo de fichero para evitar condiciones de carrera.
+    Añade varios mensajes, en orden, al log de un grupo bajo un único bloqueo y con
+    una única escritura. Cada mensaje pasa por el análisis, la normalización y las
+    políticas viendo los efectos de los anteriores. Solo lo llama el escritor del
+    grupo; el FileLock coordina con otros procesos.
+    Devuelve, por mensaje, su msg_id y si generó una alerta o una sugerencia.
     """
     filepath = get_group_memory_path(group_id)
-    lock_path = filepath.with_suffix(".yaml.lock")
+    lock_path = get_group_lock_path(group_id)
 
     try:
         with FileLock(lock_path, timeout=5):
             # Carga el estado actual, o crea uno nuevo si no existe
-            state = {}
-            if filepath.exists():
-                try:
-                    with open(filepath, "r", encoding="utf-8") as f:
-                        state = yaml.safe_load(f) or {}
-                except yaml.YAMLError as e:
-                    logging.error(f"Fichero YAML corrupto para group_id={group_id}: {e}. Se creará uno nuevo.")
-                    # Opcional: mover el fichero corrupto a una carpeta de cuarentena
-
-            if not state:
-                state = { "meta": {"group_id": group_id, "created": datetime.utcnow().isoformat()}, "log": [], "user_stats": {} }
-
-            # --- 1. Análisis Afectivo (Affective Proxy) ---
-            raw_signals = analyzer.calculate_raw_signals(message.text)
-
-            # --- 2. Normalización y actualización de estadísticas del usuario (EWMA) ---
-            user_id = message.author
-            state.setdefault("user_stats", {}).setdefault(user_id, {
-                "ewma_arousal": 0.0, "ewma_valence": 0.0, "ewma_uncertainty": 0.0,
-                "ewma_arousal_sq": 0.0, "ewma_valence_sq": 0.0, "ewma_uncertainty_sq": 0.0,
-                "count": 0
-            })
-            stats = state["user_stats"][user_id]
-            alpha = 0.1  # Factor de suavizado, como en el libro blanco
-
-            # Actualizar medias y varianzas con EWMA
-            z_scores = {}
-            for key in ["arousal", "valence", "uncertainty"]:
-                # Usar .get() para evitar fallos si el analizador aún no provee todas las señales
-                raw_val = raw_signals.get(f"raw_{key}", 0.0) # <-- Cambio clave
-                # Actualizar media
-                stats[f"ewma_{key}"] = alpha * raw_val + (1 - alpha) * stats[f"ewma_{key}"]
-                # Actualizar varianza (usando la media de los cuadrados)
-                stats[f"ewma_{key}_sq"] = alpha * (raw_val ** 2) + (1 - alpha) * stats[f"ewma_{key}_sq"]
-
-                # Calcular Z-score
-                std_dev = (stats[f"ewma_{key}_sq"] - stats[f"ewma_{key}"] ** 2) ** 0.5
-                z_scores[f"{key}_z"] = (raw_val - stats[f"ewma_{key}"]) / (std_dev + 1e-6) # Evitar división por cero
-
-            stats["count"] += 1
-
-            # --- 3. Calcular Carga Emocional y preparar el registro ---
-            e_user = analyzer.calculate_emotional_load(z_scores["arousal_z"], z_scores["valence_z"], z_scores["uncertainty_z"])
-            affective_proxy_data = schemas.AffectiveProxy(**raw_signals, **z_scores, e_user=e_user)
-            record = schemas.MessageRecord(**message.model_dump(), actor=message.author, affective_proxy=affective_proxy_data)
-
-            state.setdefault("log", []).append(record.model_dump(mode='json'))
-
-            # --- 4. Comprobar Políticas Éticas ---
-            if record.affective_proxy and record.affective_proxy.arousal_z > AROUSAL_SPIKE_THRESHOLD:
-                alert_details = schemas.AlertDetails(
-                    value=round(record.affective_proxy.arousal_z, 4),
-                    threshold=AROUSAL_SPIKE_THRESHOLD,
-                    rationale="El nivel de excitación (arousal) del mensaje supera el umbral normalizado para este usuario."
-                )
-                alert_record = schemas.AlertRecord(trigger_ref=record.msg_id, details=alert_details)
-                state["log"].append(alert_record.model_dump(mode='json'))
-
-            # --- 5. Comprobar Políticas Proactivas ---
-            # Esta función modificará el 'state' si es necesario.
-            check_and_suggest_pause(group_id, state)
-
-            # Guarda el estado actualizado
-            with open(filepath, "w", encoding="utf-8") as f:
-                yaml.dump(state, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+            previous_signature = group_store.storage_signature(filepath)
+            state = _read_state_for_write(group_id, filepath)
+            persisted_count = len(state.get("log", []))
+            header_before = copy.deepcopy(state_header(state))
+
+            load_log = _persisted_log_loader(filepath, state, persisted_count)
+            scores_since = _indexed_scores_since(group_id, previous_signature, state, persisted_count, load_log)
+            detector = pause_detectors.checkout(group_id, previous_signature, load_log, to_epoch_us(datetime.utcnow()))
+            sustained_check, detector_catch_up = _streaming_sustained_check(detector, state, persisted_count)
+            signals = analyzer.calculate_raw_signals_batch([message.text for message in messages])
+            results = []
+            for i, message in enumerate(messages):
+                log_size = len(state.get("log", []))
+                raw_signals = {key: values[i] for key, values in signals.items()}
+                record = _apply_message(group_id, state, message, scores_since, raw_signals, sustained_check)
+                new_types = {r.get("type") for r in state["log"][log_size:]}
+                results.append({
+                    "msg_id": record.msg_id,
+                    "alert_raised": "alert" in new_types,
+                    "suggestion_raised": "suggestion" in new_types,
+                })
+
+            # Guarda el estado actualizado (la cabecera, solo si ha cambiado)
+            _write_state(filepath, state, persisted_count, write_header=state_header(state) != header_before)
+            new_signature = group_store.storage_signature(filepath)
+            try:
+                _observe_persisted(group_id, previous_signature, new_signature, state["log"][persisted_count:])
+                affect_rollups.observe(filepath, state["log"][persisted_count:],
+                                       lambda since_us: _records_since(group_id, filepath, since_us, state),
+                                       lambda: _all_records(group_id, filepath, state))
+                _catalog_record_write(group_id, state["log"][persisted_count:])
+                if event_bus.bus.has_subscribers(group_id):
+                    _publish_events(group_id, state["log"][persisted_count:], new_signature)
+                detector_catch_up()
+                pause_detectors.checkin(group_id, new_signature, detector)
+            except Exception:
+                # Los mensajes ya están en disco: el error no debe llegar al escritor, que
+                # reintentaría el lote y los duplicaría. Las vistas derivadas se descartan
+                # y los agregados se reconstruyen en la siguiente ingesta.
+                logging.exception(f"[{group_id}] Falló la actualización de las vistas derivadas tras persistir {len(messages)} mensajes.")
+                _invalidate_views(group_id)
+                affect_rollups.delete(filepath)
+            return results
 
     except Timeout:
         logging.error(f"No se pudo adquirir el bloqueo para el grupo {group_id} en 5 segundos.")
         raise
 
+writers = group_writer.GroupWriterRegistry(_persist_batch)
+
+def persist_message(group_id: str, message: schemas.MessageIngest) -> dict:
+    """Añade un mensaje al log de un grupo a través de su escritor único."""
+    return persist_messages(group_id, [message])[0]
+
+def persist_messages(group_id: str, messages: list[schemas.MessageIngest]) -> list[dict]:
+    """
+    Añade varios mensajes, en orden, al log de un grupo. Se encolan en el escritor
+    del grupo, que los agrupa con los envíos concurrentes en una sola escritura, y
+    se espera a que estén persistidos.
+    """
+    validate_group_id(group_id)
+    return writers.submit(group_id, messages).result()
+
+def _with_table_user_stats(filepath: Path, header: dict) -> dict:
+    """Completa una cabecera segmentada con las estadísticas por usuario de su tabla compacta."""
+    if user_stats_table.exists(filepath):
+        header["user_stats"] = user_stats_table.open_table(filepath).to_dict()
+    return header
+
+def _load_full_state(filepath: Path) -> dict | None:
+    """Estado completo con la forma YAML clásica {meta, log, user_stats}, sea cual sea el modo."""
+    state = storage_codec.codec_for(filepath).load(filepath)
+    if group_store.is_segmented(state):
+        state = group_store.assemble_state(_with_table_user_stats(filepath, state), group_store.segments_dir(filepath))
+    return state
+
 def get_group_state(group_id: str):
-    """Lee y devuelve el estado completo de un grupo desde su YAML."""
+    """
+    Lee y devuelve el estado completo de un grupo (forma YAML clásica), sea cual sea su códec.
+    Se sirve desde la caché compartida mientras el fichero no cambie; el estado
+    devuelto es compartido y no debe modificarse.
+    """
     filepath = get_group_memory_path(group_id)
-    if not filepath.exists():
+    generation = state_cache.generation(group_id)
+    signature = group_store.storage_signature(filepath)
+    if signature is None:
         return None
-    with open(filepath, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    state = state_cache.get(group_id, signature)
+    if state is not None:
+        return state
+
+    state = _load_full_state(filepath)
+    if state is not None:
+        state_cache.put(group_id, signature, state, group_store.storage_size(filepath), generation)
+    return state
 
-def get_affective_history(group_id: str, since_hours: int = 24) -> dict:
+def get_group_header(group_id: str) -> dict | None:
     """
-    Recupera el historial de 'arousal_z' de un grupo para un período determinado.
+    Devuelve el estado del grupo sin el log (meta, user_stats...).
+    En modo segmentado solo se lee la cabecera, sin tocar los segmentos.
     """
+    filepath = get_group_memory_path(group_id)
+    if group_store.segments_dir(filepath).is_dir():
+        try:
+            return _with_table_user_stats(filepath, storage_codec.codec_for(filepath).load(filepath) or {})
+        except FileNotFoundError:
+            return None
     state = get_group_state(group_id)
-    if not state or "log" not in state:
-        return {"history": []}
+    if state is None:
+        return None
+    return {key: value for key, value in state.items() if key != "log"}
 
-    history_points = []
-    since_ts = datetime.utcnow() - timedelta(hours=since_hours)
+def state_etag(group_id: str) -> str | None:
+    """
+    ETag fuerte del estado de un grupo, derivado solo de lo que hay en disco: la firma
+    de la cabecera y los segmentos y, en modo segmentado, la de la tabla de estadísticas.
+    Así es el mismo en todos los procesos y tras un reinicio. Solo hace 'stat', sin leer
+    el contenido. None si el grupo no existe.
+    """
+    filepath = get_group_memory_path(group_id)
+    signature = group_store.storage_signature(filepath)
+    if signature is None:
+        return None
+    signature += user_stats_table.file_signature(filepath) or ()
+    return f'"{"-".join(format(part, "x") for part in signature)}"'
 
-    for record in state.get("log", []):
-        if record.get("type") != "message" or "affective_proxy" not in record:
-            continue
+def iter_log(group_id: str, reverse: bool = False, include_archive: bool = True) -> Iterator[dict]:
+    """
+    Recorre el log del grupo (archivo frío y nivel caliente) en orden de log, o desde
+    el final con reverse=True. En modo segmentado los registros se leen en streaming,
+    sin materializar el log completo. Lanza FileNotFoundError si el grupo no existe.
+    """
+    header = get_group_header(group_id)
+    if header is None:
+        raise FileNotFoundError(f"El proyecto '{group_id}' no existe.")
+    summary = header.get("meta", {}).get("archive") if include_archive else None
+    seg_dir = group_store.segments_dir(get_group_memory_path(group_id))
+    segmented = seg_dir.is_dir()
+    hot_log = [] if segmented else (get_group_state(group_id) or {}).get("log", [])
 
-        try:
-            ts = datetime.fromisoformat(record["ts"]).replace(tzinfo=None)
-            if ts >= since_ts:
-                history_points.append({
-                    "ts": ts,
-                    "value": record["affective_proxy"]["arousal_z"]
-                })
-        except (ValueError, TypeError):
-            continue
+    def records():
+        if reverse:
+            yield from (group_store.iter_records_reversed(seg_dir) if segmented else reversed(hot_log))
+            yield from archive.iter_archived_reversed(group_id, summary)
+        else:
+            yield from archive.iter_archived(group_id, summary)
+            yield from (group_store.iter_records(seg_dir) if segmented else hot_log)
+    return records()
 
-    return {"history": history_points}
+def _parse_log_cursor(cursor: str | None) -> tuple[str, object] | None:
+    """Un cursor es un msg_id o un timestamp ISO."""
+    if cursor is None:
+        return None
+    try:
+        return ("ts", datetime.fromisoformat(cursor).replace(tzinfo=None))
+    except ValueError:
+        return ("id", cursor)
 
-def has_recent_alerts(group_id: str, since_hours: int = 24) -> bool:
+def select_log(group_id: str, after: str | None = None, before: str | None = None,
+               types: set[str] | None = None, reverse: bool = False) -> Iterator[dict]:
     """
-    Comprueba si un grupo tiene alertas en las últimas 'since_hours'.
-    Es una comprobación simple y sin estado, ideal para la UI.
+    Genera los registros del log entre los cursores 'after' y 'before' (exclusivos),
+    opcionalmente filtrados por tipo. Los cursores msg_id son posicionales; los de
+    timestamp filtran por ts. Con reverse=True se recorre desde el final.
+    """
+    records = iter_log(group_id, reverse=reverse)
+    after_cursor, before_cursor = _parse_log_cursor(after), _parse_log_cursor(before)
+    start_cursor, stop_cursor = (before_cursor, after_cursor) if reverse else (after_cursor, before_cursor)
+    after_ts = after_cursor[1] if after_cursor is not None and after_cursor[0] == "ts" else None
+    before_ts = before_cursor[1] if before_cursor is not None and before_cursor[0] == "ts" else None
+    if stop_cursor is not None and stop_cursor[0] == "id":
+        # El cursor de parada se comprueba ahora, recorriendo el log desde el otro extremo
+        # hasta él: si no existe, el error llega antes del primer registro.
+        if not any(record.get("msg_id") == stop_cursor[1] for record in iter_log(group_id, reverse=not reverse)):
+            raise LookupError(f"Cursor '{stop_cursor[1]}' no encontrado en el log.")
+
+    def selected():
+        started = start_cursor is None or start_cursor[0] == "ts"
+        for record in records:
+            if not started:
+                started = record.get("msg_id") == start_cursor[1]
+                continue
+            if stop_cursor is not None and stop_cursor[0] == "id" and record.get("msg_id") == stop_cursor[1]:
+                return
+            if after_ts is not None or before_ts is not None:
+                try:
+                    ts = datetime.fromisoformat(record.get("ts", "")).replace(tzinfo=None)
+                except (ValueError, TypeError):
+                    continue
+                if after_ts is not None and ts <= after_ts:
+                    continue
+                if before_ts is not None and ts >= before_ts:
+                    continue
+            if types and record.get("type") not in types:
+                continue
+            yield record
+        if not started:
+            raise LookupError(f"Cursor '{start_cursor[1]}' no encontrado en el log.")
+    return selected()
+
+def query_log(group_id: str, after: str | None = None, before: str | None = None,
+              limit: int = 100, types: set[str] | None = None) -> dict:
+    """
+    Devuelve una página del log en orden de log. Con 'after' se avanza hacia registros
+    más nuevos; si no, se devuelven los 'limit' más recientes anteriores a 'before'.
+    """
+    forward = after is not None
+    page = []
+    has_more = False
+    for record in select_log(group_id, after=after, before=before, types=types, reverse=not forward):
+        if len(page) == limit:
+            has_more = True
+            break
+        page.append(record)
+    if not forward:
+        page.reverse()
+    return {
+        "records": page,
+        "has_more": has_more,
+        "next_after": page[-1].get("msg_id") if page else after,
+        "next_before": page[0].get("msg_id") if page else before,
+    }
+
+def export_group_yaml(group_id: str) -> str | None:
+    """
+    Exporta la memoria completa de un grupo como documento YAML con la forma clásica
+    {meta, log, user_stats}, sea cual sea su modo de almacenamiento. El log exportado
+    incluye también los registros archivados.
     """
     state = get_group_state(group_id)
-    if not state or "log" not in state:
-        return False
+    if state is None:
+        return None
+    archived = list(archive.iter_archived(group_id, state.get("meta", {}).get("archive")))
+    if archived:
+        state = {**state, "log": archived + state.get("log", [])}
+    return storage_codec.dump_yaml(state)
 
-    since_ts = datetime.utcnow() - timedelta(hours=since_hours)
+def compact_group(group_id: str, keep_days: int = HOT_RETENTION_DAYS) -> dict:
+    """
+    Mueve al archivo frío los registros con más de 'keep_days' días y deja en
+    meta.archive un resumen con recuentos y rango temporal. Los endpoints de uso
+    continuo (ingesta, métricas, alertas) solo trabajan con el nivel caliente.
+    """
+    if keep_days < 1:
+        raise ValueError("La retención en caliente debe ser de al menos 1 día.")
+    filepath = get_group_memory_path(group_id)
+    if not filepath.exists():
+        raise FileNotFoundError(f"El proyecto '{group_id}' no existe.")
+    lock_path = get_group_lock_path(group_id)
+
+    try:
+        with FileLock(lock_path, timeout=30):
+            state = _load_full_state(filepath) or {}
+            segmented = group_store.is_segmented(state)
+            meta = state.setdefault("meta", {})
+            archive.remove_orphans(group_id, meta.get("archive"))
+
+            cutoff = datetime.utcnow() - timedelta(days=keep_days)
+            cold, hot = archive.split_by_cutoff(state.get("log", []), cutoff)
+            if not cold:
+                return {"group_id": group_id, "archived": 0, "hot": len(hot)}
+
+            # Los agregados de las horas que pasan al archivo se cierran antes de moverlas.
+            if affect_rollups.closed_through(filepath) is None:
+                affect_rollups.rebuild(filepath, lambda: _all_records(group_id, filepath, state))
+            affect_rollups.finalize(filepath, to_epoch_us(cutoff),
+                                    lambda since_us: _records_since(group_id, filepath, since_us, state))
+
+            # Primero las partes, después el estado caliente: si algo falla por el camino
+            # los registros quedan duplicados (nunca perdidos) o las partes, huérfanas.
+            run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+            parts = archive.write_parts(group_id, cold, run_id)
+            meta["archive"] = archive.merge_summary(meta.get("archive"), cold, parts)
+            state["log"] = hot
+            _write_state(filepath, state, persisted_count=len(hot))
+            if segmented:
+                group_store.rewrite_segments(group_store.segments_dir(filepath), hot)
+            _invalidate_views(group_id)
+            _catalog_record_write(group_id, [])
+            logging.info(f"[{group_id}] Compactación: {len(cold)} registros archivados, {len(hot)} en caliente.")
+            return {"group_id": group_id, "archived": len(cold), "hot": len(hot)}
+
+    except Timeout:
+        raise IOError(f"No se pudo bloquear el proyecto '{group_id}' para compactarlo.")
+
+def migrate_group(group_id: str, codec: str | None = None, storage: str | None = None) -> Path:
+    """
+    Convierte en el sitio la memoria de un grupo a otro códec ("yaml"/"json") y/o
+    modo de almacenamiento ("yaml" de fichero único / "segmented"). Sin argumento
+    se conserva el valor actual. Devuelve la ruta del nuevo fichero principal.
+    """
+    filepath = get_group_memory_path(group_id)
+    if not filepath.exists():
+        raise FileNotFoundError(f"El proyecto '{group_id}' no existe.")
+    if storage not in (None, group_store.STORAGE_YAML, group_store.STORAGE_SEGMENTED):
+        raise ValueError(f"Modo de almacenamiento desconocido: '{storage}'")
+    target_codec = storage_codec.get_codec(codec) if codec else storage_codec.codec_for(filepath)
+    new_filepath = MEMORY_DIR / f"{group_id}{target_codec.suffix}"
+    seg_dir = group_store.segments_dir(filepath)
+
+    try:
+        with FileLock(get_group_lock_path(group_id), timeout=30):
+            state = _load_full_state(filepath) or {}
+            was_segmented = group_store.is_segmented(state)
+            to_segmented = was_segmented if storage is None else storage == group_store.STORAGE_SEGMENTED
+            meta = state.setdefault("meta", {})
+            if to_segmented:
+                meta["storage"] = group_store.STORAGE_SEGMENTED
+                # Primero los segmentos y después la cabecera que los declara.
+                group_store.rewrite_segments(seg_dir, state.get("log", []))
+                table = user_stats_table.open_table(new_filepath)
+                table.replace(state.get("user_stats", {}))
+                user_stats_table.remember(table)
+                target_codec.dump(state_header(state), new_filepath)
+            else:
+                meta.pop("storage", None)
+                target_codec.dump(state, new_filepath)
+                shutil.rmtree(seg_dir, ignore_errors=True)
+                user_stats_table.delete(filepath)
+            if new_filepath != filepath:
+                filepath.unlink()
+            state_cache.bump_generation(group_id)
+            _invalidate_views(group_id)
+            _catalog_record_write(group_id, [])
+    except Timeout:
+        raise IOError(f"No se pudo bloquear el proyecto '{group_id}' para migrarlo.")
+
+    logging.info(f"[{group_id}] Migrado a códec '{target_codec.name}' "
+                 f"({'segmentado' if to_segmented else 'fichero único'}).")
+    return new_filepath
+
+def _log_chunks(records: Iterable[tuple[bool, dict]]) -> Iterator[list[tuple[bool, dict]]]:
+    """Bloques de unos BACKFILL_CHUNK registros que no separan un mensaje de sus alertas y sugerencias."""
+    chunk = []
+    for item in records:
+        if len(chunk) >= BACKFILL_CHUNK and item[1].get("type") not in BACKFILL_DERIVED_TYPES:
+            yield chunk
+            chunk = []
+        chunk.append(item)
+    if chunk:
+        yield chunk
+
+def _replay_records(group_id: str, state: dict, records: Iterable[tuple[bool, dict]], counts: dict) -> Iterator[dict]:
+    """
+    Reprocesa en orden los registros de un log con el análisis, la normalización y
+    las políticas actuales, partiendo de 'state' ({meta, user_stats} sin historial).
+    Las alertas y sugerencias antiguas se descartan y se regeneran; el resto de
+    registros (resúmenes diarios...) se conservan tal cual. 'records' da pares
+    (emitir, registro): los no emitidos (archivo frío) solo actualizan el estado.
+    El reloj de las políticas es el ts de cada mensaje, sin retroceder nunca.
+    Las alertas (por mensaje) y sugerencias (por ts) que coinciden con las antiguas
+    conservan su msg_id, de modo que reprocesar dos veces da el mismo log.
+    """
+    detector = pause_detectors.factory()
+    fed = 0
+    clock = None
+
+    def sustained_check(now: datetime, threshold: float) -> bool | None:
+        nonlocal fed
+        detector.extend(state["log"][fed:])
+        fed = len(state["log"])
+        return detector.all_sub_windows_high(to_epoch_us(now), threshold)
+
+    for chunk in _log_chunks(records):
+        previous_ids = {}
+        for _, r in chunk:
+            if r.get("type") == "alert":
+                previous_ids[("alert", r.get("trigger_ref"))] = r.get("msg_id")
+            elif r.get("type") == "suggestion":
+                previous_ids[("suggestion", r.get("ts"))] = r.get("msg_id")
+        texts = [r.get("text", "") for _, r in chunk if r.get("type") == "message"]
+        signals = analyzer.calculate_raw_signals_batch(texts)
+        i = -1
+        for emit, record in chunk:
+            record_type = record.get("type")
+            if record_type == "message":
+                i += 1
+            if record_type in BACKFILL_DERIVED_TYPES:
+                continue
+            try:
+                if record_type != "message":
+                    message = None
+                elif record.get("spool_seq") is not None:
+                    # Conserva el nº de secuencia de la cola: spooled_msg_ids lo usa para no
+                    # duplicar mensajes si la cola se reentrega tras el reproceso.
+                    message = schemas.SpooledMessage(author=record["author"], text=record["text"], ts=record["ts"],
+                                                     msg_id=record["msg_id"], spool_seq=record["spool_seq"])
+                else:
+                    message = schemas.MessageIngest(author=record["author"], text=record["text"], ts=record["ts"])
+            except (KeyError, ValueError) as e:
+                logging.warning(f"[{group_id}] Mensaje {record.get('msg_id')} no reprocesable, se conserva: {e}")
+                message = None
+            if message is None:
+                if emit:
+                    yield record
+                continue
+
+            ts = message.ts.replace(tzinfo=None)
+            clock = ts if clock is None or ts > clock else clock
+            state["log"], fed = [], 0
+            raw_signals = {key: values[i] for key, values in signals.items()}
+            _apply_message(group_id, state, message, raw_signals=raw_signals, sustained_check=sustained_check,
+                           now=clock, msg_id=record.get("msg_id"))
+            detector.extend(state["log"][fed:])
+            counts["messages"] += 1
+            if emit:
+                for new_record in state["log"]:
+                    new_type = new_record["type"]
+                    if new_type in BACKFILL_DERIVED_TYPES:
+                        counts[f"{new_type}s"] += 1
+                        key = new_record["trigger_ref"] if new_type == "alert" else new_record["ts"]
+                        new_record["msg_id"] = previous_ids.get((new_type, key)) or new_record["msg_id"]
+                    yield new_record
+    state["log"] = []
+
+def backfill_group(group_id: str) -> dict:
+    """
+    Recalcula affective_proxy, user_stats, alertas y sugerencias de un grupo
+    reprocesando todo su log en orden (p. ej. tras cambiar el analizador o los
+    umbrales). El trabajo se hace sin bloquear el grupo, escribiendo los segmentos
+    nuevos aparte; el intercambio final sí se hace bajo el FileLock y solo si el
+    grupo no ha cambiado entretanto (si no, se vuelve a empezar).
+    El archivo frío es inmutable: sus mensajes se reprocesan para reconstruir las
+    estadísticas, pero sus registros no se reescriben.
+    """
+    filepath = get_group_memory_path(group_id)
+    if not filepath.exists():
+        raise FileNotFoundError(f"El proyecto '{group_id}' no existe.")
+    codec = storage_codec.codec_for(filepath)
+    seg_dir = group_store.segments_dir(filepath)
+
+    for _ in range(BACKFILL_ATTEMPTS):
+        signature = group_store.storage_signature(filepath)
+        header = codec.load(filepath) or {}
+        segmented = group_store.is_segmented(header)
+        meta = {key: value for key, value in header.get("meta", {}).items() if key != "last_pause_suggestion_ts"}
+        state = {"meta": meta, "log": [], "user_stats": {}}
+        counts = {"group_id": group_id, "messages": 0, "alerts": 0, "suggestions": 0}
+
+        cold = ((False, r) for r in archive.iter_archived(group_id, meta.get("archive")))
+        if segmented:
+            hot = ((True, r) for r in group_store.iter_records(seg_dir))
+            staging = group_store.stage_segments(seg_dir, _replay_records(group_id, state, chain(cold, hot), counts),
+                                                 suffix=".log.backfill")
+        else:
+            # En modo de fichero único el documento completo ya está en memoria.
+            hot = ((True, r) for r in header.get("log", []))
+            new_log = list(_replay_records(group_id, state, chain(cold, hot), counts))
 
-    # Iterar desde el final es más eficiente si los logs son grandes.
-    for record in reversed(state.get("log", [])):
         try:
-            ts = datetime.fromisoformat(record.get("ts", "")).replace(tzinfo=None)
-            if ts < since_ts:
-                return False # Hemos salido de la ventana de tiempo
-            if record.get("type") == "alert":
-                return True # Encontramos una alerta reciente
-        except (ValueError, TypeError):
+            with FileLock(get_group_lock_path(group_id), timeout=30):
+                if group_store.storage_signature(filepath) != signature:
+                    logging.info(f"[{group_id}] El grupo cambió durante el reproceso; se repite.")
+                    if segmented:
+                        shutil.rmtree(staging, ignore_errors=True)
+                    continue
+                if segmented:
+                    group_store.swap_segments(seg_dir, staging)
+                    table = user_stats_table.open_table(filepath)
+                    table.replace(state["user_stats"])
+                    user_stats_table.remember(table)
+                    codec.dump(state_header({**header, "meta": meta}), filepath)
+                else:
+                    codec.dump({**header, "meta": meta, "log": new_log, "user_stats": state["user_stats"]}, filepath)
+                rebuilt = {**header, "meta": meta, "log": [] if segmented else new_log}
+                affect_rollups.rebuild(filepath, lambda: _all_records(group_id, filepath, rebuilt))
+                state_cache.bump_generation(group_id)
+                _invalidate_views(group_id)
+                group_catalog.put(catalog_entry(group_id))
+        except Timeout:
+            if segmented:
+                shutil.rmtree(staging, ignore_errors=True)
+            raise IOError(f"No se pudo bloquear el proyecto '{group_id}' para reprocesarlo.")
+
+        logging.info(f"[{group_id}] Reproceso: {counts['messages']} mensajes, "
+                     f"{counts['alerts']} alertas, {counts['suggestions']} sugerencias.")
+        return counts
+
+    raise IOError(f"El proyecto '{group_id}' se modificó durante {BACKFILL_ATTEMPTS} reprocesos seguidos.")
+
+def _archived_since(group_id: str, since_ts: datetime) -> list[dict]:
+    """Registros archivados con ts >= since_ts (vacío si la ventana cae en el nivel caliente)."""
+    # Solo hace falta meta.archive: en modo segmentado se lee la cabecera, no el log.
+    header = get_group_header(group_id) or {}
+    summary = header.get("meta", {}).get("archive")
+    if not summary or datetime.fromisoformat(summary["last_ts"]) < since_ts:
+        return []
+    archived = []
+    for record in archive.iter_archived(group_id, summary, since=since_ts):
+        try:
+            if datetime.fromisoformat(record["ts"]).replace(tzinfo=None) >= since_ts:
+                archived.append(record)
+        except (ValueError, TypeError, KeyError):
             continue
-    return False
+    return archived
+
+def _query_time_index(group_id: str, fn):
+    """
+    Ejecuta fn(índice) sobre el índice columnar de tiempo del grupo, construyéndolo
+    si hace falta. Devuelve None si el grupo no existe.
+    """
+    filepath = get_group_memory_path(group_id)
+    signature = group_store.storage_signature(filepath)
+    if signature is None:
+        return None
+    return time_index.registry.use(group_id, signature, lambda: (get_group_state(group_id) or {}).get("log", []), fn)
+
+def summarize_since(group_id: str, since: datetime, state: dict | None = None) -> dict:
+    """
+    Resumen (formato de summarizer.generate_daily_summary) de los mensajes del grupo
+    con ts > since. Las horas cerradas salen de los agregados persistidos en la
+    ingesta; solo se analizan la hora en curso y la parte de la primera hora
+    posterior a 'since'. 'state' evita releer un grupo ya cargado.
+    """
+    filepath = get_group_memory_path(group_id)
+    aggregate = affect_rollups.summary_aggregate(
+        filepath, to_epoch_us(since) + 1, lambda since_us: _records_since(group_id, filepath, since_us, state)
+    )
+    return summarizer.summary_from_aggregate(aggregate)
+
+def _period_bounds(period: str, now: datetime, count: int) -> list[tuple[datetime, datetime]]:
+    """Inicio y fin de los 'count' últimos períodos hasta el actual (incluido), del más antiguo al más reciente."""
+    today = datetime(now.year, now.month, now.day)
+    if period == "week":
+        start = today - timedelta(days=today.weekday())
+        starts = [start - timedelta(weeks=k) for k in range(count)]
+        return [(s, s + timedelta(weeks=1)) for s in reversed(starts)]
+    if period == "month":
+        months = [(now.year * 12 + now.month - 1) - k for k in range(count)]
+        starts = [datetime(m // 12, m % 12 + 1, 1) for m in reversed(months)]
+        return [(s, datetime(s.year + s.month // 12, s.month % 12 + 1, 1)) for s in starts]
+    raise ValueError(f"Período no válido: '{period}'. Opciones: {', '.join(SUMMARY_PERIODS)}.")
+
+def get_period_summaries(group_id: str, period: str = "week", count: int = 1) -> list[dict]:
+    """
+    Resúmenes (formato de summarizer.generate_daily_summary) de los 'count' últimos
+    períodos del grupo ("week" o "month"); el actual llega hasta ahora. Se combinan
+    los agregados diarios y horarios persistidos en la ingesta, sin releer mensajes:
+    el coste depende del número de días, no del de mensajes. Lanza
+    FileNotFoundError si el grupo no existe.
+    """
+    filepath = get_group_memory_path(group_id)
+    if not filepath.exists():
+        raise FileNotFoundError(f"El proyecto '{group_id}' no existe.")
+    now = datetime.utcnow()
+    summaries = []
+    for start, end in _period_bounds(period, now, count):
+        aggregate = affect_rollups.summary_aggregate(
+            filepath, to_epoch_us(start), lambda since_us: _records_since(group_id, filepath, since_us),
+            None if end > now else to_epoch_us(end),
+        )
+        summaries.append({"start": start, "end": end, "details": summarizer.summary_from_aggregate(aggregate)})
+    return summaries
+
+def append_daily_summary(group_id: str, record: dict, expected_last_summary_ts: str | None) -> bool:
+    """
+    Añade al log un resumen diario ya calculado (fuera del bloqueo) y actualiza
+    meta.last_daily_summary_ts, con el bloqueo del grupo tomado solo para escribir.
+    'expected_last_summary_ts' es el valor leído en la instantánea con la que se
+    calculó: si ha cambiado, otro proceso ya ha escrito un resumen y no se añade
+    (devuelve False). Lanza FileNotFoundError si el grupo no existe y Timeout si no
+    se obtiene el bloqueo.
+    """
+    filepath = get_group_memory_path(group_id)
+    segmented = group_store.segments_dir(filepath).is_dir()
+    # En modo de fichero único el estado se toma de la caché antes de bloquear; bajo el
+    # bloqueo solo se comprueba que el fichero no ha cambiado entretanto.
+    snapshot_signature = group_store.storage_signature(filepath)
+    snapshot = None if segmented else get_group_state(group_id)
+
+    with FileLock(get_group_lock_path(group_id), timeout=10):
+        previous_signature = group_store.storage_signature(filepath)
+        if previous_signature is None:
+            raise FileNotFoundError(f"El proyecto '{group_id}' no existe.")
+        if segmented:
+            state = _read_state_for_write(group_id, filepath)
+        elif snapshot is not None and previous_signature == snapshot_signature:
+            state = {**snapshot, "meta": dict(snapshot.get("meta", {})), "log": list(snapshot.get("log", []))}
+        else:
+            state = storage_codec.codec_for(filepath).load(filepath) or {}
+        meta = state.setdefault("meta", {})
+        if meta.get("last_daily_summary_ts") != expected_last_summary_ts:
+            return False
+
+        persisted_count = len(state.setdefault("log", []))
+        state["log"].append(record)
+        meta["last_daily_summary_ts"] = datetime.utcnow().isoformat()
+        _write_state(filepath, state, persisted_count)
+        new_signature = group_store.storage_signature(filepath)
+        _observe_persisted(group_id, previous_signature, new_signature, [record])
+        _catalog_record_write(group_id, [record], meta["last_daily_summary_ts"])
+        if event_bus.bus.has_subscribers(group_id):
+            _publish_events(group_id, [record], new_signature)
+        return True
+
+def get_affective_history(group_id: str, since_hours: int = 24, resolution: str | None = None,
+                          max_points: int | None = None) -> dict:
+    """
+    Recupera el historial de 'arousal_z' de un grupo para un período determinado.
+    Con resolution="raw" se devuelve un punto por mensaje; con "minute" u "hour",
+    un punto por cubeta de los agregados persistidos (media, mediana y máximo).
+    Sin resolución explícita se elige la más fina que no pase de 'max_points'
+    (o "raw" si no hay límite y la ventana cabe en AFFECTIVE_HISTORY_RAW_MAX_HOURS).
+    """
+    since_ts = datetime.utcnow() - timedelta(hours=since_hours)
+    since_us = to_epoch_us(since_ts)
+    filepath = get_group_memory_path(group_id)
+    if not filepath.exists():
+        return {"resolution": resolution or "raw", "history": []}
+
+    if resolution is None:
+        resolution = _pick_history_resolution(group_id, filepath, since_hours, since_us, max_points)
+    if resolution != "raw":
+        buckets = affect_rollups.history(filepath, resolution, since_us,
+                                         lambda start_us: _records_since(group_id, filepath, start_us))
+        return {"resolution": resolution, "history": [_rollup_point(bucket) for bucket in buckets]}
+    if since_hours > AFFECTIVE_HISTORY_RAW_MAX_HOURS:
+        raise ValueError(f"El historial por mensaje está limitado a {AFFECTIVE_HISTORY_RAW_MAX_HOURS} horas; use una resolución agregada.")
+
+    history_points = _query_time_index(group_id, lambda index: index.affective_history(since_us))
+    if history_points is None:
+        return {"resolution": "raw", "history": []}
+
+    # Si la ventana llega más atrás que el nivel caliente, se completa con el archivo.
+    archived = _archived_since(group_id, since_ts)
+    if archived:
+        cold_index = time_index.GroupTimeIndex()
+        cold_index.extend(archived)
+        history_points = cold_index.affective_history(since_us) + history_points
+    return {"resolution": "raw", "history": history_points}
+
+def _pick_history_resolution(group_id: str, filepath: Path, since_hours: int, since_us: int,
+                             max_points: int | None) -> str:
+    """Resolución más fina cuyo número de puntos no supera 'max_points'."""
+    if max_points is None:
+        return "raw" if since_hours <= AFFECTIVE_HISTORY_RAW_MAX_HOURS else "hour"
+    if since_hours <= AFFECTIVE_HISTORY_RAW_MAX_HOURS:
+        messages = _query_time_index(group_id, lambda index: len(index.message_values(since_us, inclusive=True))) or 0
+        if messages <= max_points and not _archived_since(group_id, from_epoch_us(since_us)):
+            return "raw"
+    if since_hours * 60 <= max_points:
+        return "minute"  # Ni siquiera con todos los minutos ocupados se pasa del límite.
+    if since_hours <= AFFECTIVE_HISTORY_RAW_MAX_HOURS:
+        minutes = affect_rollups.history(filepath, "minute", since_us,
+                                         lambda start_us: _records_since(group_id, filepath, start_us))
+        if len(minutes) <= max_points:
+            return "minute"
+    return "hour"
+
+def _rollup_point(bucket: dict) -> dict:
+    """Punto del historial a partir de una cubeta de agregados (el valor es la media de arousal_z)."""
+    return {
+        "ts": from_epoch_us(bucket["t"]),
+        "value": bucket["arousal"]["mean"],
+        "message_count": bucket["messages"],
+        "alert_count": bucket["alerts"],
+        **{dimension: bucket[dimension] for dimension in affect_rollups.DIMENSIONS},
+    }
+
+def has_recent_alerts(group_id: str, since_hours: int = 24) -> bool:
+    """
+    Comprueba si un grupo tiene alertas en las últimas 'since_hours'.
+    Es una comprobación simple y sin estado, ideal para la UI.
+    """
+    since_us = to_epoch_us(datetime.utcnow() - timedelta(hours=since_hours))
+    return bool(_query_time_index(group_id, lambda index: index.has_alert_since(since_us)))
 
-def get_group_metrics(group_id: str, window_minutes: int = 10, friction_window_hours: int = 24) -> dict:
+def get_group_metrics(
+    group_id: str,
+    window_minutes: int = metrics_aggregator.METRICS_WINDOW_MINUTES,
+    friction_window_hours: int = metrics_aggregator.FRICTION_WINDOW_HOURS,
+) -> dict:
     """
     Calcula y devuelve las métricas clave de un grupo en tiempo real.
+    Con las ventanas por defecto se sirven desde el agregador incremental;
+    con ventanas a medida se calculan sobre el índice columnar de tiempo.
     """
-    state = get_group_state(group_id)
-    if not state or "log" not in state:
-        return {
-            "friction_index": 0.0,
-            "affective_proxy": {"arousal_z": 0.0, "valence_z": 0.0, "uncertainty_z": 0.0}
-        }
+    empty_metrics = {
+        "friction_index": 0.0,
+        "affective_proxy": {"arousal_z": 0.0, "valence_z": 0.0, "uncertainty_z": 0.0}
+    }
+    signature = group_store.storage_signature(get_group_memory_path(group_id))
+    if signature is None:
+        return empty_metrics
+
+    if (window_minutes, friction_window_hours) == (metrics_aggregator.METRICS_WINDOW_MINUTES, metrics_aggregator.FRICTION_WINDOW_HOURS):
+        return metrics_aggregator.get_metrics(
+            group_id, signature, lambda: (get_group_state(group_id) or {}).get("log", [])
+        )
 
-    log = state.get("log", [])
     now_utc = datetime.utcnow()
+    affective_start_us = to_epoch_us(now_utc - timedelta(minutes=window_minutes))
+    friction_start_us = to_epoch_us(now_utc - timedelta(hours=friction_window_hours))
 
-    # --- Cálculo del Affective Proxy (ventana corta) ---
-    affective_window_start = now_utc - timedelta(minutes=window_minutes)
-    recent_proxies = [
-        r["affective_proxy"]
-        for r in reversed(log)
-        if r.get("type") == "message"
-        and "affective_proxy" in r
-        and datetime.fromisoformat(r["ts"]).replace(tzinfo=None) > affective_window_start
-    ]
-
-    if recent_proxies:
-        median_arousal = statistics.median([p["arousal_z"] for p in recent_proxies])
-        median_valence = statistics.median([p.get("valence_z", 0.0) for p in recent_proxies])
-        median_uncertainty = statistics.median([p.get("uncertainty_z", 0.0) for p in recent_proxies])
-    else:
-        median_arousal, median_valence, median_uncertainty = 0.0, 0.0, 0.0
+    def compute(index: time_index.GroupTimeIndex) -> dict:
+        # --- Cálculo del Affective Proxy (ventana corta) ---
+        medians = {}
+        for key, column in (("arousal_z", "arousal"), ("valence_z", "valence"), ("uncertainty_z", "uncertainty")):
+            values = [value for _, value in index.message_values(affective_start_us, column)]
+            medians[key] = statistics.median(values) if values else 0.0
 
-    # --- Cálculo del Friction Index (ventana larga) ---
-    friction_window_start = now_utc - timedelta(hours=friction_window_hours)
-    message_count = 0
-    alert_count = 0
-    for record in reversed(log):
-        try:
-            ts = datetime.fromisoformat(record.get("ts", "")).replace(tzinfo=None)
-            if ts < friction_window_start:
-                break # Salimos de la ventana de tiempo
-            if record.get("type") == "message":
-                message_count += 1
-            elif record.get("type") == "alert":
-                alert_count += 1
-        except (ValueError, TypeError):
-            continue
+        # --- Cálculo del Friction Index (ventana larga) ---
+        message_count, alert_count = index.count_since(friction_start_us)
+        friction_index = (alert_count / message_count) if message_count > 0 else 0.0
+        return {"friction_index": friction_index, "affective_proxy": medians}
+
+    return _query_time_index(group_id, compute) or empty_metrics
+
+_metrics_builders = ThreadPoolExecutor(max_workers=METRICS_BUILD_WORKERS, thread_name_prefix="rlx-metrics")
+
+def get_groups_metrics(group_ids: list[str] | None = None) -> dict:
+    """
+    Métricas en tiempo real de varios grupos (todos, por defecto) calculadas con un
+    único instante común. Los grupos con agregador en memoria se sirven al momento;
+    los demás se construyen en paralelo. Los grupos inexistentes se omiten.
+    """
+    now = datetime.utcnow()
+    if group_ids is None:
+        group_ids = sorted(p.stem for p in list_group_files())
+    group_ids = list(dict.fromkeys(group_ids))
 
-    friction_index = (alert_count / message_count) if message_count > 0 else 0.0
+    def compute(group_id: str, signature: tuple) -> dict:
+        return metrics_aggregator.get_metrics(
+            group_id, signature, lambda: (get_group_state(group_id) or {}).get("log", []), now
+        )
+
+    results, cold = {}, {}
+    for group_id in group_ids:
+        signature = group_store.storage_signature(get_group_memory_path(group_id))
+        if signature is None:
+            continue
+        if metrics_aggregator.registry.is_current(group_id, signature):
+            results[group_id] = compute(group_id, signature)
+        else:
+            cold[group_id] = _metrics_builders.submit(compute, group_id, signature)
+    for group_id, future in cold.items():
+        results[group_id] = future.result()
 
     return {
-        "friction_index": friction_index,
-        "affective_proxy": {"arousal_z": median_arousal, "valence_z": median_valence, "uncertainty_z": median_uncertainty}
+        "ts": now,
+        "groups": [{"group_id": group_id, **results[group_id]} for group_id in group_ids if group_id in results],
     }
 
-def check_and_suggest_pause(group_id: str, state: dict):
+def _indexed_scores_since(group_id: str, signature: tuple | None, state: dict, persisted_count: int, load_log):
+    """
+    Construye la función que usa check_and_suggest_pause durante una ingesta para
+    obtener los (ts, arousal_z) de los mensajes recientes: los ya persistidos salen
+    del índice columnar y los añadidos en esta ingesta, del estado en memoria
+    (interpretados una sola vez aunque la función se llame por cada mensaje de un lote).
+    """
+    pending = []
+    cursor = persisted_count
+
+    def scores_since(window_start: datetime) -> list[tuple[datetime, float]]:
+        nonlocal cursor
+        for r in state["log"][cursor:]:
+            if r.get("type") == "message" and "affective_proxy" in r:
+                ts_us = to_epoch_us(r["ts"])
+                pending.append((ts_us, from_epoch_us(ts_us), r["affective_proxy"]["arousal_z"]))
+        cursor = len(state["log"])
+
+        start_us = to_epoch_us(window_start)
+        persisted = []
+        if signature is not None:
+            persisted = time_index.registry.use(group_id, signature, load_log, lambda index: index.message_values(start_us))
+        scores = [(from_epoch_us(ts_us), score) for ts_us, score in persisted]
+        scores.extend((ts, score) for ts_us, ts, score in pending if ts_us > start_us)
+        return scores
+    return scores_since
+
+def _streaming_sustained_check(detector: pause_detector.SustainedArousalDetector, state: dict, persisted_count: int):
+    """
+    Construye la comprobación de tensión sostenida de una ingesta sobre el detector
+    incremental del grupo, al que se añaden los mensajes nuevos de state["log"].
+    Devuelve también 'catch_up', que añade los pendientes al terminar el lote (la
+    comprobación no se ejecuta durante el cooldown).
+    """
+    cursor = persisted_count
+
+    def catch_up():
+        nonlocal cursor
+        detector.extend(state["log"][cursor:])
+        cursor = len(state["log"])
+
+    def sustained_check(now: datetime, threshold: float) -> bool | None:
+        catch_up()
+        return detector.all_sub_windows_high(to_epoch_us(now), threshold)
+    return sustained_check, catch_up
+
+def _sub_windows_high(now: datetime, threshold: float, log: list[dict], scores_since=None) -> bool:
+    """Recorrido de referencia: mediana de arousal_z de cada sub-ventana de la última hora."""
+    window_start_ts = now - timedelta(minutes=SUSTAINED_AROUSAL_WINDOW_MIN)
+    if scores_since is not None:
+        arousal_scores_in_window = scores_since(window_start_ts)
+    else:
+        arousal_scores_in_window = [
+            (datetime.fromisoformat(r["ts"]).replace(tzinfo=None), r["affective_proxy"]["arousal_z"])
+            for r in log if r.get("type") == "message" and "affective_proxy" in r and datetime.fromisoformat(r["ts"]).replace(tzinfo=None) > window_start_ts
+        ]
+
+    sub_window_duration_sec = (SUSTAINED_AROUSAL_WINDOW_MIN / SUSTAINED_AROUSAL_SUB_WINDOWS) * 60
+    for i in range(SUSTAINED_AROUSAL_SUB_WINDOWS):
+        sub_window_end = now - timedelta(seconds=i * sub_window_duration_sec)
+        sub_window_start = now - timedelta(seconds=(i + 1) * sub_window_duration_sec)
+        scores_in_sub = [score for ts, score in arousal_scores_in_window if sub_window_start <= ts < sub_window_end]
+        if not scores_in_sub or statistics.median(scores_in_sub) < threshold:
+            return False
+    return True
+
+def check_and_suggest_pause(group_id: str, state: dict, scores_since=None, sustained_check=None,
+                            now: datetime | None = None):
     """
     Comprueba si el arousal ha sido alto durante un período sostenido y, si es así,
     añade una sugerencia de pausa al estado. Incluye un mecanismo de cooldown.
     Los umbrales pueden ser personalizados por grupo.
+    'sustained_check(now, umbral)' responde con el detector incremental del grupo
+    (None si no puede); si no, 'scores_since(ts)' permite obtener los (ts, arousal_z)
+    recientes sin recorrer state["log"] (índice columnar). 'now' fija el reloj al
+    reprocesar un log; por defecto es la hora actual.
     """
     # Cargar configuración personalizada del grupo, con fallback a los valores globales.
     group_settings = _load_group_settings(group_id)
@@ -351,7 +1360,7 @@ def check_and_suggest_pause(group_id: str, state: dict):
     cooldown_min = group_settings.get("pause_suggestion_cooldown_min", PAUSE_SUGGESTION_COOLDOWN_MIN)
     pause_duration = group_settings.get("suggested_pause_duration_min", DEFAULT_PAUSE_DURATION_MIN)
 
-    now = datetime.utcnow()
+    now = now or datetime.utcnow()
     meta = state.setdefault("meta", {})
     last_suggestion_ts_str = meta.get("last_pause_suggestion_ts")
 
@@ -366,21 +1375,9 @@ def check_and_suggest_pause(group_id: str, state: dict):
         return
 
     # 2. Analizar sub-ventanas de tiempo para detectar tensión sostenida.
-    window_start_ts = now - timedelta(minutes=SUSTAINED_AROUSAL_WINDOW_MIN)
-    arousal_scores_in_window = [
-        (datetime.fromisoformat(r["ts"]).replace(tzinfo=None), r["affective_proxy"]["arousal_z"])
-        for r in log if r.get("type") == "message" and "affective_proxy" in r and datetime.fromisoformat(r["ts"]).replace(tzinfo=None) > window_start_ts
-    ]
-
-    sub_window_duration_sec = (SUSTAINED_AROUSAL_WINDOW_MIN / SUSTAINED_AROUSAL_SUB_WINDOWS) * 60
-    all_sub_windows_high = True
-    for i in range(SUSTAINED_AROUSAL_SUB_WINDOWS):
-        sub_window_end = now - timedelta(seconds=i * sub_window_duration_sec)
-        sub_window_start = now - timedelta(seconds=(i + 1) * sub_window_duration_sec)
-        scores_in_sub = [score for ts, score in arousal_scores_in_window if sub_window_start <= ts < sub_window_end]
-        if not scores_in_sub or statistics.median(scores_in_sub) < threshold:
-            all_sub_windows_high = False
-            break
+    all_sub_windows_high = sustained_check(now, threshold) if sustained_check is not None else None
+    if all_sub_windows_high is None:
+        all_sub_windows_high = _sub_windows_high(now, threshold, log, scores_since)
 
     # 3. Si la condición se cumple, generar la sugerencia.
     if all_sub_windows_high:
@@ -388,6 +1385,6 @@ def check_and_suggest_pause(group_id: str, state: dict):
             rationale=f"El nivel de energía del grupo se ha mantenido elevado de forma constante durante los últimos {SUSTAINED_AROUSAL_WINDOW_MIN} minutos.",
             suggestion_text=f"He notado que la energía del grupo ha sido alta durante un tiempo. ¿Consideraríais tomar una breve pausa de {pause_duration} minutos para recargar?"
         )
-        suggestion_record = schemas.SuggestionRecord(details=details)
+        suggestion_record = schemas.SuggestionRecord(details=details, ts=now)
         state.setdefault("log", []).append(suggestion_record.model_dump(mode='json'))
         meta["last_pause_suggestion_ts"] = now.isoformat()
@@ -0,0 +1,249 @@
+"""
+Almacenamiento segmentado de solo-anexado para la memoria de grupos.
+
+En modo "segmented" un grupo se guarda como:
+  - local_bundle/groups/<id>.yaml            cabecera pequeña: 'meta'
+  - local_bundle/groups/<id>.log/NNNNNN.jsonl segmentos del log, un registro JSON por línea
+  - local_bundle/groups/<id>.stats/.authors  tabla compacta de 'user_stats' (user_stats_table)
+
+(En ambos modos, <id>.rollups/ guarda los agregados afectivos por minuto y hora: affect_rollups.)
+
+Cada ingesta solo añade líneas al segmento activo y actualiza en el sitio la tabla de
+estadísticas (la cabecera solo se reescribe si cambia 'meta'), de modo que su coste no
+depende del tamaño del historial. El estado completo con la forma YAML
+clásica ({meta, log, user_stats}) se puede reconstruir en cualquier momento
+(principio de transparencia).
+"""
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from ..core.config import SEGMENT_MAX_BYTES
+
+STORAGE_YAML = "yaml"
+STORAGE_SEGMENTED = "segmented"
+
+SEGMENT_SUFFIX = ".jsonl"
+_READ_BLOCK_SIZE = 64 * 1024
+_REWRITE_CHUNK = 1000
+
+
+def segments_dir(filepath: Path) -> Path:
+    """Directorio de segmentos asociado al fichero de cabecera de un grupo."""
+    return filepath.with_suffix(".log")
+
+
+def is_segmented(state: dict | None) -> bool:
+    """Indica si un estado (o cabecera) corresponde a un grupo en modo segmentado."""
+    return bool(state) and state.get("meta", {}).get("storage") == STORAGE_SEGMENTED
+
+
+def list_segments(seg_dir: Path) -> list[Path]:
+    """Devuelve los segmentos de un grupo en orden cronológico."""
+    if not seg_dir.is_dir():
+        return []
+    return sorted(seg_dir.glob(f"*{SEGMENT_SUFFIX}"))
+
+
+def _active_segment(seg_dir: Path) -> Path:
+    """Segmento en el que se debe escribir; abre uno nuevo si el actual está lleno."""
+    segments = list_segments(seg_dir)
+    if not segments:
+        return seg_dir / f"{1:06d}{SEGMENT_SUFFIX}"
+    last = segments[-1]
+    if last.stat().st_size < SEGMENT_MAX_BYTES:
+        return last
+    return seg_dir / f"{int(last.stem) + 1:06d}{SEGMENT_SUFFIX}"
+
+
+def _drop_partial_line(path: Path):
+    """Descarta la última línea de un segmento si quedó a medias (caída durante un anexado)."""
+    with open(path, "r+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        size = end
+        while end > 0:
+            start = max(0, end - _READ_BLOCK_SIZE)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        f.truncate(end)
+    logging.warning(f"Descartada una línea incompleta ({size - end} bytes) al final de '{path}'.")
+
+
+def append_records(seg_dir: Path, records: list[dict]):
+    """Añade registros (ya serializables a JSON) al final del log segmentado."""
+    if not records:
+        return
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    segments = list_segments(seg_dir)
+    if segments:
+        _drop_partial_line(segments[-1])
+    lines = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records)
+    with open(_active_segment(seg_dir), "a", encoding="utf-8") as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _parse_line(line: bytes | str) -> dict | None:
+    """Registro de una línea del log, o None si está incompleta (caída a mitad de escritura)."""
+    try:
+        return json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+def iter_records(seg_dir: Path) -> Iterator[dict]:
+    """Recorre el log segmentado en orden, sin cargarlo entero en memoria."""
+    for segment in list_segments(seg_dir):
+        with open(segment, "rb") as f:
+            for line in f:
+                if line.strip():
+                    record = _parse_line(line)
+                    if record is not None:
+                        yield record
+
+
+def _iter_lines_reversed(path: Path, decode: bool = True) -> Iterator[str | bytes]:
+    """Lee las líneas de un fichero desde el final, por bloques (en bytes si no 'decode')."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(_READ_BLOCK_SIZE, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + remainder
+            lines = chunk.split(b"\n")
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8") if decode else line
+        if remainder.strip():
+            yield remainder.decode("utf-8") if decode else remainder
+
+
+def iter_records_reversed(seg_dir: Path) -> Iterator[dict]:
+    """Recorre el log segmentado desde el registro más reciente hacia atrás."""
+    for segment in reversed(list_segments(seg_dir)):
+        for line in _iter_lines_reversed(segment, decode=False):
+            record = _parse_line(line)
+            if record is not None:
+                yield record
+
+
+def read_tail(seg_dir: Path, since: datetime) -> list[dict]:
+    """
+    Devuelve, en orden cronológico, los registros más recientes que 'since'.
+    Se asume que el log está ordenado por 'ts' (igual que en has_recent_alerts),
+    así que la lectura se detiene en el primer registro más antiguo.
+    """
+    tail = []
+    for record in iter_records_reversed(seg_dir):
+        try:
+            ts = datetime.fromisoformat(record.get("ts", "")).replace(tzinfo=None)
+        except (ValueError, TypeError):
+            continue
+        if ts <= since:
+            break
+        tail.append(record)
+    tail.reverse()
+    return tail
+
+
+def read_last(seg_dir: Path, count: int) -> list[dict]:
+    """
+    Devuelve, en orden de log, los últimos 'count' registros con ts válido (los que
+    cuenta time_index); los registros sin ts que haya entre ellos se omiten.
+    """
+    tail = []
+    if count <= 0:
+        return tail
+    for record in iter_records_reversed(seg_dir):
+        try:
+            datetime.fromisoformat(record.get("ts", ""))
+        except (ValueError, TypeError):
+            continue
+        tail.append(record)
+        if len(tail) >= count:
+            break
+    tail.reverse()
+    return tail
+
+
+def assemble_state(header: dict, seg_dir: Path) -> dict:
+    """Reconstruye el estado completo con la forma YAML clásica {meta, log, user_stats}."""
+    state = {"meta": header.get("meta", {}), "log": list(iter_records(seg_dir))}
+    for key, value in header.items():
+        if key not in state:
+            state[key] = value
+    return state
+
+
+def storage_signature(filepath: Path) -> tuple | None:
+    """
+    Firma barata del contenido en disco de un grupo: (mtime_ns, tamaño) de la cabecera
+    y, en modo segmentado, del último segmento. Cambia con cualquier escritura,
+    también las hechas por otros procesos (p. ej. scripts/run_daily_summaries.py).
+    """
+    try:
+        header_stat = filepath.stat()
+    except FileNotFoundError:
+        return None
+    signature = (header_stat.st_mtime_ns, header_stat.st_size)
+    segments = list_segments(segments_dir(filepath))
+    if segments:
+        last_stat = segments[-1].stat()
+        signature += (len(segments), last_stat.st_mtime_ns, last_stat.st_size)
+    return signature
+
+
+def storage_size(filepath: Path) -> int:
+    """Bytes en disco ocupados por un grupo (cabecera y segmentos)."""
+    size = filepath.stat().st_size if filepath.exists() else 0
+    return size + sum(p.stat().st_size for p in list_segments(segments_dir(filepath)))
+
+
+def stage_segments(seg_dir: Path, records: Iterable[dict], suffix: str = ".log.tmp") -> Path:
+    """
+    Escribe un log segmentado completo en un directorio aparte, junto al del grupo,
+    consumiendo 'records' por bloques (sirve con generadores). Devuelve el directorio.
+    """
+    staging = seg_dir.with_suffix(suffix)
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    records = iter(records)
+    while chunk := list(islice(records, _REWRITE_CHUNK)):
+        append_records(staging, chunk)
+    return staging
+
+
+def swap_segments(seg_dir: Path, staging: Path):
+    """Sustituye los segmentos del grupo por los preparados en 'staging' con un renombrado."""
+    retired = seg_dir.with_suffix(".log.old")
+    if seg_dir.exists():
+        seg_dir.rename(retired)
+    staging.rename(seg_dir)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def rewrite_segments(seg_dir: Path, records: Iterable[dict]):
+    """
+    Sustituye el log segmentado completo (p. ej. tras una compactación).
+    Los nuevos segmentos se escriben aparte y se intercambian con un renombrado.
+    """
+    swap_segments(seg_dir, stage_segments(seg_dir, records))
@@ -0,0 +1,134 @@
+"""
+Escritor único por grupo dentro del proceso.
+
+Cada grupo con ingestas en curso tiene un hilo propio con una cola: es el único
+que escribe la memoria del grupo desde este proceso, aplica los mensajes en el
+orden de llegada y agrupa todo lo que se haya encolado mientras escribía en una
+sola persistencia (un bloqueo, una lectura y una escritura). Así las peticiones
+concurrentes de un mismo grupo ya no compiten por el FileLock, que solo coordina
+con otros procesos (scripts de resúmenes, compactación...).
+
+Si una escritura agrupada falla, cada envío se reintenta por separado para que el
+error afecte solo a los mensajes que lo provocan. Por eso la función de persistencia
+solo debe lanzar si los mensajes no han llegado a disco: los fallos posteriores (vistas
+derivadas, catálogo, eventos) los registra ella misma. El hilo termina tras un rato
+sin trabajo y se vuelve a crear con el siguiente envío.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+from ..core.config import WRITER_IDLE_SECONDS, WRITER_MAX_COALESCE
+
+
+class GroupWriter:
+    def __init__(self, group_id: str, registry: "GroupWriterRegistry"):
+        self.group_id = group_id
+        self.registry = registry
+        self.queue: queue.Queue[tuple[list, Future]] = queue.Queue()
+        self.pending = 0  # mensajes encolados o en escritura
+        self.thread = threading.Thread(target=self._run, name=f"group-writer-{group_id}", daemon=True)
+
+    def _take_batch(self) -> list[tuple[list, Future]] | None:
+        try:
+            batch = [self.queue.get(timeout=self.registry.idle_seconds)]
+        except queue.Empty:
+            return None
+        size = len(batch[0][0])
+        while size < self.registry.max_coalesce:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _persist(self, batch: list[tuple[list, Future]]):
+        messages = [message for items, _ in batch for message in items]
+        try:
+            results = self.registry.persist(self.group_id, messages)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            logging.warning(f"[{self.group_id}] Falló una escritura agrupada de {len(batch)} envíos; se reintentan por separado: {e}")
+            for item in batch:
+                self._persist([item])
+            return
+        self.registry.record_write(len(batch), len(messages))
+        offset = 0
+        for items, future in batch:
+            future.set_result(results[offset:offset + len(items)])
+            offset += len(items)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                if self.registry.retire(self):
+                    return
+                continue
+            try:
+                self._persist(batch)
+            finally:
+                with self.registry.lock:
+                    self.pending -= sum(len(items) for items, _ in batch)
+
+
+class GroupWriterRegistry:
+    def __init__(self, persist: Callable[[str, list], list],
+                 max_coalesce: int = WRITER_MAX_COALESCE, idle_seconds: float = WRITER_IDLE_SECONDS):
+        self.persist = persist
+        self.max_coalesce = max_coalesce
+        self.idle_seconds = idle_seconds
+        self.lock = threading.Lock()
+        self._writers: dict[str, GroupWriter] = {}
+        self.writes = 0
+        self.messages = 0
+        self.max_batch = 0
+
+    def submit(self, group_id: str, messages: list) -> Future:
+        """Encola mensajes para el escritor del grupo. El futuro devuelve un resultado por mensaje."""
+        future: Future = Future()
+        with self.lock:
+            writer = self._writers.get(group_id)
+            if writer is None:
+                writer = self._writers[group_id] = GroupWriter(group_id, self)
+                writer.thread.start()
+            writer.pending += len(messages)
+            writer.queue.put((list(messages), future))
+        return future
+
+    def retire(self, writer: GroupWriter) -> bool:
+        """Da de baja un escritor inactivo, salvo que haya recibido trabajo entretanto."""
+        with self.lock:
+            if not writer.queue.empty():
+                return False
+            if self._writers.get(writer.group_id) is writer:
+                del self._writers[writer.group_id]
+            return True
+
+    def record_write(self, submissions: int, messages: int):
+        with self.lock:
+            self.writes += 1
+            self.messages += messages
+            self.max_batch = max(self.max_batch, submissions)
+
+    def queue_depth(self, group_id: str) -> int:
+        """Mensajes pendientes (encolados o en escritura) del grupo."""
+        with self.lock:
+            writer = self._writers.get(group_id)
+            return writer.pending if writer else 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "active_writers": len(self._writers),
+                "queue_depth": {group_id: w.pending for group_id, w in self._writers.items() if w.pending},
+                "writes": self.writes,
+                "messages": self.messages,
+                "max_coalesced_submissions": self.max_batch,
+            }
@@ -0,0 +1,273 @@
+"""
+Cola duradera de la ingesta asíncrona.
+
+POST /groups/{id}/ingest solo anota el mensaje en un fichero de solo-anexado
+(local_bundle/spool/spool-<seq>.jsonl) y lo entrega al escritor del grupo
+(group_writer), que lo persiste en segundo plano con la lógica habitual de
+persist_messages y lo agrupa con el resto de mensajes encolados.
+
+- Contrapresión: hay un límite de mensajes pendientes global y otro por grupo; al
+  superarlos se rechaza con QueueFull (la API responde 429 con Retry-After).
+- Recuperación: un segmento de la cola se borra cuando todos sus mensajes están
+  persistidos. El punto de control (el nº de secuencia hasta el que todo está
+  persistido) se escribe cada medio segundo durante la actividad y siempre que la
+  cola se vacía. Al arrancar se vuelven a entregar los mensajes de los segmentos que
+  queden posteriores al punto de control; cada mensaje lleva desde la cola su msg_id
+  y su nº de secuencia (spool_seq en el registro), así que los que ya estaban en el
+  log se reconocen y no se duplican.
+- Los mensajes que fallan al persistirse se apartan a failed.jsonl con el error.
+
+La cola pertenece a un único proceso servidor (se reclama con un FileLock); si otro
+proceso ya la tiene, este ingiere de forma síncrona.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from filelock import FileLock, Timeout
+
+from ..core.utils import validate_group_id
+from ..core.config import (
+    INGEST_ASYNC, INGEST_QUEUE_MAX, INGEST_QUEUE_MAX_PER_GROUP, INGEST_RETRY_AFTER_SECONDS,
+    SPOOL_FSYNC, SPOOL_SEGMENT_MAX_BYTES,
+)
+from ..models import schemas
+from . import group_service
+
+SPOOL_DIR = group_service.ROOT_DIR / "local_bundle/spool"
+CHECKPOINT_INTERVAL_SECONDS = 0.5
+
+
+class QueueFull(Exception):
+    def __init__(self, message: str, retry_after: int = INGEST_RETRY_AFTER_SECONDS):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class IngestSpool:
+    def __init__(self, spool_dir: Path = SPOOL_DIR, max_pending: int = INGEST_QUEUE_MAX,
+                 max_pending_per_group: int = INGEST_QUEUE_MAX_PER_GROUP,
+                 segment_max_bytes: int = SPOOL_SEGMENT_MAX_BYTES, fsync: bool = SPOOL_FSYNC):
+        self.spool_dir = spool_dir
+        self.max_pending = max_pending
+        self.max_pending_per_group = max_pending_per_group
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        # Reentrante: si el escritor termina antes de registrar la confirmación, esta se
+        # ejecuta en el propio hilo que encola.
+        self.lock = threading.RLock()
+        self.started = False
+        self.enabled = False
+        self._claim = None
+        self._seq = 0
+        self._file = None
+        self._active: Path | None = None
+        self._outstanding: dict[Path, int] = {}              # segmento -> mensajes sin persistir
+        self._pending: dict[int, tuple[str, Path, float]] = {}  # seq -> (grupo, segmento, encolado)
+        self._pending_by_group: Counter = Counter()
+        self._last_checkpoint = 0.0
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        """Reclama la cola, reentrega lo pendiente de una ejecución anterior y abre un segmento nuevo."""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            claim = FileLock(self.spool_dir / "spool.lock")
+            try:
+                claim.acquire(timeout=0)
+            except Timeout:
+                logging.warning(f"La cola de ingesta '{self.spool_dir}' pertenece a otro proceso; ingesta síncrona.")
+                return
+            self._claim = claim
+            self.enabled = True
+            self._recover()
+            self._open_segment()
+
+    def stop(self):
+        with self.lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+            if self.enabled:
+                self._write_checkpoint()
+            if self._claim:
+                self._claim.release()
+                self._claim = None
+            self.started = self.enabled = False
+
+    def _segments(self) -> list[Path]:
+        return sorted(self.spool_dir.glob("spool-*.jsonl"))
+
+    def _read_checkpoint(self) -> int:
+        try:
+            return int((self.spool_dir / "checkpoint").read_text().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_checkpoint(self):
+        watermark = next(iter(self._pending), self._seq + 1) - 1
+        tmp_path = self.spool_dir / ".checkpoint.tmp"
+        tmp_path.write_text(str(watermark))
+        os.replace(tmp_path, self.spool_dir / "checkpoint")
+        self._last_checkpoint = time.monotonic()
+
+    def _recover(self):
+        checkpoint = self._read_checkpoint()
+        self._seq = checkpoint
+        replay = []
+        for segment in self._segments():
+            self._outstanding[segment] = 0
+            with open(segment, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Línea truncada por una caída a mitad de escritura.
+                    self._seq = max(self._seq, entry["seq"])
+                    if entry["seq"] > checkpoint:
+                        replay.append((segment, entry))
+        persisted = self._persisted_ids(entry for _, entry in replay)
+        redelivered = 0
+        for segment, entry in replay:
+            if entry.get("msg_id") in persisted.get(entry["group_id"], ()):
+                continue
+            self._dispatch(entry, segment, time.monotonic())
+            redelivered += 1
+        for segment, outstanding in list(self._outstanding.items()):
+            if not outstanding:
+                self._remove_segment(segment)
+        self._write_checkpoint()
+        if replay:
+            logging.info(f"Cola de ingesta: {redelivered} mensajes pendientes reentregados "
+                         f"({len(replay) - redelivered} ya estaban persistidos).")
+
+    @staticmethod
+    def _persisted_ids(entries) -> dict[str, set[str]]:
+        """msg_id ya presentes en el log de cada grupo, entre los mensajes a reentregar."""
+        first_seq: dict[str, int] = {}
+        for entry in entries:
+            if entry.get("msg_id"):
+                first_seq[entry["group_id"]] = min(first_seq.get(entry["group_id"], entry["seq"]), entry["seq"])
+        return {group_id: group_service.spooled_msg_ids(group_id, seq) for group_id, seq in first_seq.items()}
+
+    def _open_segment(self):
+        self._active = self.spool_dir / f"spool-{self._seq + 1:012d}.jsonl"
+        self._file = open(self._active, "a", encoding="utf-8")
+        self._outstanding.setdefault(self._active, 0)
+
+    def _remove_segment(self, segment: Path):
+        del self._outstanding[segment]
+        segment.unlink(missing_ok=True)
+
+    # --- Encolado y confirmación ---
+
+    def enqueue(self, group_id: str, message: schemas.MessageIngest) -> int:
+        """Anota el mensaje en la cola duradera y lo entrega al escritor del grupo. Devuelve su nº de secuencia."""
+        validate_group_id(group_id)
+        if not self.started:
+            self.start()
+        if not self.enabled:
+            group_service.persist_message(group_id, message)
+            return 0
+        payload = message.model_dump(mode="json")
+        with self.lock:
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"La cola de ingesta está llena ({self.max_pending} mensajes pendientes).")
+            if self._pending_by_group[group_id] >= self.max_pending_per_group:
+                self.rejected += 1
+                raise QueueFull(f"La cola de ingesta del grupo '{group_id}' está llena.")
+            self._seq += 1
+            entry = {"seq": self._seq, "group_id": group_id, "msg_id": str(uuid.uuid4()), "message": payload}
+            self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.enqueued += 1
+            self._dispatch(entry, self._active, time.monotonic())
+            if self._file.tell() >= self.segment_max_bytes:
+                self._file.close()
+                self._open_segment()
+            return entry["seq"]
+
+    def _dispatch(self, entry: dict, segment: Path, enqueued_at: float):
+        seq, group_id = entry["seq"], entry["group_id"]
+        self._pending[seq] = (group_id, segment, enqueued_at)
+        self._pending_by_group[group_id] += 1
+        self._outstanding[segment] += 1
+        if "msg_id" in entry:
+            message = schemas.SpooledMessage(**entry["message"], msg_id=entry["msg_id"], spool_seq=seq)
+        else:
+            message = schemas.MessageIngest(**entry["message"])  # Cola escrita por una versión anterior.
+        future = group_service.writers.submit(group_id, [message])
+        future.add_done_callback(lambda f: self._ack(entry, f))
+
+    def _ack(self, entry: dict, future):
+        error = future.exception()
+        if error is not None:
+            logging.error(f"[{entry['group_id']}] No se pudo persistir el mensaje {entry['seq']} de la cola: {error}")
+        with self.lock:
+            group_id, segment, enqueued_at = self._pending.pop(entry["seq"])
+            self._pending_by_group[group_id] -= 1
+            if not self._pending_by_group[group_id]:
+                del self._pending_by_group[group_id]
+            self.last_lag = time.monotonic() - enqueued_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+            if error is not None:
+                self.failed += 1
+                with open(self.spool_dir / "failed.jsonl", "a", encoding="utf-8") as f:
+                    f.write(json.dumps({**entry, "error": str(error), "failed_at": datetime.utcnow().isoformat()},
+                                       ensure_ascii=False) + "\n")
+            else:
+                self.processed += 1
+            self._outstanding[segment] -= 1
+            if segment != self._active and not self._outstanding[segment]:
+                self._remove_segment(segment)
+            # Con la cola vacía el punto de control llega hasta el último mensaje; si no,
+            # se avanza como mucho cada CHECKPOINT_INTERVAL_SECONDS.
+            if self.enabled and (not self._pending
+                                 or time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL_SECONDS):
+                self._write_checkpoint()
+
+    # --- Métricas ---
+
+    def queue_depth(self, group_id: str | None = None) -> int:
+        with self.lock:
+            return self._pending_by_group[group_id] if group_id else len(self._pending)
+
+    def stats(self) -> dict:
+        with self.lock:
+            oldest = next(iter(self._pending.values()), None)
+            return {
+                "enabled": self.enabled,
+                "pending": len(self._pending),
+                "pending_by_group": dict(self._pending_by_group),
+                "oldest_pending_seconds": round(time.monotonic() - oldest[2], 3) if oldest else 0.0,
+                "enqueued": self.enqueued,
+                "processed": self.processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "last_lag_seconds": round(self.last_lag, 3),
+                "max_lag_seconds": round(self.max_lag, 3),
+                "segments": len(self._outstanding),
+                "limits": {"max_pending": self.max_pending, "max_pending_per_group": self.max_pending_per_group},
+            }
+
+
+spool = IngestSpool()
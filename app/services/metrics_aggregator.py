@@ -0,0 +1,86 @@
+"""
+Agregador incremental de las métricas en tiempo real de cada grupo.
+
+Mantiene, por grupo, las medianas de arousal/valence/uncertainty de la ventana corta
+y los contadores de mensajes/alertas de la ventana de fricción, alimentados en la
+ingesta. Así /groups/{id}/metrics responde en O(log n) sin recorrer el log.
+Los resultados coinciden con el cálculo por recorrido del log de get_group_metrics.
+
+Los agregadores viven en un ViewRegistry, asociados a la firma en disco del grupo.
+"""
+from datetime import datetime, timedelta
+from typing import Callable, Iterable
+
+from .derived_views import ViewRegistry
+from .rolling import ReverseScanCounter, RollingMedian, to_epoch_us
+
+METRICS_WINDOW_MINUTES = 10
+FRICTION_WINDOW_HOURS = 24
+AFFECT_KEYS = ("arousal_z", "valence_z", "uncertainty_z")
+
+
+class GroupMetricsAggregator:
+    def __init__(self, window_minutes: int = METRICS_WINDOW_MINUTES, friction_window_hours: int = FRICTION_WINDOW_HOURS):
+        self.window = timedelta(minutes=window_minutes)
+        self.friction_window = timedelta(hours=friction_window_hours)
+        self.medians = {key: RollingMedian() for key in AFFECT_KEYS}
+        self.counter = ReverseScanCounter(("message", "alert"))
+
+    def observe(self, record: dict):
+        """Incorpora el siguiente registro del log (en orden de log)."""
+        try:
+            ts_us = to_epoch_us(record.get("ts", ""))
+        except (ValueError, TypeError):
+            ts_us = None
+        kind = record.get("type")
+        self.counter.add(ts_us, kind)
+        if kind == "message" and "affective_proxy" in record and ts_us is not None:
+            proxy = record["affective_proxy"]
+            self.medians["arousal_z"].add(ts_us, proxy["arousal_z"])
+            self.medians["valence_z"].add(ts_us, proxy.get("valence_z", 0.0))
+            self.medians["uncertainty_z"].add(ts_us, proxy.get("uncertainty_z", 0.0))
+
+    def extend(self, records: Iterable[dict]):
+        for record in records:
+            self.observe(record)
+        # Lo que ya no puede entrar en la ventana de fricción no hace falta retenerlo.
+        self.counter.trim(to_epoch_us(datetime.utcnow() - self.friction_window))
+
+    def snapshot(self, now: datetime) -> dict:
+        """Métricas en el instante 'now' (que no debe retroceder entre llamadas)."""
+        affect_cutoff_us = to_epoch_us(now - self.window)
+        for median in self.medians.values():
+            median.expire(affect_cutoff_us)
+
+        friction_start_us = to_epoch_us(now - self.friction_window)
+        counts = self.counter.counts(friction_start_us)
+        self.counter.trim(friction_start_us)
+        message_count, alert_count = counts["message"], counts["alert"]
+
+        return {
+            "friction_index": (alert_count / message_count) if message_count > 0 else 0.0,
+            "affective_proxy": {key: self.medians[key].median() for key in AFFECT_KEYS},
+        }
+
+    def can_serve(self, now: datetime) -> bool:
+        cutoff = self.medians["arousal_z"].cutoff_us
+        return cutoff is None or to_epoch_us(now - self.window) >= cutoff
+
+
+registry = ViewRegistry(GroupMetricsAggregator)
+
+
+def get_metrics(group_id: str, signature: tuple, load_log: Callable[[], Iterable[dict]],
+                now: datetime | None = None) -> dict:
+    """
+    Devuelve las métricas del grupo desde su agregador, reconstruyéndolo con
+    'load_log' si no existe o si no corresponde a la firma en disco actual.
+    Sin 'now', se toma bajo el candado del registro para que nunca sea anterior al
+    usado al recortar en la ingesta. Con un 'now' común (varios grupos a la vez),
+    un agregador que ya haya avanzado más allá se reconstruye.
+    """
+    return registry.use(
+        group_id, signature, load_log,
+        fn=lambda aggregator: aggregator.snapshot(now or datetime.utcnow()),
+        is_valid=lambda aggregator: aggregator.can_serve(now or datetime.utcnow()),
+    )
@@ -0,0 +1,162 @@
+"""
+Detector incremental de tensión sostenida para las sugerencias de pausa.
+
+check_and_suggest_pause decide si la mediana de arousal_z supera el umbral en cada
+una de las sub-ventanas de la última hora. En lugar de reconstruir en cada ingesta
+la lista de mensajes de la ventana, el detector mantiene los valores repartidos en
+una cubeta por sub-ventana, con sus valores ordenados para obtener la mediana en
+O(1). Al avanzar el reloj cada valor pasa de una cubeta a la siguiente y al final
+se descarta, de modo que el coste por mensaje depende de los mensajes de la última
+hora y no del tamaño del log.
+
+Las sub-ventanas reproducen exactamente las del recorrido original (con 'now' en
+microsegundos): [now-(i+1)·S, now-i·S), salvo la última, abierta por la izquierda
+(ts > now-W). Los mensajes con ts >= now esperan en una cubeta propia hasta que
+el reloj los alcanza.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+from ..core.config import STATE_CACHE_MAX_ENTRIES
+from .rolling import to_epoch_us
+
+
+class _MedianBucket:
+    def __init__(self):
+        self.by_ts: list[tuple[int, float]] = []
+        self.values: list[float] = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, ts_us: int, value: float):
+        insort(self.by_ts, (ts_us, value))
+        insort(self.values, value)
+
+    def pop_before(self, bound_us: int) -> list[tuple[int, float]]:
+        """Extrae los valores con ts < bound_us."""
+        end = bisect_left(self.by_ts, (bound_us, float("-inf")))
+        if not end:
+            return []
+        items = self.by_ts[:end]
+        del self.by_ts[:end]
+        for _, value in items:
+            del self.values[bisect_left(self.values, value)]
+        return items
+
+    def median(self) -> float:
+        """Misma aritmética que statistics.median."""
+        n = len(self.values)
+        i = n // 2
+        if n % 2 == 1:
+            return self.values[i]
+        return (self.values[i - 1] + self.values[i]) / 2
+
+
+class SustainedArousalDetector:
+    def __init__(self, window_min: int, sub_windows: int):
+        self.window_us = window_min * 60 * 1_000_000
+        self.sub_us = self.window_us // sub_windows
+        self.now_us: int | None = None
+        self._upcoming = _MedianBucket()
+        self._buckets = [_MedianBucket() for _ in range(sub_windows)]
+
+    def _slot(self, ts_us: int) -> int | None:
+        """Sub-ventana de un ts respecto al reloj actual: -1 si aún no ha llegado, None si ya expiró."""
+        if ts_us >= self.now_us:
+            return -1
+        if ts_us <= self.now_us - self.window_us:
+            return None
+        return (self.now_us - ts_us - 1) // self.sub_us
+
+    def _place(self, ts_us: int, value: float):
+        slot = self._slot(ts_us)
+        if slot == -1:
+            self._upcoming.add(ts_us, value)
+        elif slot is not None:
+            self._buckets[slot].add(ts_us, value)
+
+    def add(self, ts_us: int, value: float):
+        """Registra el arousal_z de un mensaje."""
+        if self.now_us is None:
+            self._upcoming.add(ts_us, value)
+        else:
+            self._place(ts_us, value)
+
+    def extend(self, records: Iterable[dict]):
+        for record in records:
+            if record.get("type") != "message" or not record.get("affective_proxy"):
+                continue
+            try:
+                ts_us = to_epoch_us(record.get("ts", ""))
+            except (ValueError, TypeError):
+                continue  # El recorrido original tampoco puede interpretar estos registros.
+            self.add(ts_us, record["affective_proxy"]["arousal_z"])
+
+    def advance(self, now_us: int) -> bool:
+        """Mueve el reloj hacia delante. Devuelve False si 'now_us' es anterior al reloj actual."""
+        if self.now_us is not None and now_us < self.now_us:
+            return False
+        self.now_us = now_us
+        last = len(self._buckets) - 1
+        for i in range(last, -1, -1):
+            bound = now_us - (i + 1) * self.sub_us
+            if i == last:
+                bound += 1  # La última sub-ventana excluye su límite inferior.
+            for ts_us, value in self._buckets[i].pop_before(bound):
+                self._place(ts_us, value)
+        for ts_us, value in self._upcoming.pop_before(now_us):
+            self._place(ts_us, value)
+        return True
+
+    def all_sub_windows_high(self, now_us: int, threshold: float) -> bool | None:
+        """
+        Indica si todas las sub-ventanas tienen mensajes y mediana >= threshold.
+        Devuelve None si el reloj ha retrocedido (el detector ya no puede responder).
+        """
+        if not self.advance(now_us):
+            return None
+        return all(bucket and bucket.median() >= threshold for bucket in self._buckets)
+
+
+class DetectorRegistry:
+    """
+    Detectores por grupo, asociados a la firma en disco con la que son coherentes.
+    La ingesta (el escritor único del grupo) toma el detector, le añade los mensajes
+    del lote y lo devuelve con la nueva firma solo si la escritura se completa.
+    """
+
+    def __init__(self, factory: Callable[[], SustainedArousalDetector], max_entries: int = STATE_CACHE_MAX_ENTRIES):
+        self.factory = factory
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._detectors: OrderedDict[str, tuple[tuple, SustainedArousalDetector]] = OrderedDict()
+        self.builds = 0
+
+    def checkout(self, group_id: str, signature: tuple | None, load_log: Callable[[], Iterable[dict]],
+                 now_us: int) -> SustainedArousalDetector:
+        with self.lock:
+            entry = self._detectors.pop(group_id, None)
+        if entry is not None and signature is not None and entry[0] == signature and entry[1].advance(now_us):
+            return entry[1]
+        detector = self.factory()
+        detector.advance(now_us)
+        if signature is not None:
+            detector.extend(load_log())
+        self.builds += 1
+        return detector
+
+    def checkin(self, group_id: str, signature: tuple | None, detector: SustainedArousalDetector):
+        if signature is None:
+            return
+        with self.lock:
+            self._detectors[group_id] = (signature, detector)
+            self._detectors.move_to_end(group_id)
+            while len(self._detectors) > self.max_entries:
+                self._detectors.popitem(last=False)
+
+    def invalidate(self, group_id: str):
+        with self.lock:
+            self._detectors.pop(group_id, None)
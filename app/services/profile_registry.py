@@ -0,0 +1,110 @@
+"""
+Registro compartido de perfiles (profiles/groups.yaml y profiles/users.yaml).
+
+Cada fichero se interpreta una sola vez y se construyen índices en memoria:
+grupos por id, usuarios por id y pertenencia (usuario -> grupos). Cuando cambia el
+mtime o el tamaño de algún fichero se recarga todo y se sustituye la instantánea
+de una vez, de modo que un lector nunca ve una mezcla de versiones. Si la nueva
+versión no se puede interpretar se mantiene la anterior.
+
+Las instantáneas son compartidas: quien las lea no debe modificarlas.
+"""
+import logging
+import threading
+import time
+from pathlib import Path
+
+import yaml
+
+from ..core.config import PROFILE_RELOAD_CHECK_SECONDS
+from . import storage_codec
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+PROFILES_DIR = ROOT_DIR / "profiles"
+
+
+class ProfileSnapshot:
+    def __init__(self, groups: dict, users: dict):
+        self.groups = groups
+        self.users = users
+        self.memberships: dict[str, list[str]] = {}
+        for group_id, profile in groups.items():
+            for user_id in (profile or {}).get("users", []) or []:
+                self.memberships.setdefault(user_id, []).append(group_id)
+
+
+class ProfileRegistry:
+    def __init__(self, profiles_dir: Path = PROFILES_DIR, check_interval: float = PROFILE_RELOAD_CHECK_SECONDS):
+        self.profiles_dir = profiles_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = ProfileSnapshot({}, {})
+        self._signature = None
+        self._checked_at = None
+        self.reloads = 0
+
+    def _paths(self) -> tuple[Path, Path]:
+        return self.profiles_dir / "groups.yaml", self.profiles_dir / "users.yaml"
+
+    def _file_signature(self) -> tuple:
+        signature = []
+        for path in self._paths():
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    @staticmethod
+    def _load(path: Path) -> dict:
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return storage_codec.load_yaml(f) or {}
+
+    def snapshot(self) -> ProfileSnapshot:
+        """Instantánea vigente, recargada si los ficheros han cambiado desde la última comprobación."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._snapshot
+            signature = self._file_signature()
+            if signature != self._signature:
+                groups_path, users_path = self._paths()
+                try:
+                    self._snapshot = ProfileSnapshot(self._load(groups_path), self._load(users_path))
+                    self.reloads += 1
+                except (IOError, yaml.YAMLError) as e:
+                    logging.error(f"No se pudieron recargar los perfiles de '{self.profiles_dir}': {e}. Se mantiene la versión anterior.")
+                self._signature = signature
+            self._checked_at = now
+            return self._snapshot
+
+    def group(self, group_id: str) -> dict:
+        """Perfil completo de un grupo ({} si no tiene)."""
+        return self.snapshot().groups.get(group_id) or {}
+
+    def group_settings(self, group_id: str) -> dict:
+        """Sección 'companion_settings' de un grupo."""
+        return self.group(group_id).get("companion_settings", {})
+
+    def group_users(self, group_id: str) -> list[str]:
+        return self.group(group_id).get("users", [])
+
+    def user(self, user_id: str) -> dict:
+        return self.snapshot().users.get(user_id) or {}
+
+    def groups_of(self, user_id: str) -> list[str]:
+        """Grupos a los que pertenece un usuario según groups.yaml."""
+        return self.snapshot().memberships.get(user_id, [])
+
+    def invalidate(self):
+        """Fuerza la comprobación de los ficheros en la próxima consulta."""
+        with self._lock:
+            self._checked_at = None
+
+
+registry = ProfileRegistry()
@@ -0,0 +1,81 @@
+"""
+Caché en proceso de respuestas ya serializadas de las lecturas de grupos, con su ETag.
+
+Cada entrada guarda el ETag con el que se generó y el cuerpo JSON en bytes; solo se
+sirve si el ETag actual del recurso coincide. Para el estado de un grupo el ETag se
+deriva de la firma en disco (ver group_service.state_etag), de modo que repetir la consulta sin cambios no vuelve a
+leer ni a serializar nada. Acotada por bytes y con expulsión LRU.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from ..core.config import RESPONSE_CACHE_MAX_BYTES
+
+
+def content_etag(body: bytes) -> str:
+    """ETag fuerte derivado del contenido (para respuestas que dependen del instante)."""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Indica si la cabecera If-None-Match incluye 'etag' (comparación débil, como exige RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple[str, bytes]] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, etag: str) -> bytes | None:
+        """Cuerpo cacheado para 'key' si se generó con este ETag, o None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, etag: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (etag, body)
+            self._total_bytes += len(body)
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted)
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# Instancia compartida por todo el proceso.
+cache = ResponseCache()
@@ -0,0 +1,135 @@
+"""
+Estructuras de ventana deslizante para mantener agregados en tiempo de ingesta.
+
+Los timestamps se manejan como microsegundos enteros desde la época (UTC ingenuo),
+lo que permite comparar exactamente igual que con objetos datetime.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+
+def to_epoch_us(ts: str | datetime) -> int:
+    """Convierte un timestamp ISO (o datetime) a microsegundos, ignorando la zona horaria como el resto del servicio."""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    return (ts.replace(tzinfo=None) - _EPOCH) // _ONE_US
+
+
+def from_epoch_us(ts_us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=ts_us)
+
+
+class RollingMedian:
+    """
+    Multiconjunto de valores con timestamp que mantiene la mediana de los valores
+    cuyo ts es estrictamente posterior a un corte que solo avanza.
+    Inserción O(log n) (más desplazamiento de memoria), mediana O(1).
+    """
+
+    def __init__(self):
+        self._by_ts: list[tuple[int, float]] = []
+        self._values: list[float] = []
+        self.cutoff_us: int | None = None
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, ts_us: int, value: float):
+        if self.cutoff_us is not None and ts_us <= self.cutoff_us:
+            return
+        insort(self._by_ts, (ts_us, value))
+        insort(self._values, value)
+
+    def expire(self, cutoff_us: int):
+        """Descarta los valores con ts <= cutoff_us. El corte no puede retroceder."""
+        if self.cutoff_us is not None and cutoff_us < self.cutoff_us:
+            raise ValueError("El corte de la ventana no puede retroceder.")
+        self.cutoff_us = cutoff_us
+        end = bisect_right(self._by_ts, (cutoff_us, float("inf")))
+        for _, value in self._by_ts[:end]:
+            del self._values[bisect_left(self._values, value)]
+        del self._by_ts[:end]
+
+    def median(self, default: float = 0.0) -> float:
+        """Misma aritmética que statistics.median sobre los valores vigentes."""
+        n = len(self._values)
+        if n == 0:
+            return default
+        i = n // 2
+        if n % 2 == 1:
+            return self._values[i]
+        return (self._values[i - 1] + self._values[i]) / 2
+
+
+class ReverseScanCounter:
+    """
+    Contadores por tipo de registro equivalentes a recorrer el log desde el final y
+    detenerse en el primer registro con ts < inicio de ventana (el recorrido que hacen
+    get_group_metrics y has_recent_alerts).
+
+    Se mantiene una pila monótona de posiciones candidatas a detener el recorrido
+    (mínimos estrictos por la derecha) y conteos acumulados por posición, de forma que
+    cada consulta es una búsqueda binaria. Las posiciones que ya nunca pueden quedar
+    dentro de la ventana se descartan, así que la memoria se limita a la ventana.
+    """
+
+    def __init__(self, kinds: tuple[str, ...]):
+        self.kinds = kinds
+        self._offset = 0                        # posición absoluta del primer elemento retenido
+        self._cumulative: list[tuple[int, ...]] = [tuple(0 for _ in kinds)]
+        self._stack_pos: list[int] = []         # posiciones absolutas, ts estrictamente creciente
+        self._stack_ts: list[int] = []
+        self._positions_by_kind: dict[str, list[int]] = {kind: [] for kind in kinds}
+
+    def add(self, ts_us: int | None, kind: str):
+        """Registra el siguiente registro del log (ts None si no se pudo interpretar)."""
+        previous = self._cumulative[-1]
+        position = self._offset + len(self._cumulative) - 1
+        if ts_us is None:
+            self._cumulative.append(previous)
+            return
+        self._cumulative.append(tuple(
+            count + (1 if kind == name else 0) for count, name in zip(previous, self.kinds)
+        ))
+        if kind in self._positions_by_kind:
+            self._positions_by_kind[kind].append(position)
+        while self._stack_ts and self._stack_ts[-1] >= ts_us:
+            self._stack_ts.pop()
+            self._stack_pos.pop()
+        self._stack_ts.append(ts_us)
+        self._stack_pos.append(position)
+
+    def _break_position(self, start_us: int) -> int:
+        """Posición del último registro con ts < start_us, o offset-1 si no hay ninguno."""
+        i = bisect_left(self._stack_ts, start_us)
+        return self._stack_pos[i - 1] if i > 0 else self._offset - 1
+
+    def counts(self, start_us: int) -> dict[str, int]:
+        """Conteos por tipo en el recorrido inverso hasta el primer ts < start_us."""
+        stop = self._break_position(start_us)
+        base = self._cumulative[stop + 1 - self._offset]
+        last = self._cumulative[-1]
+        return {name: last[i] - base[i] for i, name in enumerate(self.kinds)}
+
+    def has_kind(self, start_us: int, kind: str) -> bool:
+        """Indica si el recorrido inverso hasta el primer ts < start_us encuentra un registro de 'kind'."""
+        stop = self._break_position(start_us)
+        positions = self._positions_by_kind[kind]
+        return bool(positions) and positions[-1] > stop
+
+    def trim(self, start_us: int):
+        """Descarta lo que ya no puede entrar en ventanas con inicio >= start_us."""
+        stop = self._break_position(start_us)
+        drop = stop + 1 - self._offset
+        if drop <= 0:
+            return
+        del self._cumulative[:drop]
+        self._offset += drop
+        i = bisect_left(self._stack_pos, self._offset)
+        del self._stack_pos[:i]
+        del self._stack_ts[:i]
+        for positions in self._positions_by_kind.values():
+            del positions[:bisect_left(positions, self._offset)]
@@ -0,0 +1,96 @@
+"""
+Caché compartida, en proceso, del estado parseado de los grupos.
+
+Cada entrada se valida contra la firma en disco del grupo (mtime/tamaño) y contra un
+contador de generación que se incrementa con cada escritura hecha en este proceso.
+La caché está acotada por número de entradas y por bytes (tamaño en disco como
+aproximación) y expulsa primero las entradas usadas hace más tiempo (LRU).
+
+Los estados devueltos son compartidos: quien los lea no debe modificarlos.
+"""
+import threading
+from collections import OrderedDict
+
+from ..core.config import STATE_CACHE_MAX_BYTES, STATE_CACHE_MAX_ENTRIES
+
+
+class GroupStateCache:
+    def __init__(self, max_entries: int = STATE_CACHE_MAX_ENTRIES, max_bytes: int = STATE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple] = OrderedDict()  # group_id -> (clave, estado, bytes)
+        self._generations: dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generation(self, group_id: str) -> int:
+        """Generación de escritura actual del grupo en este proceso."""
+        return self._generations.get(group_id, 0)
+
+    def bump_generation(self, group_id: str) -> int:
+        """Marca una escritura del grupo: invalida su entrada y devuelve la nueva generación."""
+        with self._lock:
+            self._generations[group_id] = self._generations.get(group_id, 0) + 1
+            self._drop(group_id)
+            return self._generations[group_id]
+
+    def get(self, group_id: str, signature: tuple):
+        """Devuelve el estado cacheado si sigue siendo válido para la firma dada, o None."""
+        key = (self.generation(group_id), signature)
+        with self._lock:
+            entry = self._entries.get(group_id)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(group_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, group_id: str, signature: tuple, state: dict, size: int, generation: int):
+        """
+        Guarda un estado recién parseado, expulsando entradas antiguas si hace falta.
+        'generation' debe capturarse antes de leer el disco: si hubo una escritura entretanto
+        la entrada nace ya obsoleta y nunca se servirá.
+        """
+        if size > self.max_bytes:
+            return
+        key = (generation, signature)
+        with self._lock:
+            self._drop(group_id)
+            self._entries[group_id] = (key, state, size)
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, group_id: str):
+        with self._lock:
+            self._drop(group_id)
+
+    def _drop(self, group_id: str):
+        entry = self._entries.pop(group_id, None)
+        if entry is not None:
+            self._total_bytes -= entry[2]
+
+    def stats(self) -> dict:
+        """Contadores para observabilidad (expuestos en /health/cache)."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# Instancia compartida por todo el proceso.
+cache = GroupStateCache()
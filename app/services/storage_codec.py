@@ -0,0 +1,97 @@
+"""
+Códecs de almacenamiento para la memoria de grupos (y los YAML de configuración).
+
+- "yaml": formato legible por personas. Usa el cargador/volcador en C de libyaml
+  (CSafeLoader/CSafeDumper) cuando PyYAML está compilado con él, con el mismo
+  comportamiento que yaml.safe_load/yaml.dump y mucho menos coste de CPU.
+- "json": formato compacto y muy rápido de leer y escribir. Cuando es el códec
+  primario, el YAML se genera bajo demanda (exportación) para su lectura humana.
+
+Las escrituras son atómicas: se escribe un temporal y se sustituye con os.replace,
+de modo que un lector nunca ve un fichero a medio escribir.
+"""
+import json
+import os
+from pathlib import Path
+
+import yaml
+
+from ..core.config import GROUP_CODEC
+
+try:
+    _YamlLoader = yaml.CSafeLoader
+    _YamlDumper = yaml.CSafeDumper
+    LIBYAML_AVAILABLE = True
+except AttributeError:  # PyYAML sin libyaml
+    _YamlLoader = yaml.SafeLoader
+    _YamlDumper = yaml.SafeDumper
+    LIBYAML_AVAILABLE = False
+
+# Errores de formato que puede lanzar cualquier códec al cargar.
+DecodeError = (yaml.YAMLError, json.JSONDecodeError)
+
+
+def load_yaml(text_or_stream):
+    """Equivalente a yaml.safe_load, acelerado con libyaml si está disponible."""
+    return yaml.load(text_or_stream, Loader=_YamlLoader)
+
+
+def dump_yaml(data, stream=None, sort_keys: bool = False):
+    """Equivalente a yaml.dump con el estilo de bloque del proyecto."""
+    return yaml.dump(data, stream, Dumper=_YamlDumper, default_flow_style=False,
+                     allow_unicode=True, sort_keys=sort_keys)
+
+
+def _atomic_write(path: Path, write):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class YamlCodec:
+    name = "yaml"
+    suffix = ".yaml"
+
+    def load(self, path: Path):
+        with open(path, "r", encoding="utf-8") as f:
+            return load_yaml(f)
+
+    def dump(self, data, path: Path):
+        _atomic_write(path, lambda f: dump_yaml(data, f))
+
+
+class JsonCodec:
+    name = "json"
+    suffix = ".json"
+
+    def load(self, path: Path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def dump(self, data, path: Path):
+        _atomic_write(path, lambda f: json.dump(data, f, ensure_ascii=False, separators=(",", ":")))
+
+
+CODECS = {codec.name: codec for codec in (YamlCodec(), JsonCodec())}
+SUFFIXES = tuple(codec.suffix for codec in CODECS.values())
+
+
+def get_codec(name: str):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Códec de almacenamiento desconocido: '{name}'") from None
+
+
+DEFAULT_CODEC = get_codec(GROUP_CODEC)
+
+
+def codec_for(path: Path):
+    """Códec que corresponde a un fichero según su extensión."""
+    for codec in CODECS.values():
+        if path.suffix == codec.suffix:
+            return codec
+    raise ValueError(f"Extensión de fichero de grupo no soportada: '{path.name}'")
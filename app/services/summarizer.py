@@ -1,21 +1,42 @@
 import re
 import yaml
+import hashlib
+import json
 from collections import Counter
 from datetime import datetime, timedelta
+from fractions import Fraction
 import statistics
 from pathlib import Path
 from functools import lru_cache
+from typing import Iterable
+
+from ..core.config import SUMMARY_RULE_ENGINES_MAX, SUMMARY_STEM_CACHE_MAX
 
 RULES_PATH = Path(__file__).parent.parent / "i18n/summarizer_rules.yaml"
 
-@lru_cache(maxsize=1)
+_WORD_RE = re.compile(r'\b\w{3,}\b') # Palabras de 3 o más letras
+_REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+
+def _rules_version() -> int:
+    """Versión del fichero de reglas (su mtime); 0 si no existe."""
+    try:
+        return RULES_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
 def _load_summarizer_rules() -> dict:
+    """Reglas vigentes: se releen solo cuando cambia la versión del fichero."""
+    return _load_rules_version(_rules_version())
+
+@lru_cache(maxsize=2)
+def _load_rules_version(version: int) -> dict:
     """Carga las reglas (stopwords, keywords, patterns) desde un fichero YAML."""
-    if not RULES_PATH.exists():
+    if not version:
         return {"stopwords": {}, "decision_keywords": {}, "action_patterns": {}}
     try:
         with open(RULES_PATH, "r", encoding="utf-8") as f:
             rules = yaml.safe_load(f) or {}
+        rules["version"] = version
         # Convertir listas de stopwords a sets para búsquedas eficientes
         if "stopwords" in rules and isinstance(rules["stopwords"], dict):
             for lang, words in rules["stopwords"].items():
@@ -78,29 +99,131 @@ def _simple_stem_it(word: str) -> str:
 
 STEMMERS = {"es": _simple_stem_es, "en": _simple_stem_en, "fr": _simple_stem_fr, "it": _simple_stem_it}
 
-def _multilang_stem(word: str, lang: str) -> str:
-    return STEMMERS.get(lang, lambda w: w)(word)
+@lru_cache(maxsize=None)
+def _memo_stemmer(lang: str):
+    """Stemmer del idioma con memoria: cada palabra distinta se reduce una sola vez."""
+    return lru_cache(maxsize=SUMMARY_STEM_CACHE_MAX)(STEMMERS.get(lang, lambda w: w))
 
-def _extract_topics(texts: list[str], lang: str, top_n: int = 5) -> list[str]:
-    """Extrae los temas más comunes de una lista de textos usando un stemmer específico del idioma."""
-    if not texts:
-        return []
+def _multilang_stem(word: str, lang: str) -> str:
+    return _memo_stemmer(lang)(word)
 
-    rules = _load_summarizer_rules()
-    stopwords_for_lang = rules.get("stopwords", {}).get(lang, set())
-    full_text = " ".join(texts).lower()
-    words = re.findall(r'\b\w{3,}\b', full_text) # Palabras de 3 o más letras
-
-    # Mapea cada raíz (stem) a las palabras originales que la generaron.
-    stem_to_words = {}
-    for word in words:
-        if word in stopwords_for_lang:
-            continue
-        stem = _multilang_stem(word, lang)
-        if stem not in stem_to_words:
-            stem_to_words[stem] = Counter()
-        stem_to_words[stem][word] += 1
+def _keyword_pattern(keywords: list[str]) -> str:
+    """
+    Alternancia de las palabras clave. Si todas son literales se agrupan en un trie
+    (prefijos comunes factorizados) para que el motor no pruebe cada palabra por separado.
+    """
+    if any(_REGEX_SPECIAL & set(keyword) for keyword in keywords):
+        return '|'.join(keywords)
+    return _trie_pattern(keywords)
 
+def _trie_pattern(words) -> str:
+    """
+    Patrón que reconoce cualquiera de las palabras literales dadas. Solo sirve para
+    saber si hay alguna: ante prefijos comunes puede elegir otra que la alternancia.
+    """
+    trie: dict = {}
+    for keyword in words:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in node.items() if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{pattern})?" if "" in node else pattern
+    return build(trie)
+
+
+class RuleEngine:
+    """
+    Reglas del resumen para un idioma y una lista de usuarios, compiladas una sola vez:
+    stopwords, stemmer con memoria, un único patrón para todas las palabras clave de
+    decisión y los patrones de acción con la alternancia de nombres.
+    """
+    def __init__(self, rules: dict, lang: str, user_names: tuple[str, ...]):
+        self.stopwords = rules.get("stopwords", {}).get(lang, set())
+        self.stem = _memo_stemmer(lang)
+        keywords = rules.get("decision_keywords", {}).get(lang, [])
+        self.decision_re = re.compile(r'\b(' + _keyword_pattern(keywords) + r')\b', re.IGNORECASE) if keywords else None
+
+        self.user_names = {name.lower() for name in user_names}
+        user_names_re = '|'.join(re.escape(name) for name in user_names)
+        self.names_re = re.compile(_trie_pattern(user_names), re.IGNORECASE) if user_names else None
+        self.action_res = [
+            re.compile(pattern.format(user_names_re=user_names_re), re.IGNORECASE)
+            for pattern in rules.get("action_patterns", {}).get(lang, [])
+        ] if user_names else []
+
+    def topic_counts(self, texts: list[str]) -> dict[str, Counter]:
+        """Mapea cada raíz (stem) a las palabras originales que la generaron, en orden de aparición."""
+        stopwords, stem = self.stopwords, self.stem
+        stem_to_words = {}
+        # Se cuenta cada palabra de una vez y se reduce cada palabra distinta una sola vez;
+        # Counter conserva el orden de primera aparición, así que el de raíces y palabras no cambia.
+        for word, count in Counter(_WORD_RE.findall(" ".join(texts).lower())).items():
+            if word in stopwords:
+                continue
+            root = stem(word)
+            words = stem_to_words.get(root)
+            if words is None:
+                words = stem_to_words[root] = Counter()
+            words[word] = count
+        return stem_to_words
+
+    def decisions(self, records: list[dict]) -> list[str]:
+        if self.decision_re is None:
+            return []
+        search = self.decision_re.search
+        decisions = []
+        for record in records:
+            text = record.get("text", "")
+            # Un solo recorrido del texto completo descarta los mensajes sin ninguna palabra clave.
+            if not search(text):
+                continue
+            for line in text.split('\n'):
+                if search(line):
+                    # Limpiar la línea para que sea más legible como una decisión.
+                    decisions.append(line.strip().lstrip('*- ').capitalize())
+        return decisions
+
+    def actions(self, records: list[dict]) -> list[dict]:
+        if not self.action_res:
+            return []
+        actions = []
+        for record in records:
+            text = record.get("text", "")
+            # Una acción válida nombra a un usuario: sin ningún nombre no hay nada que buscar.
+            if not self.names_re.search(text):
+                continue
+            for line in text.split('\n'):
+                for pat in self.action_res:
+                    match = pat.search(line)
+                    if match:
+                        assignee = match.group('assignee').strip()
+                        # Verificación final para asegurar que el asignado es un usuario válido (case-insensitive)
+                        if assignee.lower() in self.user_names:
+                            actions.append({"assignee": assignee, "task": match.group('task').strip()})
+                            break # Ir a la siguiente línea, ya que hemos encontrado una acción
+        return actions
+
+
+@lru_cache(maxsize=SUMMARY_RULE_ENGINES_MAX)
+def _compiled_engine(lang: str, user_names: tuple[str, ...], version: int) -> RuleEngine:
+    return RuleEngine(_load_rules_version(version), lang, user_names)
+
+def rule_engine(lang: str, user_names: list[str] | None = None) -> RuleEngine:
+    """Motor de reglas de (idioma, usuarios, versión de las reglas), compilado una vez y reutilizado (LRU)."""
+    return _compiled_engine(lang, tuple(user_names or ()), _rules_version())
+
+def _topic_counts(texts: list[str], lang: str) -> dict[str, Counter]:
+    """Mapea cada raíz (stem) a las palabras originales que la generaron, en orden de aparición."""
+    return rule_engine(lang).topic_counts(texts)
+
+def _top_topics(stem_to_words: dict[str, Counter], top_n: int = 5) -> list[str]:
+    """Las palabras más representativas de las raíces más frecuentes."""
     # Calcula el recuento total para cada raíz.
     stem_counts = {stem: sum(counts.values()) for stem, counts in stem_to_words.items()}
 
@@ -112,57 +235,19 @@ def _extract_topics(texts: list[str], lang: str, top_n: int = 5) -> list[str]:
 
     return top_topics
 
-def _extract_decisions(records: list[dict], lang: str) -> list[str]:
-    """Extrae decisiones de una lista de registros de log."""
-    decisions = []
-    rules = _load_summarizer_rules()
-    keywords_for_lang = rules.get("decision_keywords", {}).get(lang, [])
-
-    if not keywords_for_lang:
+def _extract_topics(texts: list[str], lang: str, top_n: int = 5) -> list[str]:
+    """Extrae los temas más comunes de una lista de textos usando un stemmer específico del idioma."""
+    if not texts:
         return []
+    return _top_topics(_topic_counts(texts, lang), top_n)
 
-    keyword_re = re.compile(r'\b(' + '|'.join(keywords_for_lang) + r')\b', re.IGNORECASE)
-
-    for record in records:
-        for line in record.get("text", "").split('\n'):
-            if keyword_re.search(line):
-                # Limpiar la línea para que sea más legible como una decisión.
-                clean_decision = line.strip().lstrip('*- ').capitalize()
-                decisions.append(clean_decision)
-    return decisions
+def _extract_decisions(records: list[dict], lang: str) -> list[str]:
+    """Extrae decisiones de una lista de registros de log."""
+    return rule_engine(lang).decisions(records)
 
 def _extract_actions(records: list[dict], lang: str, user_names: list[str]) -> list[dict]:
     """Extrae acciones asignadas de una lista de registros, usando los nombres de los usuarios."""
-    if not user_names:
-        return []
-
-    actions = []
-    rules = _load_summarizer_rules()
-    patterns_for_lang = rules.get("action_patterns", {}).get(lang, [])
-
-    # Crea una expresión regular que busca cualquiera de los nombres de usuario.
-    user_names_re = '|'.join(re.escape(name) for name in user_names)
-
-    compiled_patterns = [
-        re.compile(pattern.format(user_names_re=user_names_re), re.IGNORECASE)
-        for pattern in patterns_for_lang
-    ]
-
-    for record in records:
-        text = record.get("text", "")
-        for line in text.split('\n'):
-            for pat in compiled_patterns:
-                match = pat.search(line)
-                if match:
-                    assignee = match.group('assignee').strip()
-                    task = match.group('task').strip()
-                    # Verificación final para asegurar que el asignado es un usuario válido (case-insensitive)
-                    if assignee.lower() in [name.lower() for name in user_names]:
-                         actions.append({"assignee": assignee, "task": task})
-                         break # Ir a la siguiente línea, ya que hemos encontrado una acción
-            # Si el bucle de patrones terminó (encontramos una acción y usamos break), no continuamos.
-            # Si no, el `else` no se ejecuta y pasamos a la siguiente línea.
-    return actions
+    return rule_engine(lang, user_names).actions(records)
 
 def _calculate_general_sentiment(log_records: list[dict]) -> float | None:
     """Calcula el sentimiento general del día basado en la media de valence_z."""
@@ -202,3 +287,78 @@ def generate_daily_summary(log_records: list[dict], lang: str = "es", user_names
         "general_sentiment": sentiment, "message_count": len(messages),
         "active_members": active_members
     }
+
+
+# --- Agregados combinables ---
+#
+# Un agregado resume un tramo de mensajes (p. ej. una hora) de forma que varios
+# tramos consecutivos se pueden combinar y producir exactamente el mismo resumen que
+# generate_daily_summary sobre todos sus mensajes, siempre que los tramos sigan el
+# orden del log: los contadores conservan el orden de primera aparición (desempate
+# de los más frecuentes) y la suma de valence_z es exacta. Son diccionarios
+# serializables en JSON.
+
+def summary_context(lang: str, user_names: list[str] | None) -> str:
+    """
+    Huella de lo que condiciona un agregado además de los mensajes: idioma, lista de
+    usuarios (en orden: determina la alternancia de nombres) y versión de las reglas.
+    """
+    key = json.dumps([lang, list(user_names or []), _load_summarizer_rules().get("version", 0)])
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+def aggregate_messages(messages: list[dict], lang: str = "es", user_names: list[str] | None = None) -> dict:
+    """Agregado combinable de una lista de mensajes (en orden de log)."""
+    valence_sum, valence_count = Fraction(0), 0
+    for msg in messages:
+        proxy = msg.get("affective_proxy")
+        if proxy and "valence_z" in proxy:
+            valence_sum += Fraction(proxy["valence_z"])
+            valence_count += 1
+    return {
+        "message_count": len(messages),
+        "topics": {stem: dict(words) for stem, words in _topic_counts([m.get("text", "") for m in messages], lang).items()},
+        "decisions": _extract_decisions(messages, lang=lang),
+        "actions": _extract_actions(messages, lang=lang, user_names=user_names or []),
+        "authors": dict(Counter(msg.get("author") for msg in messages if msg.get("author"))),
+        "valence_sum": str(valence_sum),
+        "valence_count": valence_count,
+    }
+
+def merge_aggregates(aggregates: Iterable[dict]) -> dict:
+    """Combina agregados de tramos de tiempo consecutivos y disjuntos, en orden."""
+    topics: dict[str, Counter] = {}
+    authors = Counter()
+    decisions, actions = [], []
+    message_count, valence_sum, valence_count = 0, Fraction(0), 0
+    for aggregate in aggregates:
+        message_count += aggregate["message_count"]
+        for stem, words in aggregate["topics"].items():
+            topics.setdefault(stem, Counter()).update(words)
+        decisions.extend(aggregate["decisions"])
+        actions.extend(aggregate["actions"])
+        authors.update(aggregate["authors"])
+        valence_sum += Fraction(aggregate["valence_sum"])
+        valence_count += aggregate["valence_count"]
+    return {
+        "message_count": message_count,
+        "topics": {stem: dict(words) for stem, words in topics.items()},
+        "decisions": decisions,
+        "actions": actions,
+        "authors": dict(authors),
+        "valence_sum": str(valence_sum),
+        "valence_count": valence_count,
+    }
+
+def summary_from_aggregate(aggregate: dict) -> dict:
+    """Resumen (mismo formato que generate_daily_summary) a partir de un agregado."""
+    topics = {stem: Counter(words) for stem, words in aggregate["topics"].items()}
+    valence_count = aggregate["valence_count"]
+    return {
+        "topics": _top_topics(topics) if topics else [],
+        "decisions": list(aggregate["decisions"]),
+        "actions": list(aggregate["actions"]),
+        # Misma conversión que statistics.mean: la suma exacta dividida y redondeada una vez.
+        "general_sentiment": float(Fraction(aggregate["valence_sum"]) / valence_count) if valence_count else None,
+        "message_count": aggregate["message_count"],
+        "active_members": [author for author, _ in Counter(aggregate["authors"]).most_common(5)],
+    }
@@ -0,0 +1,122 @@
+"""
+Índice columnar de tiempo sobre el log de cada grupo.
+
+Por cada registro con timestamp válido se guardan, en arrays paralelos y en orden
+de log: el ts en microsegundos, un código de tipo y arousal_z/valence_z/uncertainty_z.
+Mientras el log esté ordenado por ts (el caso normal) los límites de una ventana se
+localizan con búsqueda binaria y los agregados se calculan sobre rebanadas de los
+arrays; si llegan registros desordenados se recorren los arrays, que sigue siendo
+mucho más barato que interpretar cada timestamp ISO.
+
+Las consultas reproducen exactamente la semántica de los recorridos del log de
+group_service (incluido el orden de los puntos devueltos).
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable
+
+from .derived_views import ViewRegistry
+from .rolling import from_epoch_us, to_epoch_us
+
+KIND_OTHER = 0
+KIND_MESSAGE = 1        # mensaje con affective_proxy
+KIND_MESSAGE_BARE = 2   # mensaje sin affective_proxy
+KIND_ALERT = 3
+
+
+class GroupTimeIndex:
+    def __init__(self):
+        self.ts = array("q")
+        self.kind = array("b")
+        self.arousal = array("d")
+        self.valence = array("d")
+        self.uncertainty = array("d")
+        self.alert_positions = array("q")
+        self.is_sorted = True
+
+    def __len__(self):
+        return len(self.ts)
+
+    def extend(self, records: Iterable[dict]):
+        for record in records:
+            try:
+                ts_us = to_epoch_us(record.get("ts", ""))
+            except (ValueError, TypeError):
+                continue  # Los recorridos originales también ignoran estos registros.
+            record_type = record.get("type")
+            proxy = record.get("affective_proxy")
+            if record_type == "message" and proxy:
+                kind = KIND_MESSAGE
+                values = (proxy["arousal_z"], proxy.get("valence_z", 0.0), proxy.get("uncertainty_z", 0.0))
+            else:
+                kind = {"message": KIND_MESSAGE_BARE, "alert": KIND_ALERT}.get(record_type, KIND_OTHER)
+                values = (0.0, 0.0, 0.0)
+            if self.ts and ts_us < self.ts[-1]:
+                self.is_sorted = False
+            if kind == KIND_ALERT:
+                self.alert_positions.append(len(self.ts))
+            self.ts.append(ts_us)
+            self.kind.append(kind)
+            self.arousal.append(values[0])
+            self.valence.append(values[1])
+            self.uncertainty.append(values[2])
+
+    # --- Posiciones de ventana ---
+
+    def _positions_after(self, start_us: int, inclusive: bool) -> Iterable[int]:
+        """Posiciones (en orden de log) con ts > start_us (o >= si inclusive)."""
+        if self.is_sorted:
+            lo = bisect_left(self.ts, start_us) if inclusive else bisect_right(self.ts, start_us)
+            return range(lo, len(self.ts))
+        if inclusive:
+            return [i for i, ts in enumerate(self.ts) if ts >= start_us]
+        return [i for i, ts in enumerate(self.ts) if ts > start_us]
+
+    def _reverse_scan_start(self, start_us: int) -> int:
+        """
+        Primera posición incluida al recorrer desde el final hasta el primer registro
+        con ts < start_us (la semántica de has_recent_alerts y del índice de fricción).
+        """
+        if self.is_sorted:
+            return bisect_left(self.ts, start_us)
+        i = len(self.ts)
+        while i > 0 and self.ts[i - 1] >= start_us:
+            i -= 1
+        return i
+
+    # --- Consultas ---
+
+    def message_values(self, start_us: int, column: str = "arousal", inclusive: bool = False) -> list[tuple[int, float]]:
+        """(ts_us, valor) de los mensajes con affective_proxy en la ventana, en orden de log."""
+        values = getattr(self, column)
+        kind = self.kind
+        return [(self.ts[i], values[i]) for i in self._positions_after(start_us, inclusive) if kind[i] == KIND_MESSAGE]
+
+    def affective_history(self, since_us: int) -> list[dict]:
+        return [
+            {"ts": from_epoch_us(ts_us), "value": value}
+            for ts_us, value in self.message_values(since_us, inclusive=True)
+        ]
+
+    def has_alert_since(self, start_us: int) -> bool:
+        return bool(self.alert_positions) and self.alert_positions[-1] >= self._reverse_scan_start(start_us)
+
+    def tail_length(self, start_us: int) -> int:
+        """
+        Registros desde el primero (en orden de log) con ts >= start_us hasta el final:
+        los que hay que leer desde el final del log para cubrirlos todos, aunque haya
+        registros desordenados.
+        """
+        positions = self._positions_after(start_us, inclusive=True)
+        return len(self.ts) - positions[0] if positions else 0
+
+    def count_since(self, start_us: int) -> tuple[int, int]:
+        """(mensajes, alertas) en el recorrido inverso hasta el primer ts < start_us."""
+        lo = self._reverse_scan_start(start_us)
+        window = self.kind[lo:]
+        messages = window.count(KIND_MESSAGE) + window.count(KIND_MESSAGE_BARE)
+        alerts = len(self.alert_positions) - bisect_left(self.alert_positions, lo)
+        return messages, alerts
+
+
+registry = ViewRegistry(GroupTimeIndex)
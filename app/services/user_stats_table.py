@@ -0,0 +1,290 @@
+"""
+Tabla compacta de estadísticas de normalización por usuario (modo "segmented").
+
+Las medias EWMA de cada autor se guardan fuera de la cabecera del grupo, en dos
+ficheros junto a ella:
+
+  - <id>.stats    registros de ancho fijo (6 dobles + 1 entero, 56 bytes) por hueco
+  - <id>.authors  nombres de autor, uno por línea (JSON), en orden de hueco
+
+La tabla se proyecta en memoria con mmap y se actualiza en el sitio: una ingesta
+solo modifica los bytes de los autores que escriben y añade un nombre cuando
+aparece un autor nuevo. Un hueco a ceros equivale a las estadísticas iniciales,
+así que un fichero .stats más corto que la lista de autores (caída a mitad de
+crecimiento) no pierde coherencia.
+
+Las tablas abiertas se reutilizan dentro del proceso mientras los ficheros no
+cambien por otra vía.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+
+FIELDS = (
+    "ewma_arousal", "ewma_valence", "ewma_uncertainty",
+    "ewma_arousal_sq", "ewma_valence_sq", "ewma_uncertainty_sq",
+)
+RECORD = struct.Struct("<6dq")
+HEADER = struct.Struct("<4sHH8x")
+MAGIC = b"RLXU"
+VERSION = 1
+_MIN_CAPACITY = 16
+
+
+def stats_path(filepath: Path) -> Path:
+    return filepath.with_suffix(".stats")
+
+
+def authors_path(filepath: Path) -> Path:
+    return filepath.with_suffix(".authors")
+
+
+def new_stats() -> dict:
+    """Estadísticas iniciales de un autor (equivalen a un hueco a ceros)."""
+    return {**{field: 0.0 for field in FIELDS}, "count": 0}
+
+
+class UserStatsTable:
+    def __init__(self, filepath: Path):
+        self.stats_path = stats_path(filepath)
+        self.authors_path = authors_path(filepath)
+        self._index: dict[str, int] = {}
+        self._authors: list[str] = []
+        self._file = None
+        self._mm = None
+        self._load()
+
+    # --- Apertura ---
+
+    def _load(self):
+        if self.authors_path.exists():
+            with open(self.authors_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        author = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # Línea truncada por una caída: el autor no llegó a registrarse.
+                    self._index[author] = len(self._authors)
+                    self._authors.append(author)
+
+        if not self.stats_path.exists():
+            with open(self.stats_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+                f.truncate(HEADER.size + _MIN_CAPACITY * RECORD.size)
+        self._file = open(self.stats_path, "r+b")
+        magic, version, record_size = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self._file.close()
+            raise ValueError(f"Tabla de estadísticas no reconocida: '{self.stats_path.name}'")
+        self._ensure_capacity(len(self._authors))
+
+    def _capacity(self) -> int:
+        return (os.fstat(self._file.fileno()).st_size - HEADER.size) // RECORD.size
+
+    def _ensure_capacity(self, slots: int):
+        capacity = self._capacity()
+        if self._mm is not None and slots <= capacity:
+            return
+        if slots > capacity:
+            while capacity < slots:
+                capacity = max(capacity * 2, _MIN_CAPACITY)
+            self._file.truncate(HEADER.size + capacity * RECORD.size)
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def signature(self) -> tuple:
+        """Identidad en disco de los ficheros (cambia si otro proceso los sustituye o amplía)."""
+        stats_stat = os.stat(self.stats_path)
+        try:
+            authors_size = os.stat(self.authors_path).st_size
+        except FileNotFoundError:
+            authors_size = 0
+        return (stats_stat.st_ino, stats_stat.st_size, authors_size)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --- Acceso tipo diccionario ---
+
+    def __len__(self):
+        return len(self._authors)
+
+    def __contains__(self, author: str) -> bool:
+        return author in self._index
+
+    def __iter__(self):
+        return iter(self._authors)
+
+    def get(self, author: str, default=None):
+        slot = self._index.get(author)
+        if slot is None:
+            return default
+        *values, count = RECORD.unpack_from(self._mm, HEADER.size + slot * RECORD.size)
+        return {**dict(zip(FIELDS, values)), "count": count}
+
+    def __getitem__(self, author: str) -> dict:
+        stats = self.get(author)
+        if stats is None:
+            raise KeyError(author)
+        return stats
+
+    def __setitem__(self, author: str, stats: dict):
+        slot = self._index.get(author)
+        if slot is None:
+            slot = self._add_author(author)
+        RECORD.pack_into(self._mm, HEADER.size + slot * RECORD.size,
+                         *(float(stats[field]) for field in FIELDS), int(stats["count"]))
+
+    def _add_author(self, author: str) -> int:
+        slot = len(self._authors)
+        self._ensure_capacity(slot + 1)
+        with open(self.authors_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(author, ensure_ascii=False) + "\n")
+        self._index[author] = slot
+        self._authors.append(author)
+        return slot
+
+    def items(self):
+        return ((author, self[author]) for author in self._authors)
+
+    def to_dict(self) -> dict:
+        """Forma clásica de 'user_stats' ({autor: {ewma_*, count}})."""
+        return dict(self.items())
+
+    def replace(self, user_stats: dict):
+        """
+        Sustituye el contenido completo de la tabla (migraciones y reescrituras completas).
+
+        Los ficheros nuevos se escriben como temporales y se sustituyen con os.replace:
+        una caída a mitad conserva la tabla anterior en lugar de dejarla vacía.
+        """
+        authors = list(user_stats)
+        capacity = _MIN_CAPACITY
+        while capacity < len(authors):
+            capacity *= 2
+        stats_tmp = self.stats_path.with_name(f".{self.stats_path.name}.tmp")
+        authors_tmp = self.authors_path.with_name(f".{self.authors_path.name}.tmp")
+        with open(authors_tmp, "w", encoding="utf-8") as f:
+            for author in authors:
+                f.write(json.dumps(author, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with open(stats_tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            for author in authors:
+                stats = user_stats[author]
+                f.write(RECORD.pack(*(float(stats[field]) for field in FIELDS), int(stats["count"])))
+            f.truncate(HEADER.size + capacity * RECORD.size)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.close()
+        os.replace(stats_tmp, self.stats_path)
+        os.replace(authors_tmp, self.authors_path)
+        self._index, self._authors = {}, []
+        self._load()
+
+    def flush(self):
+        self._mm.flush()
+
+
+class PendingStats:
+    """
+    Estadísticas de una ingesta en curso: se leen de la tabla, pero los cambios se
+    acumulan en un dict y solo llegan a la tabla con commit(), una vez persistido el
+    log. Si la escritura falla (y el escritor reintenta mensaje a mensaje), la tabla
+    no ha avanzado y las medias no se aplican dos veces.
+    """
+
+    def __init__(self, table: UserStatsTable):
+        self.table = table
+        self.changes: dict[str, dict] = {}
+
+    def get(self, author: str, default=None):
+        stats = self.changes.get(author)
+        if stats is not None:
+            return dict(stats)
+        return self.table.get(author, default)
+
+    def __setitem__(self, author: str, stats: dict):
+        self.changes[author] = dict(stats)
+
+    def commit(self):
+        for author, stats in self.changes.items():
+            self.table[author] = stats
+        self.changes = {}
+        self.table.flush()
+
+
+_tables: dict[Path, tuple[tuple, UserStatsTable]] = {}
+_tables_lock = threading.Lock()
+
+
+def open_table(filepath: Path) -> UserStatsTable:
+    """Tabla del grupo cuya cabecera es 'filepath', reutilizando la ya abierta si sigue vigente."""
+    key = stats_path(filepath)
+    with _tables_lock:
+        cached = _tables.get(key)
+        if cached is not None:
+            signature, table = cached
+            try:
+                if table.signature() == signature:
+                    return table
+            except FileNotFoundError:
+                pass
+            table.close()
+        table = UserStatsTable(filepath)
+        _tables[key] = (table.signature(), table)
+        return table
+
+
+def remember(table: UserStatsTable):
+    """Registra la firma actual tras modificar la tabla desde este proceso."""
+    with _tables_lock:
+        _tables[table.stats_path] = (table.signature(), table)
+
+
+def exists(filepath: Path) -> bool:
+    return stats_path(filepath).exists()
+
+
+def file_signature(filepath: Path) -> tuple | None:
+    """Firma en disco de la tabla de un grupo (solo 'stat'); None si no tiene tabla."""
+    try:
+        stats_stat = os.stat(stats_path(filepath))
+    except FileNotFoundError:
+        return None
+    try:
+        authors_size = os.stat(authors_path(filepath)).st_size
+    except FileNotFoundError:
+        authors_size = 0
+    return (stats_stat.st_ino, stats_stat.st_mtime_ns, stats_stat.st_size, authors_size)
+
+
+def forget(filepath: Path):
+    with _tables_lock:
+        cached = _tables.pop(stats_path(filepath), None)
+    if cached is not None:
+        cached[1].close()
+
+
+def move(old_filepath: Path, new_filepath: Path):
+    forget(old_filepath)
+    for path_for in (stats_path, authors_path):
+        if path_for(old_filepath).exists():
+            path_for(old_filepath).rename(path_for(new_filepath))
+
+
+def delete(filepath: Path):
+    forget(filepath)
+    for path in (stats_path(filepath), authors_path(filepath)):
+        path.unlink(missing_ok=True)
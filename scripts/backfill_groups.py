@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Añadir el directorio raíz al path para poder importar desde 'app'
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.services import group_service
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_STATE_FILE = ROOT_DIR / "local_bundle/backfill_state.json"
+
+def load_progress(path: Path) -> tuple[dict, dict]:
+    """
+    Progreso de una ejecución anterior: grupos reprocesados ({group_id: recuentos}) y
+    grupos que fallaron ({group_id: error}). Al reanudar, los fallidos se reintentan.
+    """
+    if not path.exists():
+        return {}, {}
+    with open(path, "r", encoding="utf-8") as f:
+        progress = json.load(f)
+    return progress.get("done", {}), progress.get("failed", {})
+
+def save_progress(path: Path, done: dict, failed: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"done": done, "failed": failed}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocesa el log de los grupos de RLx para recalcular estadísticas, alertas y sugerencias.")
+    parser.add_argument("--group_id", help="Reprocesar solo un grupo específico.", type=str)
+    parser.add_argument("--workers", help="Procesos en paralelo (por defecto, uno por CPU).", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--state-file", help="Fichero de progreso para poder reanudar.", type=Path, default=DEFAULT_STATE_FILE)
+    parser.add_argument("--resume", help="Saltar los grupos que ya constan como reprocesados en el fichero de progreso (los fallidos se reintentan).", action="store_true")
+    args = parser.parse_args()
+
+    if args.group_id:
+        group_ids = [args.group_id]
+    else:
+        group_ids = sorted(p.stem for p in group_service.list_group_files())
+
+    done, failed = load_progress(args.state_file) if args.resume else ({}, {})
+    pending = [group_id for group_id in group_ids if group_id not in done]
+    if len(pending) < len(group_ids):
+        logging.info(f"Reanudando: {len(group_ids) - len(pending)} grupos ya reprocesados.")
+
+    started = time.monotonic()
+    errors = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(group_service.backfill_group, group_id): group_id for group_id in pending}
+        for finished, future in enumerate(as_completed(futures), start=1):
+            group_id = futures[future]
+            try:
+                counts = future.result()
+            except Exception as e:
+                # Un grupo que falla (o un proceso del pool que muere) no detiene el resto.
+                errors += 1
+                logging.exception(f"[{finished}/{len(pending)}] [{group_id}] No se pudo reprocesar: {e}")
+                failed[group_id] = f"{type(e).__name__}: {e}"
+                save_progress(args.state_file, done, failed)
+                continue
+            done[group_id] = counts
+            failed.pop(group_id, None)
+            save_progress(args.state_file, done, failed)
+            elapsed = time.monotonic() - started
+            eta = elapsed / finished * (len(pending) - finished)
+            logging.info(f"[{finished}/{len(pending)}] [{group_id}] {counts['messages']} mensajes "
+                         f"({elapsed:.1f}s transcurridos, ~{eta:.0f}s restantes)")
+
+    logging.info(f"Reproceso terminado: {len(pending) - errors} grupos correctos, {errors} con errores.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+import sys
+import argparse
+from pathlib import Path
+import logging
+
+# Añadir el directorio raíz al path para poder importar desde 'app'
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.core.config import HOT_RETENTION_DAYS
+from app.services import group_service
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def main():
+    parser = argparse.ArgumentParser(description="Compacta la memoria de los grupos de RLx moviendo el historial antiguo al archivo frío.")
+    parser.add_argument("--group_id", help="Compactar solo un grupo específico.", type=str)
+    parser.add_argument("--keep-days", help=f"Días que se mantienen en caliente (por defecto {HOT_RETENTION_DAYS}).", type=int, default=HOT_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    if args.group_id:
+        group_ids = [args.group_id]
+    else:
+        group_ids = sorted(p.stem for p in group_service.list_group_files())
+
+    for group_id in group_ids:
+        try:
+            group_service.compact_group(group_id, keep_days=args.keep_days)
+        except (FileNotFoundError, ValueError, IOError) as e:
+            logging.error(f"[{group_id}] No se pudo compactar: {e}")
+
+if __name__ == "__main__":
+    main()
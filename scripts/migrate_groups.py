@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import sys
+import argparse
+from pathlib import Path
+import logging
+
+# Añadir el directorio raíz al path para poder importar desde 'app'
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.services import group_service
+from app.services import group_store
+from app.services import storage_codec
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte en el sitio la memoria de los grupos de RLx a otro códec o modo de almacenamiento.")
+    parser.add_argument("--group_id", help="Migrar solo un grupo específico.", type=str)
+    parser.add_argument("--codec", help="Códec de destino (por defecto, el actual de cada grupo).", choices=sorted(storage_codec.CODECS))
+    parser.add_argument("--storage", help="Modo de almacenamiento de destino (por defecto, el actual de cada grupo).",
+                        choices=[group_store.STORAGE_YAML, group_store.STORAGE_SEGMENTED])
+    args = parser.parse_args()
+
+    if args.group_id:
+        group_ids = [args.group_id]
+    else:
+        group_ids = sorted(p.stem for p in group_service.list_group_files())
+
+    for group_id in group_ids:
+        try:
+            group_service.migrate_group(group_id, codec=args.codec, storage=args.storage)
+        except (FileNotFoundError, ValueError, IOError, *storage_codec.DecodeError) as e:
+            logging.error(f"[{group_id}] No se pudo migrar: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+# Añadir el directorio raíz al path para poder importar desde 'app'
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.services import group_catalog
+from app.services import group_service
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye el catálogo de grupos de RLx a partir de la memoria de cada grupo.")
+    parser.add_argument("--workers", help="Procesos en paralelo (por defecto, uno por CPU).", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    group_ids = sorted(p.stem for p in group_service.list_group_files())
+    started = time.monotonic()
+    # Cada proceso lee la memoria de sus grupos; las escrituras en SQLite se hacen aquí, en una transacción.
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        entries = [entry for entry in pool.map(group_service.catalog_entry, group_ids, chunksize=16) if entry is not None]
+
+    group_catalog.put_many(entries)
+    group_catalog.retain({entry["group_id"] for entry in entries})
+    logging.info(f"Catálogo reconstruido: {len(entries)} grupos en {time.monotonic() - started:.1f}s.")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 import os
 import sys
-import yaml
+import json
+import heapq
+import signal
 import argparse
+import threading
+import time as clock
 from pathlib import Path
 from datetime import datetime, timedelta, time
-from filelock import FileLock, Timeout
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from filelock import Timeout
 import logging
 
 # Añadir el directorio raíz al path para poder importar desde 'app'
@@ -13,27 +18,83 @@ ROOT_DIR = Path(__file__).parent.parent
 sys.path.insert(0, str(ROOT_DIR))
 
 from app.models import schemas
-from app.services import summarizer
-from app.services.group_service import get_group_memory_path, _load_group_profile, _load_group_settings
+from app.services.group_service import (
+    MEMORY_DIR, append_daily_summary, get_group_header, list_catalog, summarize_since,
+    _load_group_settings,
+)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def should_run_summary(group_id: str, state: dict) -> bool:
-    """
-    Comprueba si se debe generar un resumen para un grupo basado en la configuración
-    de su perfil y si ya se ha generado uno hoy.
-    """
-    group_settings = _load_group_settings(group_id)
-    summary_time_str = group_settings.get("daily_summary_time_utc")
+RUN_WINDOW = timedelta(minutes=15)  # Margen alrededor de la hora configurada
+RETRY_BASE = timedelta(seconds=30)  # Espera antes del primer reintento; se dobla en cada uno
+DEFAULT_TIMINGS_FILE = ROOT_DIR / "local_bundle/summary_timings.json"
+
+def summary_time(group_id: str, quiet: bool = False) -> time | None:
+    """Hora UTC del resumen diario según el perfil del grupo, o None si no hay una válida."""
+    summary_time_str = _load_group_settings(group_id).get("daily_summary_time_utc")
 
     if not summary_time_str:
-        logging.info(f"[{group_id}] No hay 'daily_summary_time_utc' configurado. Saltando.")
-        return False
+        if not quiet:
+            logging.info(f"[{group_id}] No hay 'daily_summary_time_utc' configurado. Saltando.")
+        return None
 
     try:
-        summary_time = time.fromisoformat(summary_time_str)
+        return time.fromisoformat(summary_time_str)
     except ValueError:
         logging.warning(f"[{group_id}] Formato de hora inválido para 'daily_summary_time_utc': {summary_time_str}. Saltando.")
+        return None
+
+def next_due(group_id: str, now: datetime, last_summary_ts: str | None) -> datetime | None:
+    """
+    Próximo momento en que toca resumir el grupo: la hora configurada de hoy si aún
+    no se ha hecho y no ha pasado la ventana ('now' si ya ha llegado), si no la de
+    mañana. None si el grupo no tiene hora de resumen.
+    """
+    at = summary_time(group_id, quiet=True)
+    if at is None:
+        return None
+    today_at = datetime.combine(now.date(), at)
+    done_today = bool(last_summary_ts) and datetime.fromisoformat(last_summary_ts).date() == now.date()
+    if not done_today and now <= today_at + RUN_WINDOW:
+        return max(today_at, now)
+    return today_at + timedelta(days=1)
+
+def retry_due(group_id: str, now: datetime, attempts: int) -> datetime | None:
+    """
+    Próximo reintento de un resumen fallido tras 'attempts' reintentos: espera creciente
+    (RETRY_BASE, el doble, ...) mientras caiga dentro de la ventana de hoy; None si ya no cabe.
+    """
+    at = summary_time(group_id, quiet=True)
+    if at is None:
+        return None
+    retry_at = now + RETRY_BASE * 2 ** attempts
+    if retry_at > datetime.combine(now.date(), at) + RUN_WINDOW:
+        return None
+    return retry_at
+
+def reschedule(group_id: str, status: str, now: datetime, failures: dict) -> datetime | None:
+    """
+    Siguiente turno de un grupo tras intentar su resumen. Un error (o un bloqueo no
+    conseguido) se reintenta dentro de la ventana actual; si ya no hay margen, o el
+    resumen se hizo o se descartó, el siguiente es el de mañana. 'failures' lleva los
+    reintentos consecutivos de cada grupo.
+    """
+    if status == "error":
+        due = retry_due(group_id, now, failures.get(group_id, 0))
+        if due is not None:
+            failures[group_id] = failures.get(group_id, 0) + 1
+            logging.warning(f"[{group_id}] Reintento {failures[group_id]} del resumen diario a las {due.isoformat()}.")
+            return due
+    failures.pop(group_id, None)
+    return next_due(group_id, now, now.isoformat())
+
+def should_run_summary(group_id: str, state: dict) -> bool:
+    """
+    Comprueba si se debe generar un resumen para un grupo basado en la configuración
+    de su perfil y si ya se ha generado uno hoy.
+    """
+    summary_at = summary_time(group_id)
+    if summary_at is None:
         return False
 
     now_utc = datetime.utcnow()
@@ -48,86 +109,187 @@ def should_run_summary(group_id: str, state: dict) -> bool:
             return False
 
     # Comprobar si estamos en la ventana de tiempo para generar el resumen (e.g., +/- 15 min)
-    run_window_start = datetime.combine(now_utc.date(), summary_time) - timedelta(minutes=15)
-    run_window_end = datetime.combine(now_utc.date(), summary_time) + timedelta(minutes=15)
+    run_window_start = datetime.combine(now_utc.date(), summary_at) - RUN_WINDOW
+    run_window_end = datetime.combine(now_utc.date(), summary_at) + RUN_WINDOW
 
     if not (run_window_start <= now_utc <= run_window_end):
-        logging.debug(f"[{group_id}] Fuera de la ventana de tiempo para el resumen. Hora actual: {now_utc.time()}, Hora configurada: {summary_time}")
+        logging.debug(f"[{group_id}] Fuera de la ventana de tiempo para el resumen. Hora actual: {now_utc.time()}, Hora configurada: {summary_at}")
         return False
 
     return True
 
-def process_group(group_id: str):
+def process_group(group_id: str) -> str:
     """
     Genera y guarda un resumen diario para un grupo específico si se cumplen las condiciones.
+    El resumen se calcula sin el bloqueo del grupo, sobre lo ya persistido; el bloqueo
+    solo se toma para anexarlo (ver group_service.append_daily_summary), así la ingesta
+    no espera mientras se resume. Devuelve "written", "skipped" o "error".
     """
     logging.info(f"Procesando grupo: {group_id}")
-    filepath = get_group_memory_path(group_id)
-    if not filepath.exists():
-        logging.warning(f"No se encontró el fichero de memoria para el grupo {group_id}. Saltando.")
-        return
-
-    lock_path = filepath.with_suffix(".yaml.lock")
     try:
-        with FileLock(lock_path, timeout=10):
-            with open(filepath, "r", encoding="utf-8") as f:
-                state = yaml.safe_load(f) or {}
-
-            if not should_run_summary(group_id, state):
-                return
-
-            # Cargar nombres de usuario para la extracción de acciones
-            profile = _load_group_profile(group_id)
-            user_names = profile.get("users", [])
-            lang = profile.get("default_lang", "es") # Usa 'es' como fallback
-
-            logging.info(f"[{group_id}] Generando resumen diario...")
-
-            # Filtrar logs de las últimas 24 horas
-            since_ts = datetime.utcnow() - timedelta(hours=24)
-            recent_logs = [
-                r for r in state.get("log", [])
-                if datetime.fromisoformat(r.get("ts", "1970-01-01T00:00:00")).replace(tzinfo=None) > since_ts
-            ]
+        header = get_group_header(group_id)
+        if header is None:
+            logging.warning(f"No se encontró el fichero de memoria para el grupo {group_id}. Saltando.")
+            return "skipped"
 
-            if not recent_logs:
-                logging.info(f"[{group_id}] No hay logs recientes para resumir. Saltando.")
-                return
+        if not should_run_summary(group_id, header):
+            return "skipped"
 
-            summary_details_data = summarizer.generate_daily_summary(recent_logs, lang=lang, user_names=user_names)
-            summary_details = schemas.DailySummaryDetails(**summary_details_data)
-            summary_record = schemas.DailySummaryRecord(details=summary_details)
+        logging.info(f"[{group_id}] Generando resumen diario...")
 
-            state.setdefault("log", []).append(summary_record.model_dump(mode='json'))
-            state.setdefault("meta", {})["last_daily_summary_ts"] = datetime.utcnow().isoformat()
+        # Últimas 24 horas: se combinan los agregados por hora que mantiene la ingesta
+        # y solo se analizan la primera hora incompleta y la hora en curso.
+        since_ts = datetime.utcnow() - timedelta(hours=24)
+        # Un día sin mensajes también deja su resumen (vacío, con message_count 0).
+        summary_details_data = summarize_since(group_id, since_ts)
+        summary_details = schemas.DailySummaryDetails(**summary_details_data)
+        summary_record = schemas.DailySummaryRecord(details=summary_details)
 
-            with open(filepath, "w", encoding="utf-8") as f:
-                yaml.dump(state, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+        expected = header.get("meta", {}).get("last_daily_summary_ts")
+        if not append_daily_summary(group_id, summary_record.model_dump(mode='json'), expected):
+            logging.info(f"[{group_id}] Otro proceso ya ha guardado el resumen diario. Descartado.")
+            return "skipped"
 
-            logging.info(f"[{group_id}] Resumen diario guardado con éxito.")
+        logging.info(f"[{group_id}] Resumen diario guardado con éxito.")
+        return "written"
 
     except Timeout:
         logging.error(f"No se pudo adquirir el bloqueo para el grupo {group_id} en 10 segundos.")
     except Exception as e:
         logging.error(f"Error inesperado procesando el grupo {group_id}: {e}")
+    return "error"
+
+def timed_process_group(group_id: str) -> dict:
+    """process_group con su resultado y su duración (se ejecuta en los procesos del pool)."""
+    started = datetime.utcnow()
+    start = clock.perf_counter()
+    status = process_group(group_id)
+    return {"status": status, "started": started.isoformat(), "duration_s": round(clock.perf_counter() - start, 3)}
+
+def load_timings(path: Path) -> dict:
+    """Tiempos por grupo exportados en ejecuciones anteriores ({group_id: {...}})."""
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("groups", {})
+
+def save_timings(path: Path, timings: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"updated": datetime.utcnow().isoformat(), "groups": timings}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def record_timing(timings: dict, group_id: str, result: dict, due: datetime | None):
+    timings[group_id] = {**result, "next_due": due.isoformat() if due else None}
+    logging.info(f"[{group_id}] {result['status']} en {result['duration_s']:.2f}s"
+                 + (f"; próximo resumen {due.isoformat()}" if due else ""))
+
+def run_once(workers: int, timings_file: Path):
+    """Resume, en paralelo, los grupos a los que les toca ahora (según el catálogo, sin leer su memoria)."""
+    now = datetime.utcnow()
+    due = []
+    for entry in list_catalog():
+        due_at = next_due(entry["group_id"], now, entry["last_summary_ts"])
+        if due_at is not None and due_at - RUN_WINDOW <= now:
+            due.append(entry["group_id"])
+    logging.info(f"{len(due)} grupos con resumen pendiente.")
+    timings = load_timings(timings_file)
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        for group_id, result in zip(due, pool.map(timed_process_group, due)):
+            last_summary_ts = datetime.utcnow().isoformat() if result["status"] == "written" else None
+            record_timing(timings, group_id, result, next_due(group_id, datetime.utcnow(), last_summary_ts))
+    save_timings(timings_file, timings)
+
+def run_scheduler(workers: int, timings_file: Path, rescan_seconds: float):
+    """
+    Modo servicio: mantiene un montículo con el próximo resumen de cada grupo, duerme
+    hasta el primero y lanza los que vencen en un pool limitado a 'workers' procesos.
+    Cada 'rescan_seconds' se recalcula el calendario (grupos nuevos, perfiles cambiados).
+    """
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    heap: list[tuple[datetime, str]] = []
+    scheduled: dict[str, datetime] = {}  # Entrada vigente de cada grupo en el montículo
+    running = {}                          # future -> group_id
+    failures: dict[str, int] = {}         # Reintentos consecutivos de los grupos que fallaron
+    timings = load_timings(timings_file)
+    next_rescan = datetime.min
+
+    def schedule(group_id: str, due: datetime | None):
+        if due is None:
+            scheduled.pop(group_id, None)
+        elif scheduled.get(group_id) != due:
+            scheduled[group_id] = due
+            heapq.heappush(heap, (due, group_id))
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        while not stop.is_set():
+            now = datetime.utcnow()
+            if now >= next_rescan:
+                entries = list_catalog()
+                present = {entry["group_id"] for entry in entries}
+                for group_id in set(scheduled) - present:
+                    del scheduled[group_id]
+                    failures.pop(group_id, None)
+                for entry in entries:
+                    # Los grupos con un reintento pendiente conservan su turno.
+                    if entry["group_id"] not in running.values() and entry["group_id"] not in failures:
+                        schedule(entry["group_id"], next_due(entry["group_id"], now, entry["last_summary_ts"]))
+                next_rescan = now + timedelta(seconds=rescan_seconds)
+                logging.info(f"Calendario: {len(scheduled)} grupos con resumen diario; "
+                             f"próximo {min(scheduled.values()).isoformat() if scheduled else '-'}.")
+
+            while heap and heap[0][0] <= now:
+                due, group_id = heapq.heappop(heap)
+                if scheduled.get(group_id) != due or group_id in running.values():
+                    continue  # Entrada obsoleta (reprogramada o eliminada).
+                del scheduled[group_id]
+                running[pool.submit(timed_process_group, group_id)] = group_id
+
+            wake_at = min([next_rescan] + ([heap[0][0]] if heap else []))
+            timeout = max(0.0, (wake_at - datetime.utcnow()).total_seconds())
+            if running:
+                finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                stop.wait(timeout)
+                finished = set()
+            for future in finished:
+                group_id = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"status": "error", "started": None, "duration_s": 0.0}
+                    logging.error(f"[{group_id}] El proceso del resumen falló: {e}")
+                due = reschedule(group_id, result["status"], datetime.utcnow(), failures)
+                schedule(group_id, due)
+                record_timing(timings, group_id, result, due)
+            if finished:
+                save_timings(timings_file, timings)
+    logging.info("Planificador de resúmenes detenido.")
 
 def main():
     parser = argparse.ArgumentParser(description="Genera resúmenes diarios para grupos de RLx.")
     parser.add_argument("--group_id", help="Procesar solo un grupo específico.", type=str)
+    parser.add_argument("--daemon", help="Quedarse en marcha y resumir cada grupo a su hora.", action="store_true")
+    parser.add_argument("--workers", help="Grupos que se resumen a la vez (procesos).", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--timings-file", help="Fichero donde se exportan los tiempos por grupo.", type=Path, default=DEFAULT_TIMINGS_FILE)
+    parser.add_argument("--rescan-seconds", help="Cada cuánto se recalcula el calendario en modo servicio.", type=float, default=300)
     args = parser.parse_args()
 
-    groups_dir = Path("local_bundle/groups")
-
     if args.group_id:
         process_group(args.group_id)
+        return
+    if not MEMORY_DIR.exists():
+        logging.warning(f"El directorio de grupos '{MEMORY_DIR}' no existe.")
+        return
+    if args.daemon:
+        run_scheduler(args.workers, args.timings_file, args.rescan_seconds)
     else:
         logging.info("Procesando todos los grupos...")
-        if not groups_dir.exists():
-            logging.warning(f"El directorio de grupos '{groups_dir}' no existe.")
-            return
-        for group_file in groups_dir.glob("*.yaml"):
-            group_id = group_file.stem
-            process_group(group_id)
+        run_once(args.workers, args.timings_file)
 
 if __name__ == "__main__":
     main()
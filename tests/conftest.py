@@ -0,0 +1,38 @@
+"""
+Fixtures comunes: cada prueba trabaja con su propio directorio de datos (memoria de
+grupos, archivo frío, catálogo y cola de ingesta) en lugar de local_bundle/.
+"""
+import pytest
+
+from app.services import archive, group_catalog, group_service, ingest_spool
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Directorio de datos temporal. Devuelve la ruta raíz."""
+    memory_dir = tmp_path / "groups"
+    memory_dir.mkdir()
+    monkeypatch.setattr(group_service, "MEMORY_DIR", memory_dir)
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / "archive")
+    monkeypatch.setattr(group_catalog, "CATALOG_PATH", tmp_path / "catalog.sqlite")
+    return tmp_path
+
+
+@pytest.fixture(params=["yaml", "segmented"])
+def storage_mode(request, storage, monkeypatch):
+    """Ejecuta la prueba con cada modo de almacenamiento de los grupos nuevos."""
+    monkeypatch.setattr(group_service, "GROUP_STORAGE_MODE", request.param)
+    return request.param
+
+
+@pytest.fixture
+def client(storage, monkeypatch):
+    """Cliente de la API con una cola de ingesta propia (no la de local_bundle/spool)."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    spool = ingest_spool.IngestSpool(storage / "spool")
+    monkeypatch.setattr(ingest_spool, "spool", spool)
+    yield TestClient(app)
+    if spool.started:
+        spool.stop()
@@ -0,0 +1,37 @@
+"""Agregados afectivos persistidos por hora y minuto."""
+import random
+from datetime import datetime, timedelta
+
+from app.models import schemas
+from app.services import affect_rollups, group_service
+
+TEXTS = ["ok", "vale, lo miro", "¿¿¿POR QUÉ NADIE RESPONDE???", "no sé... quizá", "¡¡¡BASTA YA!!!", "perfecto, gracias"]
+
+
+def messages(stamps: list[datetime], seed: int = 1) -> list[schemas.MessageIngest]:
+    rng = random.Random(seed)
+    return [schemas.MessageIngest(author=rng.choice(["ana", "luis"]), text=rng.choice(TEXTS), ts=ts) for ts in stamps]
+
+
+def stored(filepath) -> dict:
+    return {resolution: affect_rollups.read(filepath, resolution, 0)
+            for resolution in ("minute", "hour", "summary", "summary_day")}
+
+
+def test_late_records_match_rebuild(storage_mode):
+    rng = random.Random(4)
+    now = datetime.utcnow()
+    start = now - timedelta(days=3)
+    ordered = sorted(start + timedelta(seconds=rng.uniform(0, 3 * 86400 - 60)) for _ in range(400))
+    group_service.persist_messages("tarde", messages(ordered))
+    # Mensajes atrasados repartidos por horas y días ya cerrados, en varios lotes.
+    late = [start + timedelta(seconds=rng.uniform(0, 2 * 86400)) for _ in range(60)]
+    for i in range(0, len(late), 20):
+        group_service.persist_messages("tarde", messages(late[i:i + 20], seed=i))
+
+    filepath = group_service.get_group_memory_path("tarde")
+    incremental = stored(filepath)
+    assert any(line.get("unordered") for line in incremental["summary"])
+    log = group_service.get_group_state("tarde")["log"]
+    affect_rollups.rebuild(filepath, lambda: log)
+    assert stored(filepath) == incremental
@@ -0,0 +1,54 @@
+"""Paridad de las señales crudas del analizador con la implementación original."""
+import random
+
+import pytest
+
+from app.services import analyzer
+from app.services.analyzer import ELONG_MIN
+
+
+def original_raw_signals(text: str) -> dict:
+    """Implementación original de calculate_raw_signals, carácter a carácter."""
+    letters = [c for c in text if c.isalpha()]
+    n_letters = max(len(letters), 1)
+    raw_arousal = (text.count("!") + text.count("?")) / max(len(text), 1)
+    raw_caps = sum(1 for c in letters if c.isupper()) / n_letters
+    raw_elong = sum(1 for w in text.split() if len(set(w)) < len(w) and any(w.count(ch) >= ELONG_MIN for ch in set(w))) / max(len(text.split()), 1)
+    return {"raw_arousal": raw_arousal, "raw_caps": raw_caps, "raw_elong": raw_elong}
+
+
+EDGE_CASES = [
+    "", " ", "!", "?!?!", "a", "AAA", "aaa", "holaaa", "¡¡¡QUÉ BIEN!!!", "ÑÑÑ ñññ", "ǅemal ǈ ǋ",  # Títulos: alfa, no mayúscula.
+    "x́́́", "١٢٣ ٤٥٦", "ß ẞ ﬀ", "Straße!!!", "日本語のテキスト", "🙂🙂🙂 jajaja", "\ud83d", "a\tb\nc d e",
+    "nooo    noooo\n\nNOOOO", "ªº", "Ⅻ ⅻ", "ＡＢＣ ａｂｃ", "abc" * 1000,
+]
+
+ALPHABET = "aAbBzZ!?. \t\nñÑéÉüÜßǅ日🙂́ ªⅫＡ١" + "aaaa!!!?"
+
+
+def random_texts(seed: int, count: int) -> list[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 60))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_scalar_matches_original_on_edge_cases(text):
+    assert analyzer.calculate_raw_signals(text) == original_raw_signals(text)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_scalar_and_batch_match_original_on_random_text(seed):
+    texts = random_texts(seed, 4000)
+    expected = [original_raw_signals(text) for text in texts]
+    assert [analyzer.calculate_raw_signals(text) for text in texts] == expected
+
+    batch = analyzer.calculate_raw_signals_batch(texts)
+    assert set(batch) == set(expected[0])
+    for key, values in batch.items():
+        assert list(values) == [signals[key] for signals in expected]
+
+
+def test_batch_of_nothing():
+    assert {key: list(values) for key, values in analyzer.calculate_raw_signals_batch([]).items()} == {
+        "raw_arousal": [], "raw_caps": [], "raw_elong": [],
+    }
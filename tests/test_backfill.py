@@ -0,0 +1,88 @@
+"""Reproceso del log (backfill) y su script reanudable."""
+import json
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import schemas
+from app.services import group_service
+from scripts import backfill_groups
+
+
+def ingest(group_id: str, count: int = 80, seed: int = 1):
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(hours=count)
+    group_service.persist_messages(group_id, [
+        schemas.MessageIngest(author=rng.choice(["ana", "luis"]), ts=start + timedelta(hours=i),
+                              text=rng.choice(["hola", "¡¡¡NO PUEDE SER!!!", "vale", "¿¿¿POR QUÉ???"]))
+        for i in range(count)
+    ])
+
+
+def test_backfill_is_idempotent(storage_mode):
+    ingest("reproceso")
+    before = group_service.get_group_state("reproceso")
+    counts = group_service.backfill_group("reproceso")
+    after = group_service.get_group_state("reproceso")
+    assert counts["messages"] == 80 and counts["alerts"]
+    assert [r for r in after["log"] if r["type"] == "message"] == [r for r in before["log"] if r["type"] == "message"]
+    assert after["user_stats"] == before["user_stats"]
+    # Las alertas se regeneran con el reloj de los mensajes, pero conservan su msg_id.
+    assert [r["msg_id"] for r in after["log"]] == [r["msg_id"] for r in before["log"]]
+
+    assert group_service.backfill_group("reproceso") == counts
+    assert group_service.get_group_state("reproceso")["log"] == after["log"]
+
+
+def run_script(monkeypatch, state_file, *args):
+    monkeypatch.setattr(backfill_groups, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(sys, "argv", ["backfill_groups.py", "--state-file", str(state_file), *args])
+    backfill_groups.main()
+    return json.loads(state_file.read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def calls(storage, monkeypatch):
+    """Grupos reprocesados por el script; 'rota' falla siempre."""
+    for group_id in ("a", "b", "c", "rota"):
+        ingest(group_id, count=5)
+    seen = []
+
+    def backfill(group_id):
+        seen.append(group_id)
+        if group_id == "rota":
+            raise ValueError("log ilegible")
+        return {"group_id": group_id, "messages": 5, "alerts": 0, "suggestions": 0}
+
+    monkeypatch.setattr(group_service, "backfill_group", backfill)
+    return seen
+
+
+def test_failures_are_recorded_and_retried_on_resume(calls, storage, monkeypatch):
+    state_file = storage / "backfill_state.json"
+    progress = run_script(monkeypatch, state_file)
+    assert sorted(calls) == ["a", "b", "c", "rota"]
+    assert sorted(progress["done"]) == ["a", "b", "c"]
+    assert progress["failed"] == {"rota": "ValueError: log ilegible"}
+
+    calls.clear()
+    progress = run_script(monkeypatch, state_file, "--resume")
+    assert calls == ["rota"]
+    assert sorted(progress["done"]) == ["a", "b", "c"] and "rota" in progress["failed"]
+
+
+def test_resume_skips_done_groups(calls, storage, monkeypatch):
+    state_file = storage / "backfill_state.json"
+    state_file.write_text(json.dumps({"done": {"a": {"messages": 5}}, "failed": {"b": "IOError: ocupado"}}))
+    progress = run_script(monkeypatch, state_file, "--resume")
+    assert sorted(calls) == ["b", "c", "rota"]
+    assert sorted(progress["done"]) == ["a", "b", "c"]
+    assert list(progress["failed"]) == ["rota"]
+
+    # Sin --resume se empieza de cero.
+    calls.clear()
+    run_script(monkeypatch, state_file)
+    assert sorted(calls) == ["a", "b", "c", "rota"]
@@ -0,0 +1,127 @@
+"""Ingesta por lotes: mismo resultado que mensaje a mensaje, con una sola escritura."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import MAX_BATCH_INGEST_ITEMS
+from app.models import schemas
+from app.services import group_service
+
+VOLATILE_KEYS = {"msg_id", "trigger_ref"}
+
+
+def messages(count: int, seed: int = 7) -> list[schemas.MessageIngest]:
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(minutes=count)
+    texts = ["ok", "vale, lo miro", "¿¿¿POR QUÉ NADIE RESPONDE???", "no sé... quizá", "¡¡¡BASTA YA!!!", "perfecto, gracias"]
+    return [
+        schemas.MessageIngest(author=rng.choice(["ana", "luis", "marta"]), text=rng.choice(texts), ts=start + timedelta(minutes=i))
+        for i in range(count)
+    ]
+
+
+def comparable(log: list[dict]) -> list[dict]:
+    """Registros sin ids ni timestamps de reloj de pared (alertas y sugerencias)."""
+    return [
+        {k: v for k, v in record.items() if k not in VOLATILE_KEYS and (k != "ts" or record["type"] == "message")}
+        for record in log
+    ]
+
+
+def test_batch_matches_one_by_one(storage_mode):
+    batch = messages(120)
+    results = group_service.persist_messages("lote", batch)
+    for message in batch:
+        group_service.persist_message("uno_a_uno", message)
+
+    batched = group_service.get_group_state("lote")
+    sequential = group_service.get_group_state("uno_a_uno")
+    assert comparable(batched["log"]) == comparable(sequential["log"])
+    assert batched["user_stats"] == sequential["user_stats"]
+
+    log = batched["log"]
+    assert any(result["alert_raised"] for result in results)
+    by_id = {record["msg_id"]: i for i, record in enumerate(log) if record["type"] == "message"}
+    assert [result["msg_id"] for result in results] == [r["msg_id"] for r in log if r["type"] == "message"]
+    for result in results:
+        # Los registros derivados de un mensaje van justo detrás de él.
+        position = by_id[result["msg_id"]] + 1
+        following = []
+        while position < len(log) and log[position]["type"] != "message":
+            following.append(log[position]["type"])
+            position += 1
+        assert result["alert_raised"] == ("alert" in following)
+        assert result["suggestion_raised"] == ("suggestion" in following)
+
+
+def test_batch_endpoint(client):
+    payload = [m.model_dump(mode="json") for m in messages(20)]
+    response = client.post("/api/v1/groups/api_lote/ingest:batch", json=payload)
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "accepted"
+    assert len(body["results"]) == 20
+    assert sum(1 for r in group_service.get_group_state("api_lote")["log"] if r["type"] == "message") == 20
+
+
+def test_batch_endpoint_limits(client):
+    item = {"author": "ana", "text": "hola"}
+    response = client.post("/api/v1/groups/api_lote/ingest:batch", json=[item] * (MAX_BATCH_INGEST_ITEMS + 1))
+    assert response.status_code == 413
+    assert client.post("/api/v1/groups/grupo%20malo/ingest:batch", json=[item]).status_code == 400
+
+
+
+def test_failed_append_leaves_user_stats_untouched(storage, monkeypatch):
+    from app.services import group_store
+
+    monkeypatch.setattr(group_service, "GROUP_STORAGE_MODE", group_store.STORAGE_SEGMENTED)
+    group_service.persist_messages("fallo", messages(10, seed=3))
+    before = group_service.get_group_state("fallo")["user_stats"]
+
+    append_records = group_store.append_records
+
+    def failing_append(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    retry = messages(5, seed=4)
+    monkeypatch.setattr(group_store, "append_records", failing_append)
+    with pytest.raises(OSError):
+        group_service.persist_messages("fallo", retry)
+    assert group_service.get_group_state("fallo")["user_stats"] == before
+
+    # El reintento aplica cada mensaje una sola vez.
+    monkeypatch.setattr(group_store, "append_records", append_records)
+    group_service.persist_messages("fallo", retry)
+    after = group_service.get_group_state("fallo")["user_stats"]
+    assert sum(stats["count"] for stats in after.values()) == 15
+
+
+def test_table_replace_is_atomic(storage, monkeypatch):
+    from app.services import group_store, user_stats_table
+
+    monkeypatch.setattr(group_service, "GROUP_STORAGE_MODE", group_store.STORAGE_SEGMENTED)
+    group_service.persist_messages("sustituir", messages(20, seed=5))
+    filepath = group_service.get_group_memory_path("sustituir")
+    table = user_stats_table.open_table(filepath)
+    before = table.to_dict()
+
+    # Si la escritura de los temporales falla, la tabla anterior sigue intacta.
+    real_replace = user_stats_table.os.replace
+
+    def failing_replace(*args):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(user_stats_table.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        table.replace({"nuevo": user_stats_table.new_stats()})
+    monkeypatch.setattr(user_stats_table.os, "replace", real_replace)
+    assert user_stats_table.UserStatsTable(filepath).to_dict() == before
+
+    replacement = {f"autor{i}": {**user_stats_table.new_stats(), "ewma_valence": i / 10, "count": i} for i in range(40)}
+    table = user_stats_table.UserStatsTable(filepath)
+    table.replace(replacement)
+    assert table.to_dict() == replacement
+    assert user_stats_table.UserStatsTable(filepath).to_dict() == replacement
+    assert not list(filepath.parent.glob(".*.tmp"))
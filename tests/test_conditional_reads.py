@@ -0,0 +1,56 @@
+"""Lecturas condicionales (ETag / If-None-Match) de los grupos."""
+from datetime import datetime
+
+from app.models import schemas
+from app.services import group_service, response_cache, state_cache
+
+
+def ingest(group_id: str, text: str = "hola"):
+    group_service.persist_message(group_id, schemas.MessageIngest(author="ana", text=text, ts=datetime.utcnow()))
+
+
+def test_state_not_modified(client, storage_mode):
+    ingest("etag")
+    response = client.get("/api/v1/groups/etag/state")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    again = client.get("/api/v1/groups/etag/state", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+    assert client.get("/api/v1/groups/etag/state", headers={"If-None-Match": f'W/{etag}, "otro"'}).status_code == 304
+
+    header = client.get("/api/v1/groups/etag/state", params={"include_log": False})
+    assert header.headers["ETag"] != etag
+    assert client.get("/api/v1/groups/etag/state", params={"include_log": False},
+                      headers={"If-None-Match": etag}).status_code == 200
+
+    ingest("etag", "otra cosa")
+    changed = client.get("/api/v1/groups/etag/state", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()["log"]) > len(response.json()["log"])
+
+
+def test_state_etag_depends_only_on_disk(client, storage_mode, monkeypatch):
+    """El ETag no depende de contadores del proceso: sobrevive a un reinicio (cachés vacías)."""
+    ingest("etag")
+    etag = group_service.state_etag("etag")
+    monkeypatch.setattr(group_service, "state_cache", state_cache.GroupStateCache())
+    monkeypatch.setattr(response_cache, "cache", response_cache.ResponseCache())
+    assert group_service.state_etag("etag") == etag
+    assert client.get("/api/v1/groups/etag/state", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_state_etag_unknown_group(client, storage):
+    assert group_service.state_etag("nadie") is None
+    assert client.get("/api/v1/groups/nadie/state").status_code == 404
+
+
+def test_content_etag_endpoints(client, storage_mode):
+    ingest("etag")
+    for path in ("/api/v1/groups/etag/metrics", "/api/v1/groups/"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert client.get(path, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
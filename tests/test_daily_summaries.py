@@ -0,0 +1,64 @@
+"""Calendario del script de resúmenes diarios: reintentos de los grupos que fallan."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import schemas
+from app.services import group_service, profile_registry
+from scripts import run_daily_summaries
+
+AT = datetime(2026, 3, 2, 10, 0)
+
+
+@pytest.fixture
+def summary_at(monkeypatch):
+    monkeypatch.setattr(run_daily_summaries, "summary_time", lambda group_id, quiet=False: AT.time())
+
+
+def test_failed_group_is_retried_within_the_window(summary_at):
+    failures = {}
+    now, retries = AT, []
+    while True:
+        due = run_daily_summaries.reschedule("fallido", "error", now, failures)
+        if due.date() != AT.date():
+            break
+        retries.append(due - now)
+        now = due
+    # Esperas crecientes mientras caben en la ventana; después, el turno de mañana.
+    assert retries == [run_daily_summaries.RETRY_BASE * 2 ** i for i in range(4)]
+    assert now + run_daily_summaries.RETRY_BASE * 2 ** 4 > AT + run_daily_summaries.RUN_WINDOW
+    assert due == AT + timedelta(days=1)
+    assert failures == {}
+
+
+def test_success_resets_the_retries(summary_at):
+    failures = {}
+    first = run_daily_summaries.reschedule("grupo", "error", AT, failures)
+    assert first == AT + run_daily_summaries.RETRY_BASE and failures == {"grupo": 1}
+    assert run_daily_summaries.reschedule("grupo", "written", first, failures) == AT + timedelta(days=1)
+    assert failures == {}
+    # Un grupo descartado (otro proceso ya lo resumió) no se reintenta.
+    assert run_daily_summaries.reschedule("otro", "skipped", AT, failures) == AT + timedelta(days=1)
+
+
+def test_no_retry_without_summary_time(monkeypatch):
+    monkeypatch.setattr(run_daily_summaries, "summary_time", lambda group_id, quiet=False: None)
+    failures = {}
+    assert run_daily_summaries.reschedule("sin_hora", "error", AT, failures) is None
+    assert failures == {}
+
+
+
+def test_empty_day_gets_a_summary(storage_mode, tmp_path, monkeypatch):
+    monkeypatch.setattr(profile_registry, "registry", profile_registry.ProfileRegistry(tmp_path / "profiles", check_interval=0))
+    (tmp_path / "profiles").mkdir()
+    (tmp_path / "profiles" / "groups.yaml").write_text(
+        f"vacio:\n  companion_settings:\n    daily_summary_time_utc: '{datetime.utcnow():%H:%M}'\n", encoding="utf-8")
+    group_service.persist_messages("vacio", [
+        schemas.MessageIngest(author="ana", text="hola", ts=datetime.utcnow() - timedelta(days=3)),
+    ])
+
+    assert run_daily_summaries.process_group("vacio") == "written"
+    summaries = [r for r in group_service.iter_log("vacio") if r["type"] == "daily_summary"]
+    assert len(summaries) == 1 and summaries[0]["details"]["message_count"] == 0
+    assert group_service.get_group_header("vacio")["meta"]["last_daily_summary_ts"]
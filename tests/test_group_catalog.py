@@ -0,0 +1,67 @@
+"""Catálogo de grupos: mantenimiento incremental y coherencia con el almacenamiento."""
+from datetime import datetime, timedelta
+
+from app.models import schemas
+from app.services import group_catalog, group_service
+
+CALM = ["vale", "de acuerdo", "perfecto, gracias", "lo miro luego"]
+
+
+def ingest(group_id: str, count: int, start: datetime):
+    group_service.persist_messages(group_id, [
+        schemas.MessageIngest(author="ana", ts=start + timedelta(hours=i),
+                              text="¡¡¡NO PUEDE SER, OTRA VEZ!!!" if i % 6 == 5 else CALM[i % len(CALM)])
+        for i in range(count)
+    ])
+
+
+def without_mtime(entry: dict | None) -> dict | None:
+    return entry and {key: value for key, value in entry.items() if key != "last_modified"}
+
+
+def test_incremental_entry_matches_recomputed(storage_mode):
+    ingest("catalogo", 120, datetime.utcnow() - timedelta(days=20))
+    entry = group_catalog.get("catalogo")
+    assert entry["message_count"] == 120 and entry["last_alert_ts"]
+    assert without_mtime(entry) == without_mtime(group_service.catalog_entry("catalogo"))
+
+    # La compactación mueve mensajes al archivo frío sin cambiar los recuentos.
+    group_service.compact_group("catalogo", keep_days=5)
+    assert group_service.get_group_header("catalogo")["meta"].get("archive")
+    assert without_mtime(group_service.catalog_entry("catalogo")) == without_mtime(group_catalog.get("catalogo"))
+
+    summary = schemas.DailySummaryRecord(details=schemas.DailySummaryDetails(
+        topics=[], decisions=[], actions=[], active_members=[], message_count=0))
+    assert group_service.append_daily_summary("catalogo", summary.model_dump(mode="json"), None)
+    entry = group_catalog.get("catalogo")
+    assert entry["last_summary_ts"] == group_service.get_group_header("catalogo")["meta"]["last_daily_summary_ts"]
+    assert without_mtime(entry) == without_mtime(group_service.catalog_entry("catalogo"))
+
+
+def test_rename_and_delete(storage_mode):
+    ingest("viejo", 10, datetime.utcnow() - timedelta(hours=10))
+    group_service.rename_group("viejo", "nuevo")
+    assert group_catalog.get("viejo") is None
+    assert group_catalog.get("nuevo")["message_count"] == 10
+    group_service.delete_group("nuevo")
+    assert group_catalog.list_entries() == []
+
+
+def test_listing_repairs_missing_and_stale_entries(storage_mode):
+    ingest("uno", 5, datetime.utcnow() - timedelta(hours=5))
+    ingest("dos", 7, datetime.utcnow() - timedelta(hours=7))
+    # Catálogo perdido (o grupo copiado a mano) y una entrada de un grupo que ya no existe.
+    group_catalog.delete("uno")
+    group_catalog.put({"group_id": "fantasma", "message_count": 3})
+    listed = group_service.list_catalog()
+    assert sorted(entry["group_id"] for entry in listed) == ["dos", "uno"]
+    assert sorted(entry["group_id"] for entry in group_catalog.list_entries()) == ["dos", "uno"]
+    assert group_catalog.get("uno")["message_count"] == 5
+
+
+def test_list_endpoint(client, storage_mode):
+    ingest("reciente", 12, datetime.utcnow() - timedelta(hours=12))
+    group_service.create_group("vacio")
+    groups = {group["group_id"]: group for group in client.get("/api/v1/groups/").json()["groups"]}
+    assert groups["reciente"]["message_count"] == 12 and groups["reciente"]["has_recent_alerts"]
+    assert groups["vacio"]["message_count"] == 0 and not groups["vacio"]["has_recent_alerts"]
@@ -0,0 +1,86 @@
+"""Canal de eventos (SSE) de los grupos: recuperación por cursor, eventos en vivo y contrapresión."""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from app.models import schemas
+from app.services import event_bus, group_events, group_service
+
+GROUP = "eventos"
+CALM = ["vale", "de acuerdo", "perfecto, gracias", "lo miro luego"]
+
+
+def messages(count: int, start: datetime, shout_every: int = 6) -> list[schemas.MessageIngest]:
+    return [
+        schemas.MessageIngest(author="ana", ts=start + timedelta(minutes=i),
+                              text="¡¡¡NO PUEDE SER, OTRA VEZ!!!" if i % shout_every == shout_every - 1 else CALM[i % len(CALM)])
+        for i in range(count)
+    ]
+
+
+def parse(chunk: str) -> dict:
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return {"event": fields["event"], "id": fields.get("id"), "data": json.loads(fields["data"])}
+
+
+async def next_event(stream, timeout: float = 5.0) -> dict:
+    while True:
+        chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+        if not chunk.startswith(":"):
+            return parse(chunk)
+
+
+def test_events_after_cursor(storage_mode):
+    group_service.persist_messages(GROUP, messages(60, datetime.utcnow() - timedelta(hours=2)))
+    events = group_service.events_after(GROUP, "2000-01-01T00:00:00", 1000)
+    assert len(events) >= 3 and {e["type"] for e in events} <= set(group_service.EVENT_RECORD_TYPES)
+    assert group_service.events_after(GROUP, events[0]["msg_id"], 1000) == events[1:]
+    assert group_service.events_after(GROUP, events[0]["msg_id"], 1) == events[-1:]
+    assert group_service.events_after(GROUP, events[-1]["msg_id"], 1000) == []
+
+
+def test_stream_replays_from_cursor_then_goes_live(storage_mode):
+    group_service.persist_messages(GROUP, messages(60, datetime.utcnow() - timedelta(hours=2)))
+    history = group_service.events_after(GROUP, "2000-01-01T00:00:00", 1000)
+
+    async def run():
+        stream = group_events.stream_events(GROUP, history[0]["msg_id"])
+        try:
+            replayed = [await next_event(stream) for _ in history[1:]]
+            assert [(e["event"], e["id"]) for e in replayed] == [(r["type"], r["msg_id"]) for r in history[1:]]
+            assert (await next_event(stream))["event"] == "metrics"
+
+            # Una ingesta posterior llega en vivo, con sus métricas.
+            await asyncio.to_thread(group_service.persist_messages, GROUP, messages(12, datetime.utcnow() - timedelta(minutes=12)))
+            live = group_service.events_after(GROUP, history[-1]["msg_id"], 1000)
+            assert live
+            received = [await next_event(stream) for _ in live]
+            assert [(e["event"], e["id"]) for e in received] == [(r["type"], r["msg_id"]) for r in live]
+            # Las métricas se publican después de los registros del lote.
+            assert (await next_event(stream))["event"] == "metrics"
+        finally:
+            await stream.aclose()
+
+    asyncio.run(run())
+    assert not event_bus.bus.has_subscribers(GROUP)
+
+
+def test_overflow_is_replaced_by_resync():
+    async def run():
+        bus = event_bus.EventBus()
+        subscription = bus.subscribe("lento", asyncio.get_running_loop(), max_pending=3)
+        bus.publish("lento", [{"event": "alert", "id": str(i), "data": {}} for i in range(5)])
+        await asyncio.sleep(0)
+        assert subscription.queue.qsize() == 1
+        assert subscription.queue.get_nowait() is event_bus.RESYNC
+        assert subscription.dropped == 5
+
+        # Tras re-sincronizar, los eventos vuelven a encolarse.
+        subscription.resynced()
+        bus.publish("lento", [{"event": "alert", "id": "6", "data": {}}])
+        await asyncio.sleep(0)
+        assert subscription.queue.get_nowait()["id"] == "6"
+        bus.unsubscribe("lento", subscription)
+        assert not bus.has_subscribers("lento")
+
+    asyncio.run(run())
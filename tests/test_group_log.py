@@ -0,0 +1,87 @@
+"""Paginación por cursores y streaming NDJSON del log de un grupo."""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import schemas
+from app.services import group_service
+
+GROUP = "paginas"
+
+
+@pytest.fixture
+def full_log(storage_mode):
+    """Grupo con registros de 40 días: los más antiguos quedan en el archivo frío."""
+    start = datetime.utcnow() - timedelta(days=40)
+    texts = ["hola", "¡¡¡NO PUEDE SER!!!", "vale", "¿qué opináis?"]
+    group_service.persist_messages(GROUP, [
+        schemas.MessageIngest(author=f"u{i % 3}", text=texts[i % 4], ts=start + timedelta(hours=4 * i))
+        for i in range(240)
+    ])
+    group_service.compact_group(GROUP, keep_days=10)
+    log = list(group_service.iter_log(GROUP))
+    assert group_service.get_group_header(GROUP)["meta"].get("archive")
+    return log
+
+
+def test_backward_paging_covers_the_whole_log(client, full_log):
+    pages, before = [], None
+    while True:
+        params = {"limit": 37}
+        if before:
+            params["before"] = before
+        page = client.get(f"/api/v1/groups/{GROUP}/log", params=params).json()
+        pages.insert(0, page["records"])
+        if not page["has_more"]:
+            break
+        before = page["next_before"]
+    assert [record for page in pages for record in page] == full_log
+
+
+def test_forward_paging_from_a_cursor(client, full_log):
+    records, after = [], full_log[10]["msg_id"]
+    while True:
+        page = client.get(f"/api/v1/groups/{GROUP}/log", params={"after": after, "limit": 50}).json()
+        records += page["records"]
+        after = page["next_after"]
+        if not page["has_more"]:
+            break
+    assert records == full_log[11:]
+    # Al final, la página vacía conserva el cursor para seguir sondeando.
+    page = client.get(f"/api/v1/groups/{GROUP}/log", params={"after": after}).json()
+    assert page["records"] == [] and page["next_after"] == after
+
+
+def test_type_filter_and_timestamp_cursors(client, full_log):
+    since = datetime.fromisoformat(full_log[100]["ts"])
+    until = datetime.fromisoformat(full_log[200]["ts"])
+    page = client.get(f"/api/v1/groups/{GROUP}/log", params={
+        "after": since.isoformat(), "before": until.isoformat(), "type": "message", "limit": 1000,
+    }).json()
+    expected = [r for r in full_log if r["type"] == "message" and since < datetime.fromisoformat(r["ts"]) < until]
+    assert expected and page["records"] == expected
+
+
+def test_ndjson_stream(client, full_log):
+    response = client.get(f"/api/v1/groups/{GROUP}/log", params={"format": "ndjson", "type": "message"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == [r for r in full_log if r["type"] == "message"]
+
+
+def test_unknown_cursor_and_group(client, full_log):
+    assert client.get(f"/api/v1/groups/{GROUP}/log", params={"after": "no-existe"}).status_code == 404
+    assert client.get("/api/v1/groups/sin_grupo/log").status_code == 404
+
+
+def test_ndjson_errors_before_streaming(client, full_log):
+    params = {"format": "ndjson"}
+    assert client.get(f"/api/v1/groups/{GROUP}/log", params={**params, "after": "no-existe"}).status_code == 404
+    assert client.get(f"/api/v1/groups/{GROUP}/log", params={**params, "before": "no-existe"}).status_code == 404
+    assert client.get("/api/v1/groups/sin_grupo/log", params=params).status_code == 404
+    last = full_log[-1]["ts"]
+    empty = client.get(f"/api/v1/groups/{GROUP}/log", params={**params, "after": last, "type": "message"})
+    assert empty.status_code == 200 and empty.text == ""
+    limited = client.get(f"/api/v1/groups/{GROUP}/log", params={**params, "limit": 3})
+    assert len(limited.text.splitlines()) == 3
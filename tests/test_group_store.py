@@ -0,0 +1,37 @@
+"""Log segmentado de solo-anexado."""
+import json
+from datetime import datetime, timedelta
+
+from app.models import schemas
+from app.services import group_service, group_store
+
+
+def ingest(group_id: str, count: int, start: datetime):
+    group_service.persist_messages(group_id, [
+        schemas.MessageIngest(author="ana", text=f"mensaje {i}", ts=start + timedelta(minutes=i)) for i in range(count)
+    ])
+
+
+def test_truncated_last_line_is_skipped_and_repaired(storage, monkeypatch):
+    monkeypatch.setattr(group_service, "GROUP_STORAGE_MODE", group_store.STORAGE_SEGMENTED)
+    start = datetime.utcnow() - timedelta(minutes=30)
+    ingest("cortado", 5, start)
+    seg_dir = group_store.segments_dir(group_service.get_group_memory_path("cortado"))
+    segment = group_store.list_segments(seg_dir)[-1]
+    complete = segment.read_bytes()
+    # Caída a mitad de un anexado: la última línea queda sin terminar (y con un carácter cortado).
+    with open(segment, "ab") as f:
+        f.write('{"type":"message","text":"a medias ñ'.encode("utf-8")[:-1])
+
+    texts = [r["text"] for r in group_store.iter_records(seg_dir) if r["type"] == "message"]
+    assert texts == [f"mensaje {i}" for i in range(5)]
+    assert [r["text"] for r in group_store.iter_records_reversed(seg_dir) if r["type"] == "message"] == texts[::-1]
+    assert len(group_store.read_tail(seg_dir, start - timedelta(minutes=1))) == len(list(group_store.iter_records(seg_dir)))
+    assert len([r for r in group_service.get_group_state("cortado")["log"] if r["type"] == "message"]) == 5
+
+    # La ingesta sigue funcionando y la línea incompleta se descarta antes de anexar.
+    ingest("cortado", 2, start + timedelta(minutes=10))
+    assert segment.read_bytes().startswith(complete)
+    lines = segment.read_bytes().splitlines()
+    assert all(json.loads(line) for line in lines)
+    assert sum(1 for line in lines if json.loads(line)["type"] == "message") == 7
@@ -0,0 +1,67 @@
+"""Escritor único por grupo: agrupación de envíos y reintentos."""
+import threading
+from datetime import datetime, timedelta
+
+from app.models import schemas
+from app.services import group_service, group_writer
+
+
+def message(i: int) -> schemas.MessageIngest:
+    return schemas.MessageIngest(author="ana", text=f"mensaje {i}", ts=datetime.utcnow() - timedelta(seconds=100 - i))
+
+
+def gated_registry(persist):
+    """
+    Registro cuyas escrituras esperan a 'gate'. Devuelve también 'hold(primer envío)':
+    lo encola y espera a que el escritor lo esté persistiendo, de modo que los envíos
+    siguientes se agrupan en un solo lote.
+    """
+    gate, entered = threading.Event(), threading.Event()
+
+    def gated(group_id, messages):
+        entered.set()
+        gate.wait(timeout=10)
+        return persist(group_id, messages)
+    registry = group_writer.GroupWriterRegistry(gated, idle_seconds=0.5)
+
+    def hold(group_id, messages):
+        future = registry.submit(group_id, messages)
+        assert entered.wait(timeout=10)
+        return future
+    return registry, gate, hold
+
+
+def test_failure_after_write_does_not_duplicate(storage_mode, monkeypatch):
+    def failing(*args, **kwargs):
+        raise RuntimeError("catálogo caído")
+
+    monkeypatch.setattr(group_service, "_catalog_record_write", failing)
+    registry, gate, hold = gated_registry(group_service._persist_batch)
+    futures = [hold("escritor", [message(0)])] + [registry.submit("escritor", [message(i)]) for i in range(1, 10)]
+    gate.set()
+    results = [future.result(timeout=30) for future in futures]
+
+    assert registry.max_batch == 9
+    log = [r for r in group_service.get_group_state("escritor")["log"] if r["type"] == "message"]
+    assert [r["text"] for r in log] == [f"mensaje {i}" for i in range(10)]
+    assert [r["msg_id"] for r in log] == [result[0]["msg_id"] for result in results]
+
+
+def test_failed_batch_is_retried_per_submission():
+    calls = []
+
+    def persist(group_id, messages):
+        calls.append(len(messages))
+        if any(m == "malo" for m in messages):
+            raise ValueError("mensaje no válido")
+        return [{"msg_id": m} for m in messages]
+
+    registry, gate, hold = gated_registry(persist)
+    first = hold("g", ["a"])
+    rest = [registry.submit("g", [text]) for text in ("b", "malo", "c")]
+    gate.set()
+    assert first.result(timeout=10) == [{"msg_id": "a"}]
+    assert rest[0].result(timeout=10) == [{"msg_id": "b"}]
+    assert isinstance(rest[1].exception(timeout=10), ValueError)
+    assert rest[2].result(timeout=10) == [{"msg_id": "c"}]
+    assert calls == [1, 3, 1, 1, 1]
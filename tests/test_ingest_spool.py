@@ -0,0 +1,120 @@
+"""Cola de ingesta asíncrona: punto de control y recuperación tras una caída."""
+import json
+import time
+
+import pytest
+
+from app.models import schemas
+from app.services import group_service
+from app.services.ingest_spool import IngestSpool
+
+GROUP = "cola"
+
+
+def wait_until_drained(spool: IngestSpool, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while spool.queue_depth():
+        assert time.monotonic() < deadline, "la cola no se ha vaciado"
+        time.sleep(0.01)
+
+
+def crash(spool: IngestSpool):
+    """Abandona la cola como lo haría un proceso que muere: sin stop() ni punto de control final."""
+    spool._file.close()
+    spool._claim.release()
+
+
+def logged_messages(group_id: str = GROUP) -> list[dict]:
+    return [r for r in group_service.get_group_state(group_id)["log"] if r["type"] == "message"]
+
+
+@pytest.fixture
+def spool_dir(storage_mode, storage):
+    return storage / "spool"
+
+
+def test_checkpoint_advances_when_the_queue_drains(spool_dir):
+    spool = IngestSpool(spool_dir)
+    for i in range(50):
+        spool.enqueue(GROUP, schemas.MessageIngest(author="ana", text=f"mensaje {i}"))
+    wait_until_drained(spool)
+    time.sleep(1)  # Sin más actividad, nada más mueve el punto de control.
+    assert (spool_dir / "checkpoint").read_text() == "50"
+    crash(spool)
+
+    restarted = IngestSpool(spool_dir)
+    restarted.start()
+    wait_until_drained(restarted)
+    restarted.stop()
+    assert len(logged_messages()) == 50
+
+
+def test_redelivery_after_a_stale_checkpoint_is_idempotent(spool_dir):
+    spool = IngestSpool(spool_dir)
+    for i in range(50):
+        spool.enqueue(GROUP, schemas.MessageIngest(author="ana", text=f"mensaje {i}"))
+    wait_until_drained(spool)
+    crash(spool)
+    # Caída justo después del primer punto de control de una ráfaga.
+    (spool_dir / "checkpoint").write_text("1")
+    segments = list(spool_dir.glob("spool-*.jsonl"))
+    assert segments
+
+    restarted = IngestSpool(spool_dir)
+    restarted.start()
+    wait_until_drained(restarted)
+    restarted.stop()
+    messages = logged_messages()
+    assert [m["text"] for m in messages] == [f"mensaje {i}" for i in range(50)]
+    assert [m["spool_seq"] for m in messages] == list(range(1, 51))
+    assert (spool_dir / "checkpoint").read_text() == "50"
+    assert not any(segment.exists() for segment in segments)
+
+
+def test_unpersisted_messages_are_redelivered_once(spool_dir):
+    spool_dir.mkdir()
+    entries = [
+        {"seq": seq, "group_id": GROUP, "msg_id": f"id-{seq}",
+         "message": {"author": "luis", "text": f"pendiente {seq}", "ts": f"2026-01-01T10:00:0{seq}"}}
+        for seq in (1, 2, 3)
+    ]
+    # Una entrada sin msg_id, como las escritas por versiones anteriores de la cola.
+    entries.append({"seq": 4, "group_id": GROUP, "message": {"author": "luis", "text": "antigua", "ts": "2026-01-01T10:00:04"}})
+    (spool_dir / "spool-000000000001.jsonl").write_text("".join(json.dumps(e) + "\n" for e in entries))
+    # El primero llegó a persistirse antes de la caída.
+    first = entries[0]
+    group_service.persist_messages(GROUP, [
+        schemas.SpooledMessage(**first["message"], msg_id=first["msg_id"], spool_seq=first["seq"])
+    ])
+
+    spool = IngestSpool(spool_dir)
+    spool.start()
+    wait_until_drained(spool)
+    spool.stop()
+    messages = logged_messages()
+    assert [m["text"] for m in messages] == ["pendiente 1", "pendiente 2", "pendiente 3", "antigua"]
+    assert [m["msg_id"] for m in messages[:3]] == ["id-1", "id-2", "id-3"]
+    assert "spool_seq" not in messages[3]
+
+
+def test_backfill_keeps_spool_seq(spool_dir):
+    spool = IngestSpool(spool_dir)
+    for i in range(20):
+        spool.enqueue(GROUP, schemas.MessageIngest(author="ana", text=f"mensaje {i}"))
+    wait_until_drained(spool)
+    crash(spool)
+    group_service.persist_messages(GROUP, [schemas.MessageIngest(author="luis", text="directo")])
+    before = logged_messages()
+
+    group_service.backfill_group(GROUP)
+    after = logged_messages()
+    assert [m.get("spool_seq") for m in after] == [m.get("spool_seq") for m in before] == list(range(1, 21)) + [None]
+    assert [m["msg_id"] for m in after] == [m["msg_id"] for m in before]
+
+    # La reentrega tras el reproceso sigue reconociendo los mensajes ya persistidos.
+    (spool_dir / "checkpoint").write_text("0")
+    restarted = IngestSpool(spool_dir)
+    restarted.start()
+    wait_until_drained(restarted)
+    restarted.stop()
+    assert len(logged_messages()) == 21
@@ -0,0 +1,130 @@
+"""Paridad del agregador incremental de métricas con el recorrido del log original."""
+import random
+import statistics
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.metrics_aggregator import GroupMetricsAggregator
+
+
+def scan_metrics(log: list[dict], now: datetime, window_minutes: int = 10, friction_window_hours: int = 24) -> dict:
+    """Cálculo original de get_group_metrics: recorre el log desde el final."""
+    affective_window_start = now - timedelta(minutes=window_minutes)
+    recent_proxies = [
+        r["affective_proxy"]
+        for r in reversed(log)
+        if r.get("type") == "message"
+        and "affective_proxy" in r
+        and datetime.fromisoformat(r["ts"]).replace(tzinfo=None) > affective_window_start
+    ]
+    if recent_proxies:
+        median_arousal = statistics.median([p["arousal_z"] for p in recent_proxies])
+        median_valence = statistics.median([p.get("valence_z", 0.0) for p in recent_proxies])
+        median_uncertainty = statistics.median([p.get("uncertainty_z", 0.0) for p in recent_proxies])
+    else:
+        median_arousal, median_valence, median_uncertainty = 0.0, 0.0, 0.0
+
+    friction_window_start = now - timedelta(hours=friction_window_hours)
+    message_count = 0
+    alert_count = 0
+    for record in reversed(log):
+        try:
+            ts = datetime.fromisoformat(record.get("ts", "")).replace(tzinfo=None)
+            if ts < friction_window_start:
+                break
+            if record.get("type") == "message":
+                message_count += 1
+            elif record.get("type") == "alert":
+                alert_count += 1
+        except (ValueError, TypeError):
+            continue
+
+    return {
+        "friction_index": (alert_count / message_count) if message_count > 0 else 0.0,
+        "affective_proxy": {"arousal_z": median_arousal, "valence_z": median_valence, "uncertainty_z": median_uncertainty},
+    }
+
+
+def random_log(rng: random.Random, now: datetime, size: int) -> list[dict]:
+    """Log sintético de las últimas ~30 h, casi en orden, con registros desordenados y ts inválidos."""
+    log = []
+    ts = now - timedelta(hours=30)
+    step = timedelta(hours=30) / max(size, 1)
+    for _ in range(size):
+        ts += step
+        late = timedelta(minutes=rng.choice([0, 0, 0, 0, 5, 90]))  # Algunos llegan tarde.
+        record_ts = ts - late - timedelta(microseconds=rng.randrange(1000))
+        kind = rng.random()
+        if kind < 0.8:
+            record = {"type": "message", "ts": record_ts.isoformat()}
+            if rng.random() < 0.9:
+                record["affective_proxy"] = {
+                    "arousal_z": round(rng.gauss(0, 1.5), 2),
+                    "valence_z": round(rng.gauss(0, 1), 2),
+                    "uncertainty_z": round(rng.gauss(0, 1), 2),
+                }
+        elif kind < 0.95:
+            record = {"type": "alert", "ts": record_ts.isoformat()}
+        else:
+            record = {"type": "suggestion", "ts": rng.choice([record_ts.isoformat(), "", "no-es-una-fecha"])}
+        log.append(record)
+    return log
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_snapshot_matches_log_scan(seed):
+    rng = random.Random(seed)
+    log = random_log(rng, datetime.utcnow(), rng.choice([0, 1, 50, 2000]))
+    aggregator = GroupMetricsAggregator()
+    aggregator.extend(log)
+    # 'now' no puede ser anterior al reloj con el que extend() recorta la ventana.
+    now = datetime.utcnow()
+    assert aggregator.snapshot(now) == scan_metrics(log, now)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_incremental_ingest_matches_log_scan(seed):
+    """Registros añadidos por lotes y consultas con un 'now' que avanza, como en la ingesta."""
+    rng = random.Random(seed)
+    log = random_log(rng, datetime.utcnow(), 3000)
+    aggregator = GroupMetricsAggregator()
+    persisted, offset = 0, timedelta(0)
+    while persisted < len(log):
+        batch = log[persisted:persisted + rng.randint(1, 400)]
+        aggregator.extend(batch)
+        persisted += len(batch)
+        offset += timedelta(seconds=rng.randint(0, 3))
+        now = datetime.utcnow() + offset
+        assert aggregator.snapshot(now) == scan_metrics(log[:persisted], now)
+
+
+def test_groups_metrics_endpoint(client, storage_mode):
+    from app.models import schemas
+    from app.services import group_service, metrics_aggregator
+
+    rng = random.Random(4)
+    now = datetime.utcnow()
+    for group_id in ("norte", "sur", "este"):
+        group_service.persist_messages(group_id, [
+            schemas.MessageIngest(author=rng.choice(["ana", "luis"]), text=rng.choice(["hola", "¡¡¡NO!!!", "vale"]),
+                                  ts=now - timedelta(minutes=30 - i))
+            for i in range(30)
+        ])
+    # Un grupo con el agregador ya en memoria y los demás en frío.
+    metrics_aggregator.registry.invalidate("sur")
+    metrics_aggregator.registry.invalidate("este")
+    client.get("/api/v1/groups/norte/metrics")
+
+    response = client.get("/api/v1/groups/metrics")
+    assert response.status_code == 200
+    body = response.json()
+    assert [entry["group_id"] for entry in body["groups"]] == ["este", "norte", "sur"]
+    for entry in body["groups"]:
+        single = client.get(f"/api/v1/groups/{entry['group_id']}/metrics").json()
+        assert {key: entry[key] for key in single} == single
+    datetime.fromisoformat(body["ts"])
+
+    selected = client.get("/api/v1/groups/metrics", params=[("group_id", "sur"), ("group_id", "no_existe"), ("group_id", "sur")])
+    assert [entry["group_id"] for entry in selected.json()["groups"]] == ["sur"]
+    assert client.get("/api/v1/groups/metrics", params={"group_id": "mal.id"}).status_code == 400
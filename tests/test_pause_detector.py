@@ -0,0 +1,104 @@
+"""Paridad del detector incremental de tensión sostenida con el recorrido por sub-ventanas original."""
+import random
+import statistics
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import group_service
+from app.services.pause_detector import SustainedArousalDetector
+from app.services.rolling import to_epoch_us
+
+WINDOW_MIN = group_service.SUSTAINED_AROUSAL_WINDOW_MIN
+SUB_WINDOWS = group_service.SUSTAINED_AROUSAL_SUB_WINDOWS
+THRESHOLD = group_service.SUSTAINED_AROUSAL_THRESHOLD
+SUB_WINDOW = timedelta(minutes=WINDOW_MIN / SUB_WINDOWS)
+
+
+def scan_sub_windows_high(log: list[dict], now: datetime, threshold: float = THRESHOLD) -> bool:
+    """Cálculo original de check_and_suggest_pause: filtra la ventana y recorre cada sub-ventana."""
+    window_start_ts = now - timedelta(minutes=WINDOW_MIN)
+    arousal_scores_in_window = [
+        (datetime.fromisoformat(r["ts"]).replace(tzinfo=None), r["affective_proxy"]["arousal_z"])
+        for r in log if r.get("type") == "message" and "affective_proxy" in r and datetime.fromisoformat(r["ts"]).replace(tzinfo=None) > window_start_ts
+    ]
+
+    sub_window_duration_sec = (WINDOW_MIN / SUB_WINDOWS) * 60
+    for i in range(SUB_WINDOWS):
+        sub_window_end = now - timedelta(seconds=i * sub_window_duration_sec)
+        sub_window_start = now - timedelta(seconds=(i + 1) * sub_window_duration_sec)
+        scores_in_sub = [score for ts, score in arousal_scores_in_window if sub_window_start <= ts < sub_window_end]
+        if not scores_in_sub or statistics.median(scores_in_sub) < threshold:
+            return False
+    return True
+
+
+def message(ts: datetime, arousal_z: float) -> dict:
+    return {"type": "message", "ts": ts.isoformat(), "affective_proxy": {"arousal_z": arousal_z}}
+
+
+def random_stream(rng: random.Random, start: datetime, size: int):
+    """
+    Mensajes con su instante de consulta: la mayoría en orden, algunos tardíos o
+    adelantados respecto al reloj, y algunos justo en los límites de las sub-ventanas.
+    """
+    now = start
+    for _ in range(size):
+        now += timedelta(seconds=rng.choice([0, 1, 5, 30, 90, 400]), microseconds=rng.randrange(1000))
+        roll = rng.random()
+        if roll < 0.1:
+            ts = now - timedelta(minutes=rng.uniform(0, WINDOW_MIN * 1.5))   # tardío
+        elif roll < 0.15:
+            ts = now + timedelta(seconds=rng.uniform(0, 120))                # por delante del reloj
+        elif roll < 0.25:
+            ts = now - SUB_WINDOW * rng.randrange(SUB_WINDOWS + 1)           # en un límite exacto
+        else:
+            ts = now
+        # Rachas de tensión alta para que la condición se cumpla a menudo.
+        arousal_z = rng.gauss(THRESHOLD + 0.2, 0.5) if (now - start).seconds // 3600 % 2 else rng.gauss(0.5, 1.0)
+        yield message(ts, round(arousal_z, 3)), now
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_detector_matches_sub_window_scan(seed):
+    rng = random.Random(seed)
+    detector = SustainedArousalDetector(WINDOW_MIN, SUB_WINDOWS)
+    log = []
+    outcomes = set()
+    for record, now in random_stream(rng, datetime(2024, 5, 1, 9), 800):
+        log.append(record)
+        detector.extend([record])
+        expected = scan_sub_windows_high(log, now)
+        assert detector.all_sub_windows_high(to_epoch_us(now), THRESHOLD) == expected, (seed, now)
+        outcomes.add(expected)
+    assert outcomes == {True, False}
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_detector_built_from_log_matches_scan(seed):
+    """Un detector reconstruido desde el log (tras una caída de caché) responde igual que el incremental."""
+    rng = random.Random(100 + seed)
+    log = []
+    for record, now in random_stream(rng, datetime(2024, 5, 1, 9), 600):
+        log.append(record)
+        if rng.random() < 0.1:
+            detector = SustainedArousalDetector(WINDOW_MIN, SUB_WINDOWS)
+            detector.advance(to_epoch_us(now))
+            detector.extend(log)
+            assert detector.all_sub_windows_high(to_epoch_us(now), THRESHOLD) == scan_sub_windows_high(log, now)
+
+
+def test_clock_going_back_is_not_answered():
+    detector = SustainedArousalDetector(WINDOW_MIN, SUB_WINDOWS)
+    now = datetime(2024, 5, 1, 12)
+    assert detector.all_sub_windows_high(to_epoch_us(now), THRESHOLD) is False
+    assert detector.all_sub_windows_high(to_epoch_us(now - timedelta(seconds=1)), THRESHOLD) is None
+
+
+def test_fallback_scan_matches_original():
+    """El recorrido sin detector (_sub_windows_high) conserva el cálculo original."""
+    rng = random.Random(42)
+    log = []
+    for record, now in random_stream(rng, datetime(2024, 5, 1, 9), 400):
+        log.append(record)
+        assert group_service._sub_windows_high(now, THRESHOLD, log, None) == scan_sub_windows_high(log, now)
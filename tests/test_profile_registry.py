@@ -0,0 +1,55 @@
+"""Registro de perfiles: índices en memoria y recarga en caliente."""
+import os
+
+from app.services.profile_registry import ProfileRegistry
+
+
+def write(path, text: str):
+    """Escribe el fichero y adelanta su mtime para que el cambio se note aunque ocurra en el mismo instante."""
+    path.write_text(text, encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_indexes_and_reload(tmp_path):
+    write(tmp_path / "groups.yaml", "equipo:\n  users: [ana, luis]\n  companion_settings:\n    daily_summary_time_utc: '18:00'\n"
+                                    "otro:\n  users: [ana]\n")
+    write(tmp_path / "users.yaml", "ana:\n  lang: es\n")
+    registry = ProfileRegistry(tmp_path, check_interval=0)
+    assert registry.group_users("equipo") == ["ana", "luis"]
+    assert registry.group_settings("equipo") == {"daily_summary_time_utc": "18:00"}
+    assert registry.groups_of("ana") == ["equipo", "otro"]
+    assert registry.user("ana") == {"lang": "es"}
+    assert registry.group("sin_perfil") == {} and registry.user("nadie") == {}
+
+    write(tmp_path / "groups.yaml", "equipo:\n  users: [marta]\n")
+    assert registry.group_users("equipo") == ["marta"]
+    assert registry.groups_of("ana") == []
+    assert registry.reloads == 2
+
+
+def test_unchanged_files_are_not_reparsed(tmp_path):
+    write(tmp_path / "groups.yaml", "equipo:\n  users: [ana]\n")
+    registry = ProfileRegistry(tmp_path, check_interval=0)
+    first = registry.snapshot()
+    assert registry.snapshot() is first and registry.reloads == 1
+
+
+def test_check_interval_and_invalidate(tmp_path):
+    write(tmp_path / "groups.yaml", "equipo:\n  users: [ana]\n")
+    registry = ProfileRegistry(tmp_path, check_interval=3600)
+    assert registry.group_users("equipo") == ["ana"]
+    write(tmp_path / "groups.yaml", "equipo:\n  users: [luis]\n")
+    assert registry.group_users("equipo") == ["ana"]  # Aún dentro del intervalo de comprobación
+    registry.invalidate()
+    assert registry.group_users("equipo") == ["luis"]
+
+
+def test_broken_file_keeps_previous_snapshot(tmp_path):
+    write(tmp_path / "groups.yaml", "equipo:\n  users: [ana]\n")
+    registry = ProfileRegistry(tmp_path, check_interval=0)
+    assert registry.group_users("equipo") == ["ana"]
+    write(tmp_path / "groups.yaml", "equipo: [ana\n  : :\n")
+    assert registry.group_users("equipo") == ["ana"]
+    write(tmp_path / "groups.yaml", "equipo:\n  users: [luis, marta]\n")
+    assert registry.group_users("equipo") == ["luis", "marta"]
@@ -0,0 +1,55 @@
+"""Caché en proceso del estado parseado de los grupos."""
+import os
+from datetime import datetime
+
+from app.models import schemas
+from app.services import group_service, state_cache
+from app.services.state_cache import GroupStateCache
+
+
+def test_lru_bounds_by_entries_and_bytes():
+    cache = GroupStateCache(max_entries=2, max_bytes=100)
+    cache.put("a", ("s",), {"id": "a"}, 40, 0)
+    cache.put("b", ("s",), {"id": "b"}, 40, 0)
+    assert cache.get("a", ("s",)) == {"id": "a"}  # 'b' pasa a ser la menos reciente
+    cache.put("c", ("s",), {"id": "c"}, 40, 0)
+    assert cache.get("b", ("s",)) is None
+    assert cache.get("a", ("s",)) and cache.get("c", ("s",))
+
+    cache.put("d", ("s",), {"id": "d"}, 90, 0)  # Por bytes solo cabe ella
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 90
+    cache.put("e", ("s",), {"id": "e"}, 500, 0)  # Más grande que la caché: no se guarda
+    assert cache.get("e", ("s",)) is None and cache.get("d", ("s",))
+    assert cache.stats()["evictions"] == 3
+
+
+def test_signature_and_generation_invalidate():
+    cache = GroupStateCache()
+    generation = cache.generation("g")
+    cache.put("g", ("v1",), {"log": []}, 10, generation)
+    assert cache.get("g", ("v1",)) is not None
+    assert cache.get("g", ("v2",)) is None  # El fichero cambió en disco
+
+    # Una lectura que empezó antes de una escritura de este proceso nunca se sirve.
+    stale = cache.generation("g")
+    cache.bump_generation("g")
+    cache.put("g", ("v1",), {"log": ["viejo"]}, 10, stale)
+    assert cache.get("g", ("v1",)) is None
+
+
+def test_group_state_is_served_from_cache_until_it_changes(storage_mode):
+    group_service.persist_message("cacheado", schemas.MessageIngest(author="ana", text="hola", ts=datetime.utcnow()))
+    first = group_service.get_group_state("cacheado")
+    assert group_service.get_group_state("cacheado") is first
+
+    # Escritura desde este proceso.
+    group_service.persist_message("cacheado", schemas.MessageIngest(author="luis", text="adiós", ts=datetime.utcnow()))
+    second = group_service.get_group_state("cacheado")
+    assert second is not first and len(second["log"]) == len(first["log"]) + 1
+
+    # Cambio por otra vía (otro proceso): cambia la firma en disco.
+    filepath = group_service.get_group_memory_path("cacheado")
+    stat = filepath.stat()
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert group_service.get_group_state("cacheado") is not second
+    assert state_cache.cache.stats()["hits"] >= 1
@@ -0,0 +1,74 @@
+"""Códecs de almacenamiento y migración de grupos entre códecs y modos."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+import yaml
+
+from app.models import schemas
+from app.services import group_service, group_store, storage_codec
+
+DATA = {"meta": {"nombre": "Ñandú ☕", "vacío": None}, "log": [{"ts": "2026-01-01T10:00:00", "text": "¿qué tal?\nbien"}],
+        "user_stats": {"ana": {"count": 3, "ewma_arousal": 0.25}}}
+
+
+@pytest.mark.parametrize("name", sorted(storage_codec.CODECS))
+def test_round_trip(tmp_path, name):
+    codec = storage_codec.get_codec(name)
+    path = tmp_path / f"grupo{codec.suffix}"
+    codec.dump(DATA, path)
+    assert codec.load(path) == DATA
+    assert storage_codec.codec_for(path) is codec
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+def test_yaml_matches_pyyaml(tmp_path):
+    path = tmp_path / "grupo.yaml"
+    storage_codec.get_codec("yaml").dump(DATA, path)
+    assert yaml.safe_load(path.read_text(encoding="utf-8")) == DATA
+    assert storage_codec.load_yaml(yaml.dump(DATA, allow_unicode=True)) == DATA
+
+
+def test_failed_dump_keeps_the_previous_file(tmp_path):
+    codec = storage_codec.get_codec("json")
+    path = tmp_path / "grupo.json"
+    codec.dump(DATA, path)
+    with pytest.raises(TypeError):
+        codec.dump({"no_serializable": object()}, path)
+    assert codec.load(path) == DATA
+
+
+def test_unknown_codec_and_suffix(tmp_path):
+    with pytest.raises(ValueError):
+        storage_codec.get_codec("xml")
+    with pytest.raises(ValueError):
+        storage_codec.codec_for(tmp_path / "grupo.txt")
+
+
+def test_migrate_between_codecs_and_modes(storage):
+    rng = random.Random(2)
+    start = datetime.utcnow() - timedelta(hours=5)
+    group_service.persist_messages("migrar", [
+        schemas.MessageIngest(author=rng.choice(["ana", "luis"]), text=rng.choice(["hola", "¡¡¡NO!!!", "vale"]),
+                              ts=start + timedelta(minutes=i))
+        for i in range(60)
+    ])
+    original = group_service.get_group_state("migrar")
+
+    for codec, mode in [("json", group_store.STORAGE_SEGMENTED), ("yaml", group_store.STORAGE_SEGMENTED),
+                        ("json", group_store.STORAGE_YAML), ("yaml", group_store.STORAGE_YAML)]:
+        filepath = group_service.migrate_group("migrar", codec=codec, storage=mode)
+        assert filepath.suffix == storage_codec.get_codec(codec).suffix
+        assert group_service.get_group_memory_path("migrar") == filepath
+        assert [p for p in storage.glob("groups/migrar.*") if p.suffix in storage_codec.SUFFIXES] == [filepath]
+        segmented = mode == group_store.STORAGE_SEGMENTED
+        assert group_store.segments_dir(filepath).is_dir() == segmented
+        assert filepath.with_suffix(".stats").exists() == segmented
+        state = group_service.get_group_state("migrar")
+        assert state["log"] == original["log"]
+        assert state["user_stats"] == original["user_stats"]
+
+    with pytest.raises(ValueError):
+        group_service.migrate_group("migrar", storage="otro")
+    with pytest.raises(FileNotFoundError):
+        group_service.migrate_group("no_existe", codec="json")
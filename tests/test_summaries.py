@@ -0,0 +1,183 @@
+"""Resúmenes a partir de agregados persistidos: mismo resultado que generate_daily_summary sobre el log."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import schemas
+from app.services import affect_rollups, group_service, profile_registry, summarizer
+
+WORDS = ["informe", "reunión", "presupuesto", "cliente", "entrega", "diseño", "pruebas", "servidor", "factura"]
+AUTHORS = ["ana", "luis", "marta", "pedro"]
+
+
+@pytest.fixture
+def profiles(tmp_path, monkeypatch):
+    """Perfiles propios; devuelve una función para cambiar los usuarios del grupo."""
+    registry = profile_registry.ProfileRegistry(tmp_path / "profiles", check_interval=0)
+    monkeypatch.setattr(profile_registry, "registry", registry)
+    (tmp_path / "profiles").mkdir()
+
+    def set_users(group_id: str, users: list[str]):
+        (tmp_path / "profiles" / "groups.yaml").write_text(
+            f"{group_id}:\n  default_lang: es\n  users: [{', '.join(users)}]\n", encoding="utf-8")
+    return set_users
+
+
+def ingest(group_id: str, stamps: list[datetime], seed: int = 1):
+    rng = random.Random(seed)
+    group_service.persist_messages(group_id, [
+        schemas.MessageIngest(author=rng.choice(AUTHORS), ts=ts, text=" ".join(rng.choices(WORDS, k=rng.randint(1, 6))))
+        for ts in stamps
+    ])
+
+
+def batch_summary(group_id: str, since: datetime) -> dict:
+    """Cálculo original del resumen diario: los registros con ts > since, en orden de log."""
+    profile = profile_registry.registry.group(group_id)
+    recent_logs = [
+        r for r in group_service.get_group_state(group_id)["log"]
+        if datetime.fromisoformat(r.get("ts", "1970-01-01T00:00:00")).replace(tzinfo=None) > since
+    ]
+    return summarizer.generate_daily_summary(recent_logs, lang=profile.get("default_lang", "es"),
+                                             user_names=profile.get("users", []))
+
+
+def window_stamps(now: datetime, rng: random.Random) -> list[datetime]:
+    """Mensajes en orden durante algo más de 24 h, con algunos justo alrededor del límite."""
+    start = now - timedelta(hours=30)
+    stamps = sorted(start + timedelta(seconds=rng.uniform(0, 30 * 3600 - 60)) for _ in range(300))
+    stamps += [now - timedelta(hours=24, minutes=5), now - timedelta(hours=23, minutes=55)]
+    return sorted(stamps)
+
+
+def test_summarize_since_matches_batch(storage_mode, profiles):
+    profiles("resumen", ["ana", "luis"])
+    rng = random.Random(5)
+    now = datetime.utcnow()
+    ingest("resumen", window_stamps(now, rng))
+    assert affect_rollups.closed_through(group_service.get_group_memory_path("resumen")) is not None
+
+    since = now - timedelta(hours=24)
+    expected = batch_summary("resumen", since)
+    assert group_service.summarize_since("resumen", since) == expected
+    # El mensaje de hace 24 h 5 min queda fuera aunque su hora entre en parte en la ventana.
+    assert expected["message_count"] == sum(
+        1 for r in group_service.get_group_state("resumen")["log"]
+        if r["type"] == "message" and datetime.fromisoformat(r["ts"]) > since
+    )
+    for hours in (1, 5, 26, 29):
+        for offset in (timedelta(0), timedelta(minutes=17, microseconds=3)):
+            since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours) + offset
+            assert group_service.summarize_since("resumen", since) == batch_summary("resumen", since), since
+
+
+def test_boundary_message_is_excluded(storage_mode, profiles):
+    profiles("limite", ["ana"])
+    now = datetime.utcnow()
+    since = now - timedelta(hours=24)
+    ingest("limite", [since - timedelta(minutes=1), since, since + timedelta(microseconds=1), now - timedelta(hours=1)])
+    summary = group_service.summarize_since("limite", since)
+    assert summary == batch_summary("limite", since)
+    assert summary["message_count"] == 2
+
+
+def test_out_of_order_log_matches_batch(storage_mode, profiles):
+    profiles("desorden", ["ana", "luis"])
+    rng = random.Random(9)
+    now = datetime.utcnow()
+    ingest("desorden", window_stamps(now, rng))
+    # Mensajes tardíos en horas ya cerradas (y en la primera hora de la ventana).
+    since = now - timedelta(hours=24)
+    ingest("desorden", [now - timedelta(hours=10, minutes=3), since + timedelta(minutes=1),
+                        now - timedelta(hours=20)], seed=2)
+    assert group_service.summarize_since("desorden", since) == batch_summary("desorden", since)
+    assert group_service.summarize_since("desorden", now - timedelta(hours=5)) == batch_summary("desorden", now - timedelta(hours=5))
+
+
+def test_roster_change_recomputes_hours(storage_mode, profiles):
+    profiles("plantilla", ["ana", "luis"])
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    ingest("plantilla", window_stamps(now, rng))
+    profiles("plantilla", ["marta", "pedro", "ana"])
+    since = now - timedelta(hours=24)
+    assert group_service.summarize_since("plantilla", since) == batch_summary("plantilla", since)
+
+
+def test_rebuild_flags_unordered_hours(storage, profiles):
+    profiles("rehacer", ["ana"])
+    now = datetime.utcnow().replace(minute=30)
+    stamps = [now - timedelta(hours=h) for h in (6, 5, 4)] + [now - timedelta(hours=5, minutes=10), now]
+    ingest("rehacer", stamps)
+    filepath = group_service.get_group_memory_path("rehacer")
+    state = group_service.get_group_state("rehacer")
+    affect_rollups.rebuild(filepath, lambda: state["log"])
+    flagged = [line["t"] for line in affect_rollups.read(filepath, "summary", 0) if line.get("unordered")]
+    assert flagged == [affect_rollups.floor_us(affect_rollups.to_epoch_us(now - timedelta(hours=5)), affect_rollups.HOUR_US)]
+    since = now - timedelta(hours=7)
+    assert group_service.summarize_since("rehacer", since) == batch_summary("rehacer", since)
+
+
+def test_long_run_of_late_records_is_not_a_stop(storage_mode, profiles):
+    profiles("importado", ["ana", "luis"])
+    rng = random.Random(11)
+    now = datetime.utcnow()
+    ingest("importado", window_stamps(now, rng))
+    ingest("importado", [now - timedelta(minutes=m) for m in (9, 6, 3)], seed=4)
+    # Importación tardía: muchos mensajes antiguos seguidos al final del log.
+    ingest("importado", [now - timedelta(days=3, seconds=i) for i in range(250)], seed=6)
+    since = now - timedelta(hours=24)
+    assert group_service.summarize_since("importado", since) == batch_summary("importado", since)
+    # Igual con el índice de tiempo frío (otro proceso, p. ej. el script de resúmenes).
+    group_service._invalidate_views("importado")
+    assert group_service.summarize_since("importado", since) == batch_summary("importado", since)
+
+
+def period_batch(group_id: str, start: datetime, end: datetime) -> dict:
+    """Resumen original sobre los mensajes del período (start <= ts < end), en orden de log."""
+    profile = profile_registry.registry.group(group_id)
+    records = [
+        r for r in group_service.get_group_state(group_id)["log"]
+        if start <= datetime.fromisoformat(r.get("ts", "1970-01-01T00:00:00")).replace(tzinfo=None) < end
+    ]
+    return summarizer.generate_daily_summary(records, lang=profile.get("default_lang", "es"),
+                                             user_names=profile.get("users", []))
+
+
+@pytest.mark.parametrize("period,count", [("week", 6), ("month", 3)])
+def test_period_summaries_match_batch(storage_mode, profiles, period, count):
+    profiles("periodos", ["ana", "luis", "marta"])
+    rng = random.Random(8)
+    now = datetime.utcnow()
+    ingest("periodos", sorted(now - timedelta(seconds=rng.uniform(60, 45 * 86400)) for _ in range(500)))
+    summaries = group_service.get_period_summaries("periodos", period, count)
+    assert len(summaries) == count
+    assert all(a["end"] == b["start"] for a, b in zip(summaries, summaries[1:]))
+    assert summaries[0]["start"] <= now - timedelta(days=35) and summaries[-1]["start"] <= now < summaries[-1]["end"]
+    for summary in summaries:
+        assert summary["details"] == period_batch("periodos", summary["start"], summary["end"])
+    assert sum(s["details"]["message_count"] for s in summaries) == len(
+        [r for r in group_service.iter_log("periodos") if r["type"] == "message" and
+         datetime.fromisoformat(r["ts"]) >= summaries[0]["start"]])
+
+
+def test_period_bounds():
+    now = datetime(2026, 1, 14, 9, 30)  # Miércoles
+    weeks = group_service._period_bounds("week", now, 2)
+    assert weeks == [(datetime(2026, 1, 5), datetime(2026, 1, 12)), (datetime(2026, 1, 12), datetime(2026, 1, 19))]
+    months = group_service._period_bounds("month", now, 3)
+    assert months == [(datetime(2025, 11, 1), datetime(2025, 12, 1)), (datetime(2025, 12, 1), datetime(2026, 1, 1)),
+                      (datetime(2026, 1, 1), datetime(2026, 2, 1))]
+    with pytest.raises(ValueError):
+        group_service._period_bounds("year", now, 1)
+
+
+def test_period_summaries_endpoint(client, storage_mode, profiles):
+    profiles("periodos", ["ana"])
+    ingest("periodos", [datetime.utcnow() - timedelta(hours=h) for h in (30, 20, 2)])
+    body = client.get("/api/v1/groups/periodos/summaries", params={"period": "month", "count": 2}).json()
+    assert body["period"] == "month" and len(body["summaries"]) == 2
+    assert sum(s["details"]["message_count"] for s in body["summaries"]) == 3
+    assert client.get("/api/v1/groups/periodos/summaries", params={"period": "year"}).status_code == 422
+    assert client.get("/api/v1/groups/sin_grupo/summaries").status_code == 404
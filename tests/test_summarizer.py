@@ -0,0 +1,120 @@
+"""Paridad del motor de reglas del resumen con la extracción original (patrón a patrón)."""
+import os
+import random
+import re
+from collections import Counter
+
+import pytest
+import yaml
+
+from app.services import summarizer
+
+RULES = {
+    "stopwords": {"es": ["que", "para", "con", "los", "las"], "en": ["the", "and", "for"]},
+    "decision_keywords": {
+        # Literales con prefijos comunes (se agrupan en un trie)...
+        "es": ["acordamos", "acordado", "acuerdo", "decidimos", "decidido", "queda", "quedamos"],
+        # ...y con sintaxis de expresión regular (se conserva la alternancia).
+        "en": ["agreed", "decid(ed|e)", "we'll go with", "approved?"],
+    },
+    "action_patterns": {
+        "es": [r"(?P<assignee>{user_names_re}) se encarga de (?P<task>.+)",
+               r"(?P<assignee>{user_names_re}),? (?:puedes|podrías) (?P<task>.+)"],
+        "en": [r"(?P<assignee>{user_names_re}) will (?P<task>.+)", r"@(?P<assignee>\w+):? (?P<task>.+)"],
+    },
+}
+USERS = ["Ana", "Anabel", "luis", "Luisa", "José", "mar.ta"]
+FRAGMENTS = {
+    "es": ["acordamos lanzar el viernes", "ACUERDO cerrado", "acordadísimo", "queda pendiente", "quedamosnos",
+           "ana se encarga de revisar el informe", "Anabel se encarga de las pruebas", "Luis, puedes mirar el servidor",
+           "luisa podrías llamar al cliente", "José se encarga de la factura", "mar.ta se encarga de todo",
+           "marta se encarga de nada", "Pedro se encarga de algo", "decidido: presupuesto nuevo", "- decidimos esperar",
+           "el presupuesto de diseño", "reunión con los clientes", "pruebas pruebas prueba"],
+    "en": ["we agreed on the plan", "Decided to ship", "decide later", "We'll go with option B", "approve it",
+           "approved!", "Ana will update the docs", "luis will deploy", "@Luisa: check the logs", "@pedro fix it",
+           "nothing decidedly new", "the release and the deploy"],
+}
+
+
+def original_decisions(records: list[dict], lang: str) -> list[str]:
+    keywords = RULES["decision_keywords"].get(lang, [])
+    if not keywords:
+        return []
+    keyword_re = re.compile(r'\b(' + '|'.join(keywords) + r')\b', re.IGNORECASE)
+    return [
+        line.strip().lstrip('*- ').capitalize()
+        for record in records for line in record.get("text", "").split('\n') if keyword_re.search(line)
+    ]
+
+
+def original_actions(records: list[dict], lang: str, user_names: list[str]) -> list[dict]:
+    if not user_names:
+        return []
+    user_names_re = '|'.join(re.escape(name) for name in user_names)
+    compiled = [re.compile(p.format(user_names_re=user_names_re), re.IGNORECASE) for p in RULES["action_patterns"].get(lang, [])]
+    actions = []
+    for record in records:
+        for line in record.get("text", "").split('\n'):
+            for pat in compiled:
+                match = pat.search(line)
+                if match:
+                    assignee = match.group('assignee').strip()
+                    if assignee.lower() in [name.lower() for name in user_names]:
+                        actions.append({"assignee": assignee, "task": match.group('task').strip()})
+                        break
+    return actions
+
+
+def original_topic_counts(texts: list[str], lang: str) -> dict[str, Counter]:
+    stopwords = set(RULES["stopwords"].get(lang, []))
+    stem = summarizer.STEMMERS.get(lang, lambda w: w)
+    stem_to_words = {}
+    for word in re.findall(r'\b\w{3,}\b', " ".join(texts).lower()):
+        if word in stopwords:
+            continue
+        stem_to_words.setdefault(stem(word), Counter())[word] += 1
+    return stem_to_words
+
+
+@pytest.fixture(autouse=True)
+def rules(tmp_path, monkeypatch):
+    path = tmp_path / "summarizer_rules.yaml"
+    path.write_text(yaml.safe_dump(RULES, allow_unicode=True), encoding="utf-8")
+    monkeypatch.setattr(summarizer, "RULES_PATH", path)
+    return path
+
+
+def random_records(rng: random.Random, lang: str, count: int) -> list[dict]:
+    return [
+        {"type": "message", "text": "\n".join(rng.choice(FRAGMENTS[lang]) for _ in range(rng.randint(1, 3)))}
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("lang", ["es", "en"])
+@pytest.mark.parametrize("seed", range(5))
+def test_engine_matches_original_extraction(lang, seed):
+    rng = random.Random(seed)
+    records = random_records(rng, lang, 300)
+    users = rng.sample(USERS, rng.randint(1, len(USERS)))
+    assert summarizer._extract_decisions(records, lang) == original_decisions(records, lang)
+    assert summarizer._extract_actions(records, lang, users) == original_actions(records, lang, users)
+    texts = [r["text"] for r in records]
+    counts = summarizer._topic_counts(texts, lang)
+    expected = original_topic_counts(texts, lang)
+    assert list(counts) == list(expected)
+    assert all(list(counts[stem].items()) == list(expected[stem].items()) for stem in expected)
+
+
+def test_engines_are_reused_and_follow_the_rules_file(rules):
+    engine = summarizer.rule_engine("es", ["Ana"])
+    assert summarizer.rule_engine("es", ["Ana"]) is engine
+    assert summarizer.rule_engine("es", ["Ana", "Luis"]) is not engine
+
+    changed = {**RULES, "decision_keywords": {"es": ["votamos"]}}
+    version = rules.stat().st_mtime_ns
+    rules.write_text(yaml.safe_dump(changed, allow_unicode=True), encoding="utf-8")
+    os.utime(rules, ns=(version + 1_000_000, version + 1_000_000))  # Cambio visible aunque caiga en el mismo tic
+    records = [{"text": "votamos que sí"}, {"text": "acordamos que no"}]
+    assert summarizer._extract_decisions(records, "es") == ["Votamos que sí"]
+    assert summarizer.rule_engine("es", ["Ana"]) is not engine
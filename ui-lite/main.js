@@ -25,8 +25,10 @@ document.addEventListener('DOMContentLoaded', () => {
     const toastContainer = document.getElementById('toast-container');
 
     let metricsIntervalId = null;
+    let groupEvents = null; // EventSource del grupo activo (sustituye al sondeo de métricas)
 
     const LAST_SEEN_KEY = 'rlx-last-seen';
+    const LOG_PAGE_SIZE = 500;
 
     const API_BASE_URL = '/api/v1';
 
@@ -201,10 +203,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     async function loadConversation(groupId, lang) {
-        if (metricsIntervalId) {
-            clearInterval(metricsIntervalId);
-            metricsIntervalId = null;
-        }
+        stopLiveUpdates();
 
         try {
             welcomeMessage.classList.add('hidden');
@@ -213,11 +212,13 @@ document.addEventListener('DOMContentLoaded', () => {
             document.title = `RLx - ${groupId}`;
             conversationView.querySelector('#log-container').innerHTML = `<p class="loading">${I18N[lang].loadingBtn}</p>`;
 
-            const response = await fetch(`${API_BASE_URL}/groups/${groupId}/state`);
+            // Solo se piden los registros más recientes, no la memoria completa del grupo.
+            const response = await fetch(`${API_BASE_URL}/groups/${groupId}/log?limit=${LOG_PAGE_SIZE}`);
             if (!response.ok) {
                 throw new Error(`Error al cargar el estado del grupo: ${response.statusText}`);
             }
-            const state = await response.json();
+            const page = await response.json();
+            const state = { log: page.records };
 
             // --- Lógica para encontrar la primera alerta no vista ---
             const lastSeenTimestamps = JSON.parse(localStorage.getItem(LAST_SEEN_KEY) || '{}');
@@ -233,9 +234,8 @@ document.addEventListener('DOMContentLoaded', () => {
             }
             // --- Fin de la lógica ---
 
-            // Iniciar la actualización de métricas
-            updateMetrics(groupId);
-            metricsIntervalId = setInterval(() => updateMetrics(groupId), 7000);
+            // Iniciar la actualización de métricas (por eventos del servidor si el navegador lo permite)
+            startLiveUpdates(groupId, lang);
 
             checkForNewNotifications(state.log || [], lang);
             renderLog(state.log || [], lang, firstUnreadAlertId); // Pasamos el ID para resaltarlo
@@ -594,10 +594,7 @@ document.addEventListener('DOMContentLoaded', () => {
             const activeItem = document.querySelector('#group-list li.active');
             if (activeItem && activeItem.dataset.groupId === groupId) {
                 // Detener la actualización de métricas
-                if (metricsIntervalId) {
-                    clearInterval(metricsIntervalId);
-                    metricsIntervalId = null;
-                }
+                stopLiveUpdates();
                 // Limpiar el panel de métricas
                 resetMetricsPanel();
 
@@ -701,34 +698,69 @@ document.addEventListener('DOMContentLoaded', () => {
     });
     }
 
+    function startLiveUpdates(groupId, lang) {
+        if (typeof EventSource === 'undefined') {
+            updateMetrics(groupId);
+            metricsIntervalId = setInterval(() => updateMetrics(groupId), 7000);
+            return;
+        }
+        // EventSource reconecta solo y reanuda desde el último evento recibido (Last-Event-ID).
+        groupEvents = new EventSource(`${API_BASE_URL}/groups/${groupId}/events`);
+        groupEvents.addEventListener('metrics', (event) => renderMetrics(JSON.parse(event.data)));
+        ['alert', 'suggestion', 'daily_summary'].forEach(type => {
+            groupEvents.addEventListener(type, (event) => appendLiveRecord(JSON.parse(event.data), lang));
+        });
+    }
+
+    function stopLiveUpdates() {
+        if (metricsIntervalId) {
+            clearInterval(metricsIntervalId);
+            metricsIntervalId = null;
+        }
+        if (groupEvents) {
+            groupEvents.close();
+            groupEvents = null;
+        }
+    }
+
+    function appendLiveRecord(record, lang) {
+        const logContainer = document.getElementById('log-container');
+        if (!logContainer || document.getElementById(`log-item-${record.msg_id}`)) return;
+        logContainer.querySelector('p.loading')?.remove();
+        logContainer.appendChild(createLogItemElement(record, lang));
+        logContainer.scrollTop = logContainer.scrollHeight;
+        checkForNewNotifications([record], lang);
+    }
+
     async function updateMetrics(groupId) {
         try {
             const response = await fetch(`${API_BASE_URL}/groups/${groupId}/metrics`);
             if (!response.ok) return; // Fallar silenciosamente, el panel simplemente no se actualizará
-            const metrics = await response.json();
-
-            const frictionEl = document.getElementById('metric-friction');
-            const arousalEl = document.getElementById('metric-arousal');
-            const valenceEl = document.getElementById('metric-valence');
-
-            if (frictionEl) {
-                frictionEl.textContent = metrics.friction_index.toFixed(2);
-                frictionEl.classList.toggle('is-high', metrics.friction_index > 0.25);
-            }
-            if (arousalEl) {
-                arousalEl.textContent = metrics.affective_proxy.arousal_z.toFixed(2);
-                arousalEl.classList.toggle('is-high', metrics.affective_proxy.arousal_z > 1.0);
-            }
-            if (valenceEl) {
-                valenceEl.textContent = metrics.affective_proxy.valence_z.toFixed(2);
-                valenceEl.classList.toggle('is-low', metrics.affective_proxy.valence_z < -0.5);
-            }
-
+            renderMetrics(await response.json());
         } catch (error) {
             console.error(`Fallo al actualizar las métricas para ${groupId}:`, error);
         }
     }
 
+    function renderMetrics(metrics) {
+        const frictionEl = document.getElementById('metric-friction');
+        const arousalEl = document.getElementById('metric-arousal');
+        const valenceEl = document.getElementById('metric-valence');
+
+        if (frictionEl) {
+            frictionEl.textContent = metrics.friction_index.toFixed(2);
+            frictionEl.classList.toggle('is-high', metrics.friction_index > 0.25);
+        }
+        if (arousalEl) {
+            arousalEl.textContent = metrics.affective_proxy.arousal_z.toFixed(2);
+            arousalEl.classList.toggle('is-high', metrics.affective_proxy.arousal_z > 1.0);
+        }
+        if (valenceEl) {
+            valenceEl.textContent = metrics.affective_proxy.valence_z.toFixed(2);
+            valenceEl.classList.toggle('is-low', metrics.affective_proxy.valence_z < -0.5);
+        }
+    }
+
     function resetMetricsPanel() {
         const frictionEl = document.getElementById('metric-friction');
         const arousalEl = document.getElementById('metric-arousal');